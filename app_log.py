@@ -0,0 +1,62 @@
+"""
+转换日志文件
+界面中只保留最近的日志，完整日志通过QueueHandler交给后台线程写入按大小轮转的文件，
+写磁盘不会阻塞界面线程或转换线程。
+"""
+import os
+import sys
+import queue
+import logging
+import logging.handlers
+
+LOGGER_NAME = "word_to_pdf"
+
+# 单个日志文件的大小上限和保留的旧文件数
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_BACKUPS = 5
+
+
+def default_log_dir():
+    """默认日志目录，可用环境变量W2P_LOG_DIR指定"""
+    configured = os.environ.get("W2P_LOG_DIR")
+    if configured:
+        return configured
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+    else:
+        base = os.environ.get("XDG_STATE_HOME") or os.path.join(os.path.expanduser("~"), ".local", "state")
+    return os.path.join(base, "word_to_pdf_converter", "logs")
+
+
+class AsyncFileLog:
+    """异步写入的轮转日志文件"""
+
+    def __init__(self, log_dir=None, filename="converter.log",
+                 max_bytes=LOG_MAX_BYTES, backups=LOG_BACKUPS):
+        self.log_dir = log_dir or default_log_dir()
+        os.makedirs(self.log_dir, exist_ok=True)
+        self.path = os.path.join(self.log_dir, filename)
+
+        file_handler = logging.handlers.RotatingFileHandler(
+            self.path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8")
+        file_handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+
+        self._queue = queue.SimpleQueue()
+        self._listener = logging.handlers.QueueListener(self._queue, file_handler)
+        self._handler = logging.handlers.QueueHandler(self._queue)
+
+        self.logger = logging.getLogger(LOGGER_NAME)
+        self.logger.setLevel(logging.INFO)
+        self.logger.propagate = False
+        self.logger.addHandler(self._handler)
+        self._listener.start()
+
+    def write(self, message):
+        self.logger.info(message)
+
+    def close(self):
+        """写完队列中剩余的日志后关闭文件"""
+        self.logger.removeHandler(self._handler)
+        self._listener.stop()
+        for handler in self._listener.handlers:
+            handler.close()
@@ -0,0 +1,147 @@
+"""
+压缩包输出
+几万个小文档逐个在网络共享上创建PDF文件很慢，文件服务器也吃不消。
+ArchiveWriter把转换完成的PDF依次追加到ZIP或TAR压缩包中（分块复制，不把压缩包读入内存），
+压缩包达到大小上限时开始下一个分卷，同时写出索引（源文件 -> 压缩包和其中的文件名），
+把大量小文件的创建变成少量大文件的顺序写入。
+"""
+import os
+import csv
+import tarfile
+import zipfile
+
+# 单个分卷的默认大小上限
+DEFAULT_MAX_VOLUME_SIZE = 2 * 1024 * 1024 * 1024
+
+# 每个文件在压缩包中的文件头和目录项大约占用的字节数（估算分卷大小时使用）
+MEMBER_OVERHEAD = 1024
+
+# 写入过程中分卷使用的后缀，关闭后改名
+PARTIAL_SUFFIX = ".partial"
+
+# 支持的格式：扩展名 -> tarfile的打开模式（None表示ZIP）
+ARCHIVE_FORMATS = {
+    ".zip": None,
+    ".tar": "w",
+    ".tar.gz": "w:gz",
+    ".tgz": "w:gz",
+}
+
+
+def archive_format(path):
+    """返回 (不含扩展名的路径, 扩展名)，不支持的格式抛出ValueError"""
+    lower = path.lower()
+    for ext in sorted(ARCHIVE_FORMATS, key=len, reverse=True):
+        if lower.endswith(ext):
+            return path[:-len(ext)], path[-len(ext):]
+    raise ValueError(f"不支持的压缩包格式（可用 {', '.join(ARCHIVE_FORMATS)}）: {path}")
+
+
+def member_name(rel_path):
+    """压缩包中的文件名统一使用"/"分隔"""
+    return rel_path.replace(os.sep, "/").lstrip("/")
+
+
+class ArchiveWriter:
+    """把PDF写入一个或多个大小受限的压缩包（在一个线程中使用）
+
+    path为 名称.zip/.tar/.tar.gz，分卷依次命名为 名称-0001.zip、名称-0002.zip ...，
+    索引保存为 名称.index.csv（source, archive, member, size）。
+    分卷写完后才从 .partial 改名，中途异常退出时不会留下看起来完整的压缩包。
+    """
+
+    def __init__(self, path, max_size=DEFAULT_MAX_VOLUME_SIZE):
+        self.base, self.ext = archive_format(os.path.abspath(path))
+        self.max_size = max(1, int(max_size))
+        self._tar_mode = ARCHIVE_FORMATS[self.ext.lower()]
+        os.makedirs(os.path.dirname(self.base) or ".", exist_ok=True)
+
+        self.index_path = self.base + ".index.csv"
+        self._index_file = open(self.index_path + PARTIAL_SUFFIX, "w", encoding="utf-8-sig", newline="")
+        self._index = csv.writer(self._index_file)
+        self._index.writerow(["source", "archive", "member", "size"])
+
+        self.volumes = []  # 已完成的分卷路径
+        self._volume = None  # 正在写入的分卷路径
+        self._archive = None
+        self._raw = None  # 分卷的底层文件，用来得到已写入的字节数
+        self._members = set()
+        self.files = 0
+        self.bytes = 0
+
+    def _volume_size(self):
+        return self._raw.tell() if self._raw is not None else 0
+
+    def _open_volume(self):
+        self._volume = f"{self.base}-{len(self.volumes) + 1:04d}{self.ext}"
+        self._raw = open(self._volume + PARTIAL_SUFFIX, "wb")
+        if self._tar_mode is None:
+            # PDF本身已经压缩过，存储即可，避免再压缩一遍占用CPU
+            self._archive = zipfile.ZipFile(self._raw, "w", zipfile.ZIP_STORED, allowZip64=True)
+        else:
+            self._archive = tarfile.open(fileobj=self._raw, mode=self._tar_mode,
+                                         format=tarfile.PAX_FORMAT)
+        self._members = set()
+
+    def _close_volume(self):
+        if self._archive is None:
+            return
+        self._archive.close()
+        self._raw.close()
+        os.replace(self._volume + PARTIAL_SUFFIX, self._volume)
+        self.volumes.append(self._volume)
+        self._archive = self._raw = self._volume = None
+
+    def add(self, path, member, source=""):
+        """把文件path以member为名追加到压缩包，返回 (分卷路径, 文件名)"""
+        member = member_name(member)
+        size = os.path.getsize(path)
+        if (self._archive is not None and self._members
+                and self._volume_size() + size + MEMBER_OVERHEAD > self.max_size):
+            self._close_volume()
+        if self._archive is None:
+            self._open_volume()
+        if member in self._members:
+            raise ValueError(f"压缩包中已有同名文件: {member}")
+
+        if self._tar_mode is None:
+            self._archive.write(path, member)
+        else:
+            self._archive.add(path, arcname=member, recursive=False)
+        self._members.add(member)
+        self._index.writerow([source, os.path.basename(self._volume), member, size])
+        self.files += 1
+        self.bytes += size
+        return self._volume, member
+
+    def add_result(self, result, root):
+        """转换结果的PDF（root下的临时文件）追加到压缩包后删除
+
+        成功时在result中记录archive和member，写入失败时把结果改为失败。
+        """
+        try:
+            if result["status"] == "ok":
+                result["archive"], result["member"] = self.add(
+                    result["dst"], os.path.relpath(result["dst"], root), result["src"])
+        except (OSError, ValueError) as e:
+            error = f"写入压缩包失败: {e}"
+            result.update(status="failed", error=error, hints=[f"⚠ {error}"])
+        finally:
+            try:
+                os.remove(result["dst"])
+            except OSError:
+                pass
+
+    def close(self):
+        """写完当前分卷和索引"""
+        self._close_volume()
+        if self._index_file is not None:
+            self._index_file.close()
+            self._index_file = None
+            os.replace(self.index_path + PARTIAL_SUFFIX, self.index_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
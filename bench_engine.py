@@ -0,0 +1,73 @@
+"""
+并行转换引擎压力测试 - 使用模拟Office后端，无需安装Word/WPS
+示例: python bench_engine.py --files 200 --workers 1,2,4,8 --profile "{\"startup\": 2.0}"
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+
+from conversion_engine import ConversionEngine
+
+
+def create_sample_files(folder, count):
+    """创建指定数量的假Word文件（模拟后端只检查文件是否存在和大小）"""
+    files = []
+    for i in range(count):
+        path = os.path.join(folder, f"doc_{i:05d}.docx")
+        with open(path, "wb") as f:
+            f.write(b"\0" * (1024 * (i % 50 + 1)))
+        files.append(path)
+    return files
+
+
+def run_once(files, workers, profile):
+    engine = ConversionEngine("sim", workers=workers, options={"sim_profile": profile})
+    start = time.perf_counter()
+    engine.start()
+    for path in files:
+        engine.submit(path, os.path.splitext(path)[0] + ".pdf")
+    engine.finish_input()
+    results = list(engine.results())
+    engine.close()
+    elapsed = time.perf_counter() - start
+    ok = sum(1 for r in results if r["status"] == "ok")
+    return elapsed, ok, len(results) - ok, engine.pool_stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="并行转换引擎压力测试（模拟Office）")
+    parser.add_argument("--files", type=int, default=100, help="测试文件数量")
+    parser.add_argument("--workers", default="1,2,4", help="要测试的进程数，逗号分隔")
+    parser.add_argument("--profile", default="{}", help="模拟参数(JSON)，见sim_office.py")
+    args = parser.parse_args()
+
+    profile = json.loads(args.profile)
+    worker_counts = [int(x) for x in args.workers.split(",") if x.strip()]
+
+    print("=" * 60)
+    print("并行转换引擎压力测试 (模拟Office)")
+    print("=" * 60)
+    print(f"文件数量: {args.files}")
+    print(f"模拟参数: {json.dumps(profile, ensure_ascii=False)}")
+
+    folder = tempfile.mkdtemp(prefix="w2p_bench_")
+    try:
+        files = create_sample_files(folder, args.files)
+        print("-" * 60)
+        print(f"{'进程数':>6} {'耗时(秒)':>10} {'文件/分钟':>10} {'成功':>6} {'失败':>6} {'Office启动':>10}")
+        for workers in worker_counts:
+            elapsed, ok, failed, stats = run_once(files, workers, profile)
+            rate = (ok + failed) / elapsed * 60 if elapsed else 0
+            print(f"{workers:>6} {elapsed:>10.2f} {rate:>10.1f} {ok:>6} {failed:>6} {stats['misses']:>10}")
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+    print("=" * 60)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+"""
+启动时间测试 - 测量导入耗时、窗口首次显示耗时和第一个文件转换完成的耗时
+超过阈值时返回1，可以放进构建流程防止启动时间悄悄变长。
+示例:
+    python bench_startup.py
+    python bench_startup.py --exe "dist\\Word转PDF工具\\Word转PDF工具.exe" --max-window 2
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import statistics
+import subprocess
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+MAIN_SCRIPT = os.path.join(HERE, "word_to_pdf_converter.py")
+
+# 这些模块必须在第一次使用时才导入，导入界面模块时出现就是启动时间退化
+LAZY_MODULES = ("win32com", "pythoncom", "docx", "reportlab")
+
+# 模拟后端不产生Office延迟，测出的是程序自身的开销
+SIM_PROFILE = {"startup": "fixed:0", "open": "fixed:0", "save": "fixed:0", "quit": "fixed:0"}
+
+_IMPORT_PROBE = f"""
+import sys, time, json
+sys.path.insert(0, {HERE!r})
+start = time.perf_counter()
+import word_to_pdf_converter
+elapsed = time.perf_counter() - start
+loaded = [name for name in {LAZY_MODULES!r} if name in sys.modules]
+print(json.dumps({{"elapsed": elapsed, "loaded": loaded}}))
+"""
+
+
+def app_command(exe):
+    if exe:
+        return [exe]
+    return [sys.executable, MAIN_SCRIPT]
+
+
+def measure_import():
+    """导入界面模块的耗时（新进程中测量，不受本进程缓存影响）"""
+    output = subprocess.run([sys.executable, "-c", _IMPORT_PROBE], check=True,
+                            capture_output=True, text=True).stdout
+    data = json.loads(output.strip().splitlines()[-1])
+    return data["elapsed"], data["loaded"]
+
+
+def measure_window(exe, timeout=60):
+    """从启动进程到窗口第一次显示的耗时，没有图形环境时返回None"""
+    fd, probe_file = tempfile.mkstemp(suffix=".txt")
+    os.close(fd)
+    os.unlink(probe_file)
+    env = dict(os.environ, W2P_STARTUP_PROBE=probe_file)
+    start = time.time()
+    process = subprocess.Popen(app_command(exe), env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        process.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+    if not os.path.exists(probe_file):
+        return None
+    with open(probe_file, encoding="utf-8") as f:
+        shown = float(f.read())
+    os.unlink(probe_file)
+    return shown - start
+
+
+def measure_first_conversion(exe, timeout=120):
+    """命令行模式下从启动进程到第一个PDF生成的耗时（模拟后端）"""
+    folder = tempfile.mkdtemp(prefix="w2p_startup_")
+    try:
+        src = os.path.join(folder, "sample.docx")
+        with open(src, "wb") as f:
+            f.write(b"\0" * 1024)
+        pdf = os.path.splitext(src)[0] + ".pdf"
+        env = dict(os.environ, W2P_SIM_PROFILE=json.dumps(SIM_PROFILE),
+                   W2P_CACHE_DIR=os.path.join(folder, "cache"))
+        cmd = app_command(exe) + ["convert", folder, "--backend", "sim", "--workers", "1",
+                                  "--force", "--no-cache"]
+
+        start = time.perf_counter()
+        process = subprocess.Popen(cmd, env=env, cwd=HERE,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        elapsed = None
+        try:
+            deadline = start + timeout
+            while time.perf_counter() < deadline:
+                if os.path.exists(pdf):
+                    elapsed = time.perf_counter() - start
+                    break
+                if process.poll() is not None and not os.path.exists(pdf):
+                    break
+                time.sleep(0.01)
+            process.wait(timeout=timeout)
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+        return elapsed
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+def _median(values):
+    values = [v for v in values if v is not None]
+    return statistics.median(values) if values else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="启动时间测试")
+    parser.add_argument("--exe", help="测试打包后的exe（默认测试python源码）")
+    parser.add_argument("--runs", type=int, default=5, help="每项测试的次数（取中位数）")
+    parser.add_argument("--max-import", type=float, default=1.0, help="导入耗时阈值(秒)")
+    parser.add_argument("--max-window", type=float, default=3.0, help="窗口显示耗时阈值(秒)")
+    parser.add_argument("--max-first-conversion", type=float, default=5.0,
+                        help="第一个文件转换完成耗时阈值(秒)")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("启动时间测试" + (f": {args.exe}" if args.exe else ""))
+    print("=" * 60)
+
+    failures = []
+
+    if not args.exe:
+        samples, loaded = [], set()
+        for _ in range(args.runs):
+            elapsed, modules = measure_import()
+            samples.append(elapsed)
+            loaded.update(modules)
+        import_time = _median(samples)
+        print(f"导入界面模块:       {import_time:.3f} 秒 (阈值 {args.max_import} 秒)")
+        if import_time > args.max_import:
+            failures.append("导入耗时超过阈值")
+        if loaded:
+            print(f"  ✗ 启动时导入了应延迟加载的模块: {', '.join(sorted(loaded))}")
+            failures.append("启动时导入了延迟加载的模块")
+
+    window_time = _median(measure_window(args.exe) for _ in range(args.runs))
+    if window_time is None:
+        print("窗口首次显示:       跳过（没有图形环境）")
+    else:
+        print(f"窗口首次显示:       {window_time:.3f} 秒 (阈值 {args.max_window} 秒)")
+        if window_time > args.max_window:
+            failures.append("窗口显示耗时超过阈值")
+
+    conversion_time = _median(measure_first_conversion(args.exe) for _ in range(args.runs))
+    if conversion_time is None:
+        print("第一个文件转换完成: ✗ 失败（未生成PDF）")
+        failures.append("命令行转换失败")
+    else:
+        print(f"第一个文件转换完成: {conversion_time:.3f} 秒 (阈值 {args.max_first_conversion} 秒)")
+        if conversion_time > args.max_first_conversion:
+            failures.append("第一个文件转换耗时超过阈值")
+
+    print("-" * 60)
+    if failures:
+        for failure in failures:
+            print(f"✗ {failure}")
+        return 1
+    print("✓ 启动时间符合要求")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -20,12 +20,16 @@ except ImportError:
     subprocess.check_call([sys.executable, "-m", "pip", "install", "pyinstaller"])
     print("✓ PyInstaller安装完成")
 
+# 打包方式: 默认单文件；--onedir 生成目录版，每次启动不需要先解压到临时目录，启动更快
+onedir = "--onedir" in sys.argv[1:]
+
 # 打包命令
-print("\n开始打包...")
+print("\n开始打包...（" + ("目录模式" if onedir else "单文件模式") + "）")
 print("-"*70)
 
 # PyInstaller参数说明:
-# --onefile: 打包成单个exe文件
+# --onefile: 打包成单个exe文件（每次启动都要解压，较慢）
+# --onedir: 打包成目录（启动快，需要复制整个目录）
 # --windowed: 不显示控制台窗口(GUI程序)
 # --name: 指定exe文件名
 # --icon: 指定图标(如果有)
@@ -34,7 +38,7 @@ print("-"*70)
 
 cmd = [
     "pyinstaller",
-    "--onefile",                    # 单文件模式
+    "--onedir" if onedir else "--onefile",  # 目录模式或单文件模式
     "--windowed",                   # GUI模式,不显示控制台
     "--name=Word转PDF工具",          # 程序名称
     "--clean",                      # 清理临时文件
@@ -43,6 +47,9 @@ cmd = [
     "--hidden-import=pythoncom",
     "--hidden-import=pywintypes",
     "--hidden-import=win32com.gen_py",
+    "--hidden-import=converter_cli",  # 命令行模式通过runpy按名称加载
+    # LibreOffice常驻转换服务脚本（由LibreOffice自带的Python运行）
+    "--add-data=soffice_bridge.py;.",
     # 排除不需要的模块以减小体积
     "--exclude-module=matplotlib",
     "--exclude-module=numpy",
@@ -61,10 +68,13 @@ try:
     print("\n" + "="*70)
     print("✓✓✓ 打包成功！")
     print("="*70)
-    print(f"\n生成的exe文件位置: dist\\Word转PDF工具.exe")
+    if onedir:
+        exe_path = os.path.join("dist", "Word转PDF工具", "Word转PDF工具.exe")
+    else:
+        exe_path = os.path.join("dist", "Word转PDF工具.exe")
+    print(f"\n生成的exe文件位置: {exe_path}")
     print(f"\n文件大小: ", end="")
     
-    exe_path = os.path.join("dist", "Word转PDF工具.exe")
     if os.path.exists(exe_path):
         size = os.path.getsize(exe_path)
         if size > 1024 * 1024:
@@ -73,7 +83,10 @@ try:
             print(f"{size / 1024:.2f} KB")
     
     print("\n使用说明:")
-    print("  1. 将 dist\\Word转PDF工具.exe 复制到任意位置")
+    if onedir:
+        print("  1. 将 dist\\Word转PDF工具 整个目录复制到任意位置")
+    else:
+        print("  1. 将 dist\\Word转PDF工具.exe 复制到任意位置")
     print("  2. 双击运行即可,无需安装Python")
     print("  3. 确保电脑已安装Microsoft Word")
     print("\n注意事项:")
@@ -0,0 +1,192 @@
+"""
+按内容寻址的PDF缓存
+以源文件内容哈希 + 转换后端 + 导出设置作为键保存转换结果，不同目录中内容相同的
+文档只需要转换一次，命中时通过reflink、硬链接或复制直接生成PDF。
+缓存总大小超过上限时按最近最少使用（LRU）淘汰。
+"""
+import os
+import sys
+import json
+import time
+import errno
+import shutil
+import hashlib
+import sqlite3
+import tempfile
+
+# 缓存默认上限 2GB
+DEFAULT_MAX_BYTES = 2 * 1024 * 1024 * 1024
+
+# 命中时生成PDF的方式: auto(先尝试reflink，失败则复制) / reflink / hardlink / copy
+LINK_MODES = ("auto", "reflink", "hardlink", "copy")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key        TEXT PRIMARY KEY,
+    size       INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_used  REAL NOT NULL,
+    hits       INTEGER NOT NULL DEFAULT 0
+)
+"""
+
+# Linux上的FICLONE ioctl编号
+_FICLONE = 0x40049409
+
+
+def default_cache_dir():
+    """默认缓存目录，可用环境变量W2P_CACHE_DIR指定"""
+    configured = os.environ.get("W2P_CACHE_DIR")
+    if configured:
+        return configured
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "word_to_pdf_converter", "cache")
+
+
+def _reflink(src, dst):
+    """写时复制克隆文件（Btrfs/XFS等），不支持时抛出OSError"""
+    try:
+        import fcntl
+    except ImportError:
+        raise OSError(errno.EOPNOTSUPP, "当前系统不支持reflink")
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        try:
+            fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+        except OSError:
+            fdst.close()
+            os.unlink(dst)
+            raise
+
+
+class ConversionCache:
+    """内容寻址的PDF缓存，可以被多个工作进程同时使用"""
+
+    def __init__(self, cache_dir=None, max_bytes=DEFAULT_MAX_BYTES, link_mode="auto"):
+        if link_mode not in LINK_MODES:
+            raise ValueError(f"未知的缓存链接方式: {link_mode}")
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.max_bytes = max_bytes
+        self.link_mode = link_mode
+        os.makedirs(os.path.join(self.cache_dir, "objects"), exist_ok=True)
+
+        self._conn = sqlite3.connect(os.path.join(self.cache_dir, "index.sqlite"),
+                                     timeout=30, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(_SCHEMA)
+
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(source_hash, backend, settings=None):
+        """缓存键：源文件哈希 + 后端 + 导出设置"""
+        settings_json = json.dumps(settings or {}, sort_keys=True)
+        raw = f"{source_hash}\0{backend}\0{settings_json}".encode("utf-8")
+        return hashlib.sha256(raw).hexdigest()
+
+    def _object_path(self, key):
+        return os.path.join(self.cache_dir, "objects", key[:2], key + ".pdf")
+
+    def _publish(self, cached, dst):
+        """把缓存中的PDF放到目标位置"""
+        # 先删除旧文件，避免通过硬链接改写缓存内容
+        if os.path.lexists(dst):
+            os.unlink(dst)
+
+        if self.link_mode in ("auto", "reflink"):
+            try:
+                _reflink(cached, dst)
+                return "reflink"
+            except OSError:
+                if self.link_mode == "reflink":
+                    raise
+        elif self.link_mode == "hardlink":
+            try:
+                os.link(cached, dst)
+                return "hardlink"
+            except OSError:
+                pass  # 跨磁盘等情况退回复制
+
+        shutil.copyfile(cached, dst)
+        return "copy"
+
+    def fetch(self, key, dst):
+        """缓存命中时生成dst并返回使用的方式（reflink/hardlink/copy），未命中返回None"""
+        cached = self._object_path(key)
+        row = self._conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None or not os.path.exists(cached):
+            self.misses += 1
+            return None
+
+        method = self._publish(cached, dst)
+        self._conn.execute("UPDATE entries SET last_used = ?, hits = hits + 1 WHERE key = ?",
+                           (time.time(), key))
+        self.hits += 1
+        return method
+
+    def store(self, key, pdf_path):
+        """把转换好的PDF复制进缓存（原子替换），然后按LRU淘汰超出上限的条目"""
+        size = os.path.getsize(pdf_path)
+        if self.max_bytes and size > self.max_bytes:
+            return
+
+        target = self._object_path(key)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        fd, temp = tempfile.mkstemp(dir=os.path.dirname(target), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as fdst, open(pdf_path, "rb") as fsrc:
+                shutil.copyfileobj(fsrc, fdst, 1024 * 1024)
+            os.chmod(temp, 0o644)  # mkstemp创建的文件只有所有者可读，硬链接时会带到输出文件
+            os.replace(temp, target)
+        except BaseException:
+            try:
+                os.unlink(temp)
+            except OSError:
+                pass
+            raise
+
+        now = time.time()
+        self._conn.execute(
+            "INSERT OR REPLACE INTO entries (key, size, created_at, last_used, hits) "
+            "VALUES (?, ?, ?, ?, 0)", (key, size, now, now))
+        self.evict()
+
+    def total_size(self):
+        return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def evict(self):
+        """淘汰最近最少使用的条目，直到总大小不超过上限"""
+        if not self.max_bytes:
+            return
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            excess = self.total_size() - self.max_bytes
+            removed = []
+            if excess > 0:
+                for key, size in self._conn.execute(
+                        "SELECT key, size FROM entries ORDER BY last_used"):
+                    removed.append(key)
+                    excess -= size
+                    if excess <= 0:
+                        break
+                self._conn.executemany("DELETE FROM entries WHERE key = ?",
+                                       [(key,) for key in removed])
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+
+        for key in removed:
+            try:
+                os.unlink(self._object_path(key))
+            except OSError:
+                pass
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses}
+
+    def close(self):
+        self._conn.close()
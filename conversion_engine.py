@@ -0,0 +1,998 @@
+"""
+并行转换引擎
+使用多个工作进程同时转换Word文档，每个进程拥有独立的COM套间和Office实例池。
+本模块不依赖tkinter，图形界面和其他入口都通过ConversionEngine进行转换。
+"""
+import os
+import sys
+import time
+import queue
+import signal
+import threading
+import subprocess
+import multiprocessing
+from contextlib import contextmanager
+
+from office_pool import HAS_WIN32COM, OfficeInstancePool
+from libreoffice_backend import LibreOfficeDispatcher, is_libreoffice_available
+import native_docx
+from conversion_manifest import hash_file, source_fingerprint
+from conversion_cache import ConversionCache
+from run_report import count_pdf_pages
+from scheduling import LongestJobFirst
+from source_staging import SourceStager
+from output_publisher import OutputPublisher
+from export_profiles import DEFAULT_EXPORT_PROFILE, export_arguments
+from pdf_optimizer import DEFAULT_JPEG_QUALITY, DEFAULT_MAX_DPI, HAS_PIKEPDF, PdfOptimizer
+
+# Office应用程序对应的COM ProgID
+OFFICE_PROG_IDS = {
+    "Word": "Word.Application",
+    "WPS": "KWPS.Application",  # 金山WPS文字
+}
+
+# 转换后端名称 -> 显示名称
+BACKEND_NAMES = {
+    "word": "Microsoft Word",
+    "wps": "WPS Office",
+    "libreoffice": "LibreOffice",
+    "sim": "模拟Office（测试用）",
+}
+
+# 错误提示中使用的应用名称
+BACKEND_LABELS = {"word": "Word", "wps": "WPS", "libreoffice": "LibreOffice", "sim": "模拟Office"}
+
+# 通过COM自动化的后端（需要pywin32）
+COM_BACKENDS = ("word", "wps")
+
+# 检测结果缓存时间（秒），避免每个文件都重新启动Office进行检测
+OFFICE_PROBE_TTL = 300
+
+# 单个文档的转换超时：基础时间 + 每MB增加的时间，不超过上限（秒）。
+# 可以用options中的同名键覆盖，timeout设为0表示不限制
+DEFAULT_TIMEOUT = 180
+DEFAULT_TIMEOUT_PER_MB = 20
+DEFAULT_TIMEOUT_MAX = 1800
+
+# 工作进程连续异常退出（中间没有完成任何文件）超过这个次数时不再重启
+MAX_CRASH_STREAK = 5
+
+# options["prewarm"]为True时，工作进程空闲多少秒检查一次Office实例是否需要预先启动或替换
+PREWARM_INTERVAL = 30
+
+# 调用不存在的COM方法时的错误码（DISP_E_MEMBERNOTFOUND、DISP_E_UNKNOWNNAME）
+MISSING_MEMBER_HRESULTS = (0x80020003, 0x80020006)
+
+_office_probe_lock = threading.Lock()
+_office_probe_cache = {}  # deep -> (检测时间, 可用应用列表)
+
+
+def _is_prog_id_registered(prog_id):
+    """通过注册表查询ProgID是否已注册（不启动应用程序）"""
+    try:
+        import winreg
+    except ImportError:
+        return False
+
+    try:
+        with winreg.OpenKey(winreg.HKEY_CLASSES_ROOT, prog_id + r"\CLSID") as key:
+            clsid = winreg.QueryValue(key, None)
+        # CLSID下必须有本地服务器，否则DispatchEx也无法创建实例
+        with winreg.OpenKey(winreg.HKEY_CLASSES_ROOT, "CLSID\\" + clsid + r"\LocalServer32"):
+            pass
+        return True
+    except OSError:
+        return False
+
+
+def _launch_office_app(prog_id):
+    """实际启动一次Office应用程序进行检测（较慢）"""
+    try:
+        import win32com.client
+        import pythoncom
+        pythoncom.CoInitialize()
+        app = win32com.client.DispatchEx(prog_id)
+        app.Quit()
+        return True
+    except:
+        return False
+    finally:
+        try:
+            import pythoncom
+            pythoncom.CoUninitialize()
+        except:
+            pass
+
+
+# 检测可用的Office应用程序
+def detect_office_apps(force=False, deep=False):
+    """检测系统中可用的Office应用程序
+
+    默认只查询注册表中的ProgID/CLSID，结果缓存OFFICE_PROBE_TTL秒。
+    deep=True时会实际启动一次应用程序确认可用；force=True时忽略缓存。
+    LibreOffice只检查soffice可执行文件是否存在。
+    """
+    with _office_probe_lock:
+        cached = _office_probe_cache.get(deep)
+        if not force and cached and time.time() - cached[0] < OFFICE_PROBE_TTL:
+            return list(cached[1])
+
+        available_apps = []
+        if HAS_WIN32COM:
+            probe = _launch_office_app if deep else _is_prog_id_registered
+            available_apps = [name for name, prog_id in OFFICE_PROG_IDS.items()
+                              if probe(prog_id)]
+        if is_libreoffice_available():
+            available_apps.append("LibreOffice")
+
+        _office_probe_cache[deep] = (time.time(), available_apps)
+        return list(available_apps)
+
+
+def invalidate_office_apps_cache():
+    """清除检测缓存（例如转换时发现应用程序未正确注册）"""
+    with _office_probe_lock:
+        _office_probe_cache.clear()
+
+
+def resolve_office_app(selected, available_apps):
+    """根据用户选择和可用应用确定实际使用的转换应用，返回word/wps/libreoffice/None"""
+    if selected == "auto":
+        # 自动模式：优先Word，其次WPS，最后LibreOffice
+        if "Word" in available_apps:
+            return "word"
+        if "WPS" in available_apps:
+            return "wps"
+        if "LibreOffice" in available_apps:
+            return "libreoffice"
+    elif selected == "word" and "Word" in available_apps:
+        return "word"
+    elif selected == "wps" and "WPS" in available_apps:
+        return "wps"
+    elif selected == "libreoffice" and "LibreOffice" in available_apps:
+        return "libreoffice"
+    return None
+
+
+def default_worker_count():
+    """默认的并行进程数：CPU核数，最多4个（每个进程都会启动一个Office）"""
+    return max(1, min(4, os.cpu_count() or 1))
+
+
+def describe_conversion_error(backend, error_str):
+    """分析常见错误原因，返回给用户的提示信息列表"""
+    app_label = BACKEND_LABELS.get(backend, backend)
+
+    if '此命令无效' in error_str or 'Command failed' in error_str:
+        if backend == "word":
+            return ["⚠ Word文档问题: 该文档可能包含:",
+                    "   - 缺失的字体或特殊字体",
+                    "   - 受保护的内容",
+                    "   - 损坏的格式",
+                    "建议: 手动用Word打开文档，更换字体后再试"]
+        return ["⚠ 文档问题: 该文档可能包含:",
+                "   - 缺失的字体或特殊字体",
+                "   - 受保护的内容",
+                "   - 损坏的格式",
+                f"建议: 手动用{app_label}打开文档检查"]
+    elif '没有注册类' in error_str or 'Class not registered' in error_str:
+        return [f"⚠ {app_label}未正确安装或注册"]
+    elif '访拒绝' in error_str or 'Access denied' in error_str:
+        return ["⚠ 文件权限问题或文件被占用"]
+    return [f"{app_label}转换错误: {error_str}"]
+
+
+def create_office_pool(backend, options, slot=0, generation=0):
+    """在工作进程中创建对应后端的Office实例池
+
+    slot为工作进程的序号，generation为该序号的工作进程被替换过几次（模拟后端的随机种子使用）。
+    """
+    pool_options = {
+        "max_documents": options.get("max_documents", 50),
+        "max_age": options.get("max_age", 600),
+    }
+    if backend == "sim":
+        from sim_office import FakeOfficeDispatcher, SimProfile
+        profile = SimProfile.from_env(worker=slot, generation=generation,
+                                      **options.get("sim_profile", {}))
+        dispatcher = FakeOfficeDispatcher(profile=profile)
+        return OfficeInstancePool(OFFICE_PROG_IDS["Word"], dispatch=dispatcher, **pool_options)
+
+    if backend == "libreoffice":
+        # 每个工作进程一个常驻的soffice监听进程
+        dispatcher = LibreOfficeDispatcher(options.get("soffice"))
+        return OfficeInstancePool("LibreOffice", dispatch=dispatcher, **pool_options)
+
+    prog_id = OFFICE_PROG_IDS["Word" if backend == "word" else "WPS"]
+    return OfficeInstancePool(prog_id, **pool_options)
+
+
+def document_timeout(size, options=None):
+    """根据文件大小计算转换超时（秒），返回None表示不限制"""
+    options = options or {}
+    base = options.get("timeout", DEFAULT_TIMEOUT)
+    if not base:
+        return None
+    per_mb = options.get("timeout_per_mb", DEFAULT_TIMEOUT_PER_MB)
+    limit = options.get("timeout_max", DEFAULT_TIMEOUT_MAX)
+    return min(base + per_mb * size / (1024 * 1024), max(base, limit))
+
+
+def office_pid(app):
+    """Office实例的进程ID，无法获取时返回None"""
+    pid = getattr(app, "pid", None)  # 模拟后端和LibreOffice后端
+    if pid is not None:
+        return pid
+    try:
+        import win32process
+        return win32process.GetWindowThreadProcessId(app.Hwnd)[1]
+    except Exception:
+        return None  # 旧版本Word/WPS没有Hwnd属性
+
+
+def kill_process_tree(pid):
+    """强制结束进程及其子进程"""
+    if not pid:
+        return
+    try:
+        if sys.platform == "win32":
+            subprocess.run(["taskkill", "/F", "/T", "/PID", str(pid)], timeout=30,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        elif os.getpgid(pid) == pid:
+            os.killpg(pid, signal.SIGKILL)  # 进程组组长（例如LibreOffice监听进程）
+        else:
+            os.kill(pid, signal.SIGKILL)
+    except (OSError, subprocess.SubprocessError):
+        pass  # 进程已经退出
+
+
+@contextmanager
+def _timed(stages, name):
+    """把代码块的耗时累加到stages[name]（stages为None时不记录）"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if stages is not None:
+            stages[name] = stages.get(name, 0.0) + time.perf_counter() - start
+
+
+def _is_missing_member(error):
+    """异常是否表示COM对象没有这个方法（旧版本Word/WPS没有ExportAsFixedFormat）"""
+    if isinstance(error, AttributeError):
+        return True
+    hresult = getattr(error, "hresult", None)  # pywintypes.com_error
+    if hresult is None and error.args and isinstance(error.args[0], int):
+        hresult = error.args[0]
+    return hresult is not None and hresult & 0xFFFFFFFF in MISSING_MEMBER_HRESULTS
+
+
+def convert_document(pool, backend, word_path, pdf_path, on_instance=None, stages=None,
+                     profile=DEFAULT_EXPORT_PROFILE):
+    """使用实例池中的Office实例转换单个文档，返回是否按导出配置导出，失败时抛出异常
+
+    on_instance(app)在取得Office实例后、打开文档前调用（用于上报进程ID）。
+    stages字典中会记录打开(open)、导出(export)和关闭(close)文档的耗时。
+    profile为export_profiles中的导出配置；不支持ExportAsFixedFormat的旧版本Word/WPS
+    改用SaveAs，此时返回False。
+    """
+    arguments = export_arguments(profile)
+    applied = True
+    if backend in COM_BACKENDS and not HAS_WIN32COM:
+        raise Exception("未安装pywin32库")
+
+    doc = None
+    with pool.instance() as app:
+        if on_instance is not None:
+            on_instance(app)
+        try:
+            open_options = {
+                "ConfirmConversions": False,
+                "ReadOnly": True,
+                "AddToRecentFiles": False,
+            }
+            if backend == "word":
+                open_options["Revert"] = False
+
+            # 打开文档，忽略缺失字体警告
+            with _timed(stages, "open"):
+                doc = app.Documents.Open(os.path.abspath(word_path), **open_options)
+
+            # 按导出配置导出PDF，没有ExportAsFixedFormat的旧版本Word/WPS退回SaveAs，
+            # 其他导出错误直接抛出
+            with _timed(stages, "export"):
+                try:
+                    doc.ExportAsFixedFormat(os.path.abspath(pdf_path), **arguments)
+                except Exception as e:
+                    if not _is_missing_member(e):
+                        raise
+                    applied = False
+                    try:
+                        # 尝试使用标准参数
+                        doc.SaveAs(
+                            os.path.abspath(pdf_path),
+                            FileFormat=17  # wdFormatPDF
+                        )
+                    except Exception:
+                        # 如果失败，使用最基本的参数
+                        doc.SaveAs(os.path.abspath(pdf_path), 17)
+
+            with _timed(stages, "close"):
+                doc.Close(False)  # 关闭文档不保存
+            doc = None
+        finally:
+            if doc is not None:
+                try:
+                    doc.Close(False)
+                except:
+                    pass
+    return applied
+
+
+def try_fast_path(task, result):
+    """简单的.docx直接生成PDF，返回是否已完成转换；失败时回退到Office"""
+    if not native_docx.HAS_NATIVE:
+        return False
+    source = task.get("staged") or task["src"]
+    simple, reason = native_docx.classify_docx(source)
+    result["complexity"] = reason
+    if not simple:
+        return False
+    try:
+        native_docx.render_docx_to_pdf(source, task.get("scratch") or task["dst"])
+    except Exception as e:
+        result["fast_path_error"] = str(e)
+        return False
+    result["engine"] = "native"
+    return True
+
+
+def optimize_settings(options):
+    """options["optimize"]对应的PdfOptimizer参数，不优化时返回None"""
+    optimize = options.get("optimize")
+    if not optimize or not HAS_PIKEPDF:
+        return None
+    settings = {"max_dpi": DEFAULT_MAX_DPI, "quality": DEFAULT_JPEG_QUALITY}
+    if isinstance(optimize, dict):
+        settings.update(optimize)
+    return settings
+
+
+def export_settings(options):
+    """影响输出PDF内容的设置，作为转换缓存键的一部分（包括优化设置，缓存的是优化后的PDF）"""
+    return {"fast_path": bool(options.get("fast_path")),
+            "profile": options.get("export_profile") or DEFAULT_EXPORT_PROFILE,
+            "optimize": optimize_settings(options)}
+
+
+def create_cache(options):
+    """根据options["cache"]在工作进程中打开转换缓存，未启用时返回None"""
+    cache_options = options.get("cache")
+    if not cache_options:
+        return None
+    if cache_options is True:
+        cache_options = {}
+    return ConversionCache(**cache_options)
+
+
+def convert_task(pool, backend, task, options=None, cache=None, on_instance=None):
+    """执行一个转换任务，返回结果字典
+
+    task["staged"]为父进程预取到本地的源文件副本，存在时从副本读取；
+    task["scratch"]为本地导出路径，存在时PDF先写到这里，由父进程写回目标路径。
+    结果中仍记录原路径。
+    """
+    options = options or {}
+    source = task.get("staged") or task["src"]
+    output = task.get("scratch") or task["dst"]
+    result = {
+        "type": "result",
+        "id": task["id"],
+        "src": task["src"],
+        "dst": task["dst"],
+        "backend": backend,
+        "engine": backend,
+        "worker": os.getpid(),
+    }
+    for key in ("predicted", "features"):
+        if key in task:
+            result[key] = task[key]  # 供耗时预测模型记录样本
+    if options.get("fingerprint") or cache is not None:
+        # 增量清单需要转换前的源文件状态，避免转换期间文件被修改
+        try:
+            result.update(source_fingerprint(task["src"], content_path=source))
+        except OSError:
+            pass
+
+    cache_key = None
+    settings = export_settings(options)
+    if cache is not None and "source_hash" in result:
+        cache_key = cache.make_key(result["source_hash"], backend, settings)
+
+    # 分阶段耗时：Office相关阶段见convert_document和实例池，write为写入缓存和计算输出哈希
+    stages = {}
+    start = time.perf_counter()
+    try:
+        method = None
+        if cache_key is not None:
+            try:
+                with _timed(stages, "cache"):
+                    method = cache.fetch(cache_key, output)
+            except Exception:
+                method = None
+        if method:
+            # 内容相同的文档之前已经转换过，直接复用缓存的PDF
+            result["cache_hit"] = True
+            result["cache_method"] = method
+            result["engine"] = "cache"
+        else:
+            if cache is not None and os.path.exists(output) and os.stat(output).st_nlink > 1:
+                # 旧的PDF可能是缓存的硬链接，先断开，避免覆盖写入时改动缓存
+                os.unlink(output)
+            with _timed(stages, "native"):
+                converted = options.get("fast_path") and try_fast_path(task, result)
+            if not converted:
+                del stages["native"]
+                profile = options.get("export_profile") or DEFAULT_EXPORT_PROFILE
+                try:
+                    applied = convert_document(pool, backend, source, output, on_instance, stages,
+                                               profile=profile)
+                finally:
+                    stages.update(pool.take_stage_times())
+                # 用于在运行报告中比较各导出配置的耗时和PDF大小（不支持时记为saveas）
+                result["profile"] = profile if applied else "saveas"
+            if cache_key is not None:
+                result["cache_hit"] = False
+                if settings["optimize"]:
+                    # PDF还要在优化进程中处理，由PdfOptimizer把优化后的PDF写入缓存
+                    result["cache_key"] = cache_key
+                else:
+                    try:
+                        with _timed(stages, "write"):
+                            cache.store(cache_key, output)
+                    except Exception:
+                        pass  # 缓存写入失败不影响转换结果
+        result["status"] = "ok"
+    except Exception as e:
+        error_str = str(e)
+        result["status"] = "failed"
+        result["error"] = error_str
+        result["hints"] = describe_conversion_error(backend, error_str)
+        result["not_registered"] = '没有注册类' in error_str or 'Class not registered' in error_str
+    result["duration"] = round(time.perf_counter() - start, 4)
+
+    if options.get("fingerprint") and result["status"] == "ok":
+        try:
+            with _timed(stages, "write"):
+                result["output_hash"] = hash_file(output)
+        except OSError:
+            pass
+    result["stages"] = {name: round(seconds, 4) for name, seconds in stages.items()}
+
+    if result["status"] == "ok":
+        result["pages"] = count_pdf_pages(output)
+        try:
+            result["size"] = os.path.getsize(output)
+        except OSError:
+            pass
+    return result
+
+
+def _warm_pool(pool):
+    try:
+        pool.warm()
+    except Exception:
+        pass  # 启动失败时由下一个文件报告错误
+    pool.take_stage_times()  # 预热的耗时不计入下一个文件
+
+
+def _worker_main(worker_id, backend, options, task_queue, result_queue, slot=0, generation=0):
+    """工作进程入口：独立的COM套间和Office实例池，从共享队列中取任务"""
+    # Ctrl+C由父进程统一处理（停止分发任务，等正在转换的文件完成）
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    pool = create_office_pool(backend, options, slot, generation)
+    cache = create_cache(options)
+
+    def report_instance(app):
+        # 父进程在转换超时时按这个进程ID结束卡住的Office
+        result_queue.put({"type": "office", "worker": worker_id, "pid": office_pid(app)})
+
+    # 监视模式下文件随时可能到达：预先启动Office，空闲时替换过期的实例
+    prewarm = options.get("prewarm", False)
+    if prewarm:
+        _warm_pool(pool)
+
+    try:
+        while True:
+            try:
+                task = task_queue.get(timeout=PREWARM_INTERVAL if prewarm else None)
+            except queue.Empty:
+                _warm_pool(pool)
+                continue
+            if task is None:
+                break
+            result_queue.put({"type": "started", "id": task["id"], "worker": worker_id})
+            result = convert_task(pool, backend, task, options, cache, report_instance)
+            result["worker"] = worker_id
+            result_queue.put(result)
+    finally:
+        pool.close()
+        if cache is not None:
+            cache.close()
+        result_queue.put({"type": "exit", "worker": worker_id, "pool": pool.stats()})
+
+
+class ConversionEngine:
+    """多进程转换引擎
+
+    用法:
+        engine = ConversionEngine("word", workers=4)
+        engine.start()
+        engine.submit(src, dst)
+        engine.finish_input()
+        for result in engine.results():
+            ...
+        engine.close()
+
+    任务先进入父进程的待处理队列，只有少量任务会被放进共享工作队列，
+    这样停止时可以立即丢弃尚未开始的任务。单个工作进程异常退出时，
+    它正在处理的文件记为失败并自动补充新的工作进程，不会中断整批转换。
+    文件转换超时（例如Office弹出对话框卡住）时，结束对应的Office进程和工作进程，
+    文件记为timeout，再补充新的工作进程。
+    """
+
+    def __init__(self, backend, workers=1, options=None, on_started=None,
+                 scheduler=None, prefetch=None):
+        self.backend = backend
+        self.workers = max(1, int(workers))
+        self.options = dict(options or {})
+        self.on_started = on_started  # 工作进程开始转换某个任务时调用（在results()所在线程中）
+        # 除正在转换的任务外最多预先放进共享队列的任务数。预取越少，
+        # 调度器越晚决定下一个任务，后到的高优先级任务等待越短
+        self.prefetch = self.workers if prefetch is None else max(0, int(prefetch))
+
+        self._ctx = multiprocessing.get_context("spawn")
+        self._task_queue = None
+        self._result_queue = None
+        self._processes = {}  # worker_id -> Process
+        self._next_worker_id = 0
+        self._slots = {}  # worker_id -> 序号（0..workers-1），替换的工作进程沿用原来的序号
+        self._generations = {}  # 序号 -> 该序号的工作进程被替换过几次
+
+        self._lock = threading.Lock()
+        self._pending = scheduler if scheduler is not None else LongestJobFirst()  # 等待分发的任务
+        self._tasks = {}  # 任务id -> 任务
+        self._running = {}  # worker_id -> 正在处理的任务id
+        self._deadlines = {}  # worker_id -> (超时时刻, 超时秒数)
+        self._office_pids = {}  # worker_id -> 正在使用的Office进程ID
+        self._crash_streak = 0
+        self._abort = False
+        self._in_flight = 0
+        self._next_task_id = 0
+        self._input_finished = False
+        self._stopped = False
+        self._stager = None  # 网络共享上的源文件预取到本地（start()中创建）
+        self._publisher = None  # 网络共享上的PDF先导出到本地再写回（start()中创建）
+        self._publishing = 0  # 已转换完成、正在写回的文件数
+        self._optimizer = None  # 转换完成的PDF在单独的进程池中优化（start()中创建）
+        self._optimizing = 0  # 正在优化的文件数
+
+        self.pool_stats = {"hits": 0, "misses": 0, "restarts": 0, "startup_time": 0.0, "quit_time": 0.0}
+        self.worker_crashes = 0
+        self.timeouts = 0
+
+    def start(self):
+        """启动工作进程"""
+        self._task_queue = self._ctx.Queue()
+        self._result_queue = self._ctx.Queue()
+        staging = self.options.get("staging", True)
+        if staging:
+            try:
+                self._stager = SourceStager(**(staging if isinstance(staging, dict) else {}))
+            except OSError:
+                self._stager = None  # 无法创建本地目录时直接从网络路径转换
+        write_behind = self.options.get("write_behind", True)
+        if write_behind:
+            try:
+                self._publisher = OutputPublisher(**(write_behind if isinstance(write_behind, dict) else {}))
+            except OSError:
+                self._publisher = None  # 无法创建本地目录时直接保存到目标路径
+        optimize = optimize_settings(self.options)
+        if optimize is not None:
+            # 启用了转换缓存时，优化后的PDF由优化进程写入缓存（参数与create_cache相同）
+            cache = self.options.get("cache")
+            cache = {} if cache is True else (cache or None)
+            self._optimizer = PdfOptimizer(cache=cache, **optimize)
+        for slot in range(self.workers):
+            self._spawn_worker(slot)
+
+    def _spawn_worker(self, slot):
+        worker_id = self._next_worker_id
+        self._next_worker_id += 1
+        generation = self._generations.get(slot, -1) + 1
+        self._generations[slot] = generation
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(worker_id, self.backend, self.options, self._task_queue, self._result_queue,
+                  slot, generation),
+            daemon=True,
+        )
+        process.start()
+        self._processes[worker_id] = process
+        self._slots[worker_id] = slot
+
+    def submit(self, src, dst, cost=None, **extra):
+        """提交一个转换任务（可在任意线程中调用），返回任务id；已停止时忽略并返回None
+
+        cost为预测的转换耗时（秒），默认调度器让预测耗时长的任务先分发（最长作业优先），
+        避免大文档最后才开始而拖长整批转换；不提供时按提交顺序分发。
+        extra中的字段（例如lane/tenant/job）保存在任务中供调度器使用。
+        """
+        with self._lock:
+            if self._stopped:
+                return None
+            task_id = self._next_task_id
+            self._next_task_id += 1
+            task = dict(extra, id=task_id, src=src, dst=dst, queued_at=time.monotonic())
+            if cost is not None:
+                task["predicted"] = cost
+            self._tasks[task_id] = task
+            self._pending.push(task)
+        return task_id
+
+    def finish_input(self):
+        """表示不会再提交新任务"""
+        with self._lock:
+            self._input_finished = True
+
+    def stop(self):
+        """停止转换：丢弃尚未开始的任务，等待正在转换的文件完成"""
+        with self._lock:
+            self._stopped = True
+            for task in self._pending.clear():
+                self._tasks.pop(task["id"], None)
+            # 已经放进共享队列但还没有被工作进程取走的任务也一并丢弃
+            while self._task_queue is not None and self._in_flight:
+                try:
+                    task = self._task_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if task is None:
+                    self._task_queue.put(None)  # close()发出的退出信号，放回去
+                    break
+                task = self._tasks.pop(task["id"], task)
+                self._pending.task_done(task)
+                self._release_staged(task)
+                self._in_flight -= 1
+        if self._stager is not None:
+            self._stager.drop_pending()  # 等待复制的任务由_dispatch丢弃
+
+    def abort(self):
+        """强制停止：丢弃未开始的任务，立即结束所有Office和工作进程，没有完成的文件记为失败"""
+        self.stop()
+        self._abort = True
+
+    def pending_count(self):
+        with self._lock:
+            return len(self._pending) + self._in_flight
+
+    def cancel(self, job):
+        """取消某个批次中尚未分发的任务，返回被取消的任务（正在转换的文件会继续完成）"""
+        with self._lock:
+            removed = self._pending.remove(job)
+            for task in removed:
+                self._tasks.pop(task["id"], None)
+        return removed
+
+    def scheduler_stats(self):
+        with self._lock:
+            return self._pending.stats()
+
+    @property
+    def staging_stats(self):
+        """源文件预取统计（未启用时为空字典）"""
+        return dict(self._stager.stats) if self._stager is not None else {}
+
+    @property
+    def publish_stats(self):
+        """PDF写回统计，depth为等待和正在写回的文件数（未启用时为空字典）"""
+        if self._publisher is None:
+            return {}
+        return dict(self._publisher.stats, depth=self._publisher.depth)
+
+    @property
+    def optimize_stats(self):
+        """PDF优化统计（未启用时为空字典）"""
+        return dict(self._optimizer.stats) if self._optimizer is not None else {}
+
+    def _release_staged(self, task, keep_output=False):
+        """删除任务的本地源文件副本；keep_output=False时同时删除本地导出的PDF"""
+        if self._stager is not None:
+            self._stager.release(task)
+        if not keep_output and "scratch" in task:
+            self._publisher.discard(task["scratch"])
+
+    def _task_finished(self, task_id, default=None, keep_output=False):
+        """已分发的任务结束：从任务表中删除、通知调度器并删除本地副本"""
+        with self._lock:
+            task = self._tasks.pop(task_id, None)
+            if task is None:
+                return default
+            self._pending.task_done(task)
+        self._release_staged(task, keep_output)
+        return task
+
+    def _fill(self):
+        """把待处理任务放进共享工作队列，保持每个进程最多一个预取任务
+
+        网络共享上的文件先交给预取线程复制到本地，复制完成后再放进共享队列，
+        复制和前面文件的转换同时进行。
+        """
+        with self._lock:
+            while self._in_flight < self.workers + self.prefetch:
+                task = self._pending.pop()
+                if task is None:
+                    break
+                self._in_flight += 1
+                if self._publisher is not None and self._publisher.wants(task["dst"]):
+                    task["scratch"] = self._publisher.scratch_path(task)
+                if self._stager is not None and self._stager.wants(task["src"]):
+                    self._stager.stage(task, self._dispatch)
+                else:
+                    self._task_queue.put(task)
+
+    def _published(self, result):
+        """写回完成（在写回线程中调用）：通过结果队列交给results()"""
+        result_queue = self._result_queue
+        if result_queue is not None:
+            result_queue.put({"type": "published", "result": result})
+
+    def _optimized(self, result, path):
+        """优化完成（在进程池的回调线程中调用）：通过结果队列交给results()"""
+        result_queue = self._result_queue
+        if result_queue is not None:
+            result_queue.put({"type": "optimized", "result": result, "path": path})
+
+    def _dispatch(self, task):
+        """预取完成（在预取线程中调用）：放进共享队列；引擎已停止时丢弃"""
+        with self._lock:
+            if not self._stopped and task["id"] in self._tasks:
+                self._task_queue.put(task)
+                return
+            if self._tasks.pop(task["id"], None) is not None:
+                self._pending.task_done(task)
+                self._in_flight -= 1
+        self._release_staged(task)
+
+    def _is_done(self):
+        with self._lock:
+            if self._in_flight or self._publishing or self._optimizing:
+                return False
+            return self._stopped or (self._input_finished and not len(self._pending))
+
+    def _check_workers(self):
+        """检查异常退出的工作进程，把它正在处理的文件记为失败并补充新进程"""
+        failed = []
+        for worker_id, process in list(self._processes.items()):
+            if process.is_alive():
+                continue
+            del self._processes[worker_id]
+            slot = self._slots.pop(worker_id)
+            self.worker_crashes += 1
+            self._deadlines.pop(worker_id, None)
+            self._office_pids.pop(worker_id, None)
+            task_id = self._running.pop(worker_id, None)
+            if task_id is not None:
+                failed.append(self._crash_result(task_id, worker_id, process.exitcode))
+            self._crash_streak += 1  # 收到转换结果时清零
+            if not self._stopped:
+                self._spawn_worker(slot)
+
+        if self._crash_streak >= max(MAX_CRASH_STREAK, self.workers * 2) and not self._stopped:
+            # 工作进程一启动就退出（例如Office无法创建）或每个文件都崩溃，不再无限重启
+            failed.extend(self._fail_remaining("工作进程反复异常退出，已停止转换"))
+        return failed
+
+    def _fail_remaining(self, error):
+        """停止引擎，把尚未完成的任务全部记为失败"""
+        with self._lock:
+            self._stopped = True
+            self._pending.clear()
+            self._in_flight = 0
+            tasks = list(self._tasks.items())
+            self._tasks = {}
+        for _, task in tasks:
+            self._release_staged(task)
+        for pid in self._office_pids.values():
+            kill_process_tree(pid)
+        for process in self._processes.values():
+            process.kill()
+        self._running = {}
+        self._deadlines = {}
+        self._office_pids = {}
+        return [{
+            "type": "result", "id": task_id, "src": task["src"], "dst": task["dst"],
+            "backend": self.backend, "worker": None, "status": "failed",
+            "error": error, "hints": [f"⚠ {error}"], "duration": 0.0,
+        } for task_id, task in tasks]
+
+    def _check_timeouts(self):
+        """结束转换超时的Office进程和工作进程，返回超时结果"""
+        if not self._deadlines:
+            return []
+        now = time.monotonic()
+        expired = [worker_id for worker_id, (deadline, _) in self._deadlines.items()
+                   if now >= deadline]
+        results = []
+        for worker_id in expired:
+            _, timeout = self._deadlines.pop(worker_id)
+            task_id = self._running.pop(worker_id, None)
+            process = self._processes.pop(worker_id, None)
+            slot = self._slots.pop(worker_id, None)
+            kill_process_tree(self._office_pids.pop(worker_id, None))
+            if process is not None:
+                process.kill()
+                process.join(timeout=5)
+            if not self._stopped and slot is not None:
+                self._spawn_worker(slot)
+            if task_id is None:
+                continue
+
+            task = self._task_finished(task_id, {"src": "", "dst": ""})
+            with self._lock:
+                self._in_flight -= 1
+            self.timeouts += 1
+            error = f"转换超时（超过 {timeout:.0f} 秒），已结束Office进程"
+            results.append({
+                "type": "result", "id": task_id, "src": task["src"], "dst": task["dst"],
+                "backend": self.backend, "worker": worker_id, "status": "timeout",
+                "timed_out": True, "error": error, "hints": [f"⚠ {error}"],
+                "duration": round(timeout, 4),
+            })
+        return results
+
+    def _start_deadline(self, worker_id, task_id):
+        task = self._tasks.get(task_id)
+        try:
+            size = os.path.getsize(task["src"]) if task else 0
+        except OSError:
+            size = 0
+        timeout = document_timeout(size, self.options)
+        if timeout is None:
+            self._deadlines[worker_id] = (float("inf"), None)  # 不限制
+        else:
+            self._deadlines[worker_id] = (time.monotonic() + timeout, timeout)
+
+    def _crash_result(self, task_id, worker_id, exitcode):
+        task = self._task_finished(task_id, {"src": "", "dst": ""})
+        with self._lock:
+            self._in_flight -= 1
+        error = f"工作进程异常退出 (exitcode={exitcode})"
+        return {
+            "type": "result", "id": task_id, "src": task["src"], "dst": task["dst"],
+            "backend": self.backend, "worker": worker_id, "status": "failed",
+            "error": error, "hints": [f"⚠ {error}"], "duration": 0.0,
+        }
+
+    def results(self):
+        """按完成顺序逐个返回转换结果，直到所有任务完成或被停止"""
+        while True:
+            self._fill()
+            if self._is_done():
+                return
+
+            if self._abort and self._tasks:
+                # 强制停止：结束所有Office和工作进程，而不只是已经报告开始转换的进程。
+                # 单独结束一个进程时它可能正持有结果队列的写锁，其他进程的消息再也发不出来
+                for result in self._fail_remaining("已强制停止"):
+                    yield result
+            for result in self._check_timeouts():
+                yield result
+
+            try:
+                message = self._result_queue.get(timeout=0.2)
+            except queue.Empty:
+                for result in self._check_workers():
+                    yield result
+                continue
+
+            kind = message.get("type")
+            if kind == "published":
+                with self._lock:
+                    self._publishing -= 1
+                yield message["result"]
+                continue
+            if kind == "optimized":
+                with self._lock:
+                    self._optimizing -= 1
+                result = message["result"]
+                if message["path"] != result["dst"]:
+                    # 本地导出的PDF优化后再写回，写回的数据更少
+                    with self._lock:
+                        self._publishing += 1
+                    self._publisher.publish(result, message["path"], self._published)
+                    continue
+                yield result
+                continue
+            if message.get("worker") not in self._processes and kind in ("started", "office", "result"):
+                continue  # 已经因超时被结束的工作进程发出的消息
+            if kind == "started":
+                self._running[message["worker"]] = message["id"]
+                self._start_deadline(message["worker"], message["id"])
+                task = self._tasks.get(message["id"])
+                if task is not None:
+                    task["started_at"] = time.monotonic()
+                if self.on_started is not None and task is not None:
+                    self.on_started(task)
+            elif kind == "office":
+                self._office_pids[message["worker"]] = message["pid"]
+            elif kind == "result":
+                self._crash_streak = 0
+                self._running.pop(message["worker"], None)
+                self._deadlines.pop(message["worker"], None)
+                self._office_pids.pop(message["worker"], None)
+                publish = message.get("status") == "ok"
+                cache_key = message.pop("cache_key", None)
+                task = self._task_finished(message["id"], keep_output=publish)
+                with self._lock:
+                    self._in_flight -= 1
+                if task is not None and "started_at" in task:
+                    message["queue_wait"] = round(task["started_at"] - task["queued_at"], 4)
+                if task is not None and "staging_time" in task:
+                    message["staging_time"] = task["staging_time"]  # 与前面文件的转换重叠，不计入stages
+                if message.get("not_registered"):
+                    invalidate_office_apps_cache()
+                if publish and task is not None and self._optimizer is not None and not message.get("cache_hit"):
+                    # 工作进程已经空闲，PDF在优化进程中处理，完成后再写回或返回结果（缓存命中的PDF已经优化过）
+                    with self._lock:
+                        self._optimizing += 1
+                    self._optimizer.optimize(message, task.get("scratch") or message["dst"], self._optimized,
+                                             cache_key=cache_key)
+                    continue
+                if publish and task is not None and "scratch" in task:
+                    # 工作进程已经空闲，PDF在后台写回，写完后才返回结果
+                    with self._lock:
+                        self._publishing += 1
+                    self._publisher.publish(message, task["scratch"], self._published)
+                    continue
+                yield message
+            elif kind == "exit":
+                self._collect_pool_stats(message)
+
+    def _collect_pool_stats(self, message):
+        for key in self.pool_stats:
+            self.pool_stats[key] += message["pool"].get(key, 0)
+
+    def close(self, timeout=30):
+        """通知所有工作进程退出，并收集Office实例池统计"""
+        if self._task_queue is None:
+            return
+        for _ in self._processes:
+            self._task_queue.put(None)
+
+        deadline = time.monotonic() + timeout
+        alive = set(self._processes)
+        while alive and time.monotonic() < deadline:
+            try:
+                message = self._result_queue.get(timeout=0.2)
+            except queue.Empty:
+                alive = {w for w in alive if self._processes[w].is_alive()}
+                continue
+            if message.get("type") == "exit":
+                self._collect_pool_stats(message)
+                alive.discard(message["worker"])
+
+        for process in self._processes.values():
+            process.join(timeout=max(0.1, deadline - time.monotonic()))
+            if process.is_alive():
+                process.terminate()
+                process.join(timeout=5)
+        self._processes = {}
+        self._task_queue = None
+        self._result_queue = None
+        if self._stager is not None:
+            self._stager.close()
+        if self._optimizer is not None:
+            self._optimizer.close()
+        if self._publisher is not None:
+            self._publisher.close()
@@ -0,0 +1,152 @@
+"""
+增量转换清单
+在输出目录中用SQLite记录每个源文件的大小、修改时间、内容哈希、转换后端和PDF哈希，
+再次运行时只转换新增或修改过的文档，以及换了转换后端或PDF被改动过的文档。
+"""
+import os
+import mmap
+import time
+import hashlib
+import sqlite3
+import threading
+
+MANIFEST_NAME = ".w2p_manifest.sqlite"
+
+# 每隔多少条记录提交一次事务
+COMMIT_EVERY = 200
+
+# 超过这个大小的文件使用内存映射计算哈希
+MMAP_THRESHOLD = 64 * 1024 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    source       TEXT PRIMARY KEY,
+    size         INTEGER NOT NULL,
+    mtime_ns     INTEGER NOT NULL,
+    source_hash  TEXT NOT NULL,
+    backend      TEXT,
+    output       TEXT NOT NULL,
+    output_hash  TEXT,
+    converted_at REAL NOT NULL
+)
+"""
+
+
+def hash_file(path, chunk_size=1024 * 1024):
+    """计算文件的SHA-256，小文件分块读取，大文件使用内存映射，不会一次性读入整个文件"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size >= MMAP_THRESHOLD:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                digest.update(mapped)
+            return digest.hexdigest()
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def source_fingerprint(path, content_path=None):
+    """转换前记录源文件的大小、修改时间和哈希（在工作进程中计算）
+
+    content_path为源文件的本地副本，存在时从副本计算哈希，避免再次经过网络读取。
+    """
+    st = os.stat(path)
+    return {
+        "source_size": st.st_size,
+        "source_mtime_ns": st.st_mtime_ns,
+        "source_hash": hash_file(content_path or path),
+    }
+
+
+class ConversionManifest:
+    """输出目录中的转换清单（可以在扫描线程和转换线程中同时使用）
+
+    backend为本次使用的转换后端，与记录的后端不同的文件需要重新转换（None表示不比较）。
+    """
+
+    def __init__(self, root, name=MANIFEST_NAME, backend=None):
+        self.root = os.path.abspath(root)
+        self.backend = backend
+        self.path = os.path.join(self.root, name)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._lock = threading.RLock()
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(_SCHEMA)
+        self._conn.commit()
+        self._uncommitted = 0
+
+    def _key(self, src):
+        """清单中使用相对于输出根目录的路径，目录整体移动后仍然有效"""
+        path = os.path.abspath(src)
+        try:
+            path = os.path.relpath(path, self.root)
+        except ValueError:
+            pass  # 不同盘符
+        return os.path.normcase(path)
+
+    def needs_conversion(self, src, dst):
+        """判断文件是否需要转换，返回 (是否需要, 原因)"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size, mtime_ns, source_hash, backend, output_hash FROM files WHERE source = ?",
+                (self._key(src),)).fetchone()
+        if row is None:
+            return True, "新文件"
+        if not os.path.exists(dst):
+            return True, "PDF不存在"
+
+        size, mtime_ns, source_hash, backend, output_hash = row
+        if self.backend is not None and backend != self.backend:
+            return True, "转换后端已改变"
+        st = os.stat(src)
+        if st.st_size != size:
+            return True, "文件已修改"
+        if output_hash is not None and hash_file(dst) != output_hash:
+            return True, "PDF已改变"
+        if st.st_mtime_ns == mtime_ns:
+            return False, "未修改"
+
+        # 修改时间变了但大小相同（例如复制或touch），再比较内容哈希
+        if hash_file(src) != source_hash:
+            return True, "文件已修改"
+        with self._lock:
+            self._conn.execute("UPDATE files SET mtime_ns = ? WHERE source = ?",
+                               (st.st_mtime_ns, self._key(src)))
+            self._changed()
+        return False, "内容未变"
+
+    def record(self, result):
+        """记录一个转换成功的结果（需要包含source_fingerprint()的字段）"""
+        if "source_hash" not in result:
+            result = dict(result, **source_fingerprint(result["src"]))
+        output_hash = result.get("output_hash")
+        if output_hash is None and os.path.exists(result["dst"]):
+            output_hash = hash_file(result["dst"])
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (self._key(result["src"]), result["source_size"], result["source_mtime_ns"],
+                 result["source_hash"], result.get("backend"),
+                 os.path.abspath(result["dst"]), output_hash, time.time()))
+            self._changed()
+
+    def _changed(self):
+        self._uncommitted += 1
+        if self._uncommitted >= COMMIT_EVERY:
+            self.commit()
+
+    def commit(self):
+        with self._lock:
+            self._conn.commit()
+            self._uncommitted = 0
+
+    def close(self):
+        with self._lock:
+            self.commit()
+            self._conn.close()
@@ -0,0 +1,888 @@
+"""
+HTTP转换服务
+在转换引擎之上提供本地HTTP接口，其他程序不需要图形界面就可以把Word文档转换为PDF。
+
+接口:
+    POST /convert?name=a.docx[&sync=1]   请求体为文档内容（边接收边写入磁盘）
+    POST /convert   Content-Type: application/json，{"path": "共享存储上的文档", "output": "可选的PDF路径"}
+    GET  /jobs/<id>        任务状态（JSON）
+    GET  /jobs/<id>/pdf    下载PDF（分块发送，不读入内存）
+    DELETE /jobs/<id>      删除任务及其临时文件
+    POST /batches   Content-Type: application/json，{"folder": "目录"} 或 {"paths": [...]}，可选"out"
+    GET  /batches/<id>     批次进度和排队时间
+    DELETE /batches/<id>   取消批次中还没有开始的文件
+    GET  /health           健康检查
+    GET  /metrics          队列、吞吐量和延迟统计（JSON）
+
+等待和正在转换的任务数（包括批次中的文件）达到上限时返回429（带Retry-After），
+调用方稍后重试，服务不会因为积压过多的上传文件而耗尽磁盘或内存。批次只提交队列还能
+容纳的文件，其余文件记为rejected。sync=1时等转换完成后直接返回PDF（最多等待转换超时
+加SYNC_WAIT_GRACE秒，超过时返回202和任务地址），否则立即返回202和任务id。
+
+多个团队共用服务时按团队（X-Tenant请求头或tenant参数）公平分配转换进程：
+单个文档走交互通道优先转换，批量任务在团队之间按权重、在同一团队的批次之间平均轮流，
+大批量任务运行时小任务的排队时间仍然很短。
+"""
+import os
+import json
+import time
+import uuid
+import shutil
+import tempfile
+import threading
+import collections
+from urllib.parse import urlsplit, parse_qs, quote
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from conversion_engine import DEFAULT_TIMEOUT_MAX, ConversionEngine, document_timeout
+from folder_scanner import is_word_file, scan_word_files
+from run_report import percentile
+from scheduling import BATCH, DEFAULT_TENANT, INTERACTIVE, FairShareScheduler
+
+# 等待和正在转换的任务数上限（默认值）
+DEFAULT_QUEUE_SIZE = 32
+
+# 上传文件大小上限（字节）
+DEFAULT_MAX_UPLOAD = 200 * 1024 * 1024
+
+# 上传和下载时每次读写的字节数
+CHUNK_SIZE = 1024 * 1024
+
+# JSON请求体的大小上限
+MAX_JSON_BODY = 64 * 1024
+
+# 同步请求在转换超时之外多等待的秒数（排队时间），超过后返回202
+SYNC_WAIT_GRACE = 60
+
+# 完成的任务保留多久（秒）后自动删除临时文件
+JOB_TTL = 3600
+
+# 延迟统计使用最近多少个任务
+LATENCY_WINDOW = 1000
+
+CONTENT_TYPES = {
+    "application/msword": ".doc",
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document": ".docx",
+}
+
+QUEUED = "queued"
+RUNNING = "running"
+FINISHED_STATES = ("ok", "failed", "timeout")
+
+# 团队名称的最大长度
+MAX_TENANT_LENGTH = 64
+
+
+class QueueFullError(RuntimeError):
+    """转换队列已满（调用方应返回429）"""
+
+
+def default_spool_dir():
+    """上传文件和生成的PDF的临时目录，可用环境变量W2P_SPOOL_DIR指定"""
+    return os.environ.get("W2P_SPOOL_DIR") or os.path.join(tempfile.gettempdir(), "w2p_service")
+
+
+def _summary(values):
+    """已排序数值的次数、p50、p95和最大值"""
+    if not values:
+        return {"count": 0}
+    return {"count": len(values), "p50": round(percentile(values, 0.5), 4),
+            "p95": round(percentile(values, 0.95), 4), "max": round(values[-1], 4)}
+
+
+class Job:
+    """一个转换任务"""
+
+    def __init__(self, job_id, src, dst, name, spool=None, tenant=DEFAULT_TENANT, lane=INTERACTIVE):
+        self.id = job_id
+        self.src = src
+        self.dst = dst
+        self.name = name
+        self.spool = spool  # 上传任务的临时目录，删除任务时一起删除
+        self.tenant = tenant
+        self.lane = lane
+        self.status = QUEUED
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.duration = None
+        self.pages = None
+        self.done = threading.Event()
+
+    def to_dict(self):
+        data = {
+            "id": self.id,
+            "name": self.name,
+            "status": self.status,
+            "tenant": self.tenant,
+            "lane": self.lane,
+            "created": round(self.created, 3),
+        }
+        if self.started is not None:
+            data["started"] = round(self.started, 3)
+            data["queue_wait"] = round(self.started - self.created, 4)
+        if self.finished is not None:
+            data["finished"] = round(self.finished, 3)
+            data["latency"] = round(self.finished - self.created, 4)
+        if self.duration is not None:
+            data["duration"] = self.duration
+        if self.pages:
+            data["pages"] = self.pages
+        if self.error:
+            data["error"] = self.error
+        if self.status == "ok":
+            data["pdf_url"] = f"/jobs/{self.id}/pdf"
+            if self.spool is None:
+                data["output"] = self.dst
+        return data
+
+
+class Batch:
+    """一批文件（一个目录或一组路径），作为一个整体参与公平调度"""
+
+    def __init__(self, batch_id, tenant):
+        self.id = batch_id
+        self.tenant = tenant
+        self.created = time.time()
+        self.finished = None
+        self.scanning = True
+        self.stopped = False
+        self.submitted = 0
+        self.cancelled = 0
+        self.rejected = 0  # 队列已满而没有提交的文件
+        self.counts = collections.Counter()
+        self.waits = []  # 每个文件的排队时间（秒）
+        self.last_error = None
+
+    @property
+    def done(self):
+        completed = sum(self.counts[state] for state in FINISHED_STATES)
+        return not self.scanning and completed + self.cancelled >= self.submitted
+
+    def add_result(self, result):
+        self.counts[result["status"]] += 1
+        if "queue_wait" in result:
+            self.waits.append(result["queue_wait"])
+        if result["status"] != "ok":
+            self.last_error = f"{os.path.basename(result['src'])}: {result.get('error', '')}"
+        if self.done and self.finished is None:
+            self.finished = time.time()
+
+    def to_dict(self):
+        completed = sum(self.counts[state] for state in FINISHED_STATES)
+        if self.scanning:
+            status = "scanning"
+        elif not self.done:
+            status = "running"
+        else:
+            status = "cancelled" if self.cancelled else "done"
+        data = {
+            "id": self.id,
+            "tenant": self.tenant,
+            "status": status,
+            "submitted": self.submitted,
+            "remaining": max(0, self.submitted - completed - self.cancelled),
+            "ok": self.counts["ok"],
+            "failed": self.counts["failed"],
+            "timeout": self.counts["timeout"],
+            "cancelled": self.cancelled,
+            "rejected": self.rejected,
+            "elapsed": round((self.finished or time.time()) - self.created, 3),
+            "queue_wait": _summary(sorted(self.waits)),
+        }
+        if self.last_error:
+            data["last_error"] = self.last_error
+        return data
+
+
+class ConversionService:
+    """任务队列和转换引擎（HTTP处理线程和结果线程共同使用）
+
+    tenant_weights为 {团队: 权重}，tenant_caps为 {团队: 同时转换的文件数上限}，
+    default_tenant_cap用于没有单独配置的团队（None表示不限制）。
+    """
+
+    def __init__(self, backend, workers=2, options=None, queue_size=DEFAULT_QUEUE_SIZE,
+                 spool_dir=None, allowed_roots=(), max_upload=DEFAULT_MAX_UPLOAD,
+                 tenant_weights=None, tenant_caps=None, default_tenant_cap=None):
+        self.backend = backend
+        self.workers = max(1, workers)
+        self.queue_size = max(1, queue_size)
+        self.options = dict(options or {})
+        self.spool_dir = os.path.abspath(spool_dir or default_spool_dir())
+        self.allowed_roots = [os.path.normcase(os.path.abspath(root)) for root in allowed_roots]
+        self.max_upload = max_upload
+        options = dict(options or {}, prewarm=True)  # 请求到达时Office已经启动好
+        # 不预取：工作进程空闲时才由调度器决定下一个文件，新到的单个文档不用排在预取的任务后面
+        scheduler = FairShareScheduler(tenant_weights, tenant_caps, default_tenant_cap)
+        self.engine = ConversionEngine(backend, workers=self.workers, options=options,
+                                       on_started=self._on_started, scheduler=scheduler,
+                                       prefetch=0)
+
+        self._lock = threading.Lock()
+        self._jobs = {}  # 任务id -> Job
+        self._batches = {}  # 批次id -> Batch
+        self._tasks = {}  # 引擎任务id -> Job或Batch
+        self._reserved = 0  # 已占用的队列位置（正在上传、等待或正在转换）
+        self._closed = threading.Event()
+        self._dispatcher = None
+        self._janitor = None
+
+        self.started_at = time.time()
+        self.counters = collections.Counter()
+        self._latencies = collections.deque(maxlen=LATENCY_WINDOW)  # 从提交到完成
+        self._waits = collections.deque(maxlen=LATENCY_WINDOW)  # 单个文档从提交到开始转换
+        self._lane_waits = {lane: collections.deque(maxlen=LATENCY_WINDOW)
+                            for lane in (INTERACTIVE, BATCH)}
+        self._tenant_waits = collections.defaultdict(
+            lambda: collections.deque(maxlen=LATENCY_WINDOW))
+        self._durations = collections.deque(maxlen=LATENCY_WINDOW)  # 转换本身
+
+    def start(self):
+        os.makedirs(self.spool_dir, exist_ok=True)
+        self.engine.start()
+        self._dispatcher = threading.Thread(target=self._collect_results, name="service-results",
+                                            daemon=True)
+        self._dispatcher.start()
+        self._janitor = threading.Thread(target=self._expire_jobs, name="service-janitor",
+                                         daemon=True)
+        self._janitor.start()
+
+    def close(self):
+        """停止接受任务，等正在转换的文件完成后关闭引擎"""
+        self._closed.set()
+        self.engine.stop()
+        if self._dispatcher is not None:
+            self._dispatcher.join(timeout=60)
+        self.engine.close()
+
+    @property
+    def alive(self):
+        """服务正在运行（引擎因工作进程反复崩溃而停止时结果线程会退出）"""
+        return (not self._closed.is_set() and self._dispatcher is not None
+                and self._dispatcher.is_alive())
+
+    # 队列位置
+
+    def try_reserve(self):
+        """占用一个队列位置，队列已满时返回False（调用方应返回429）"""
+        with self._lock:
+            return self._reserve_locked()
+
+    def _reserve_locked(self):
+        if self._closed.is_set() or self._reserved >= self.queue_size:
+            self.counters["rejected"] += 1
+            return False
+        self._reserved += 1
+        return True
+
+    def release(self):
+        with self._lock:
+            self._reserved -= 1
+
+    def retry_after(self):
+        """按最近的转换耗时估计多少秒后队列会有空位"""
+        with self._lock:
+            durations = list(self._durations)
+            backlog = self._reserved
+        average = sum(durations) / len(durations) if durations else 5.0
+        return max(1, min(60, int(average * backlog / self.workers / 2) + 1))
+
+    # 任务
+
+    def new_upload_job(self, name, tenant=DEFAULT_TENANT, lane=INTERACTIVE):
+        """为上传的文档创建临时目录，返回 (任务, 源文件路径)"""
+        job_id = uuid.uuid4().hex
+        spool = os.path.join(self.spool_dir, job_id)
+        os.makedirs(spool)
+        ext = os.path.splitext(name)[1].lower()
+        src = os.path.join(spool, "source" + ext)
+        job = Job(job_id, src, os.path.join(spool, "output.pdf"), name, spool=spool,
+                  tenant=tenant, lane=lane)
+        return job, src
+
+    def new_path_job(self, path, output=None, tenant=DEFAULT_TENANT, lane=INTERACTIVE):
+        """转换共享存储上的文档，路径必须在允许的目录中；返回任务，路径无效时抛出ValueError/PermissionError"""
+        src = self._allowed_path(path)
+        if output:
+            self._allowed_path(output)
+        if not os.path.isfile(src) or not is_word_file(os.path.basename(src)):
+            raise ValueError(f"找不到Word文件: {path}")
+        job_id = uuid.uuid4().hex
+        name = os.path.basename(src)
+        if output:
+            dst = os.path.abspath(output)
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            return Job(job_id, src, dst, name, tenant=tenant, lane=lane)
+        spool = os.path.join(self.spool_dir, job_id)
+        os.makedirs(spool)
+        return Job(job_id, src, os.path.join(spool, "output.pdf"), name, spool=spool,
+                   tenant=tenant, lane=lane)
+
+    def _allowed_path(self, path):
+        path = os.path.abspath(path)
+        if not self._is_allowed(path):
+            raise PermissionError("路径不在允许的目录中")
+        return path
+
+    def _is_allowed(self, path):
+        path = os.path.normcase(path)
+        for root in self.allowed_roots:
+            try:
+                if os.path.commonpath([root, path]) == root:
+                    return True
+            except ValueError:
+                continue  # 不同盘符
+        return False
+
+    def submit(self, job):
+        """提交已经占用队列位置的任务"""
+        with self._lock:
+            task_id = self.engine.submit(job.src, job.dst, lane=job.lane, tenant=job.tenant,
+                                         job=job.id)
+            if task_id is None:
+                raise RuntimeError("服务正在停止")
+            self._jobs[job.id] = job
+            self._tasks[task_id] = job
+            self.counters["accepted"] += 1
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def sync_wait(self, job):
+        """同步请求最多等待多少秒：文档的转换超时加上排队时间"""
+        try:
+            size = os.path.getsize(job.src)
+        except OSError:
+            size = 0
+        timeout = document_timeout(size, self.options) or DEFAULT_TIMEOUT_MAX
+        return timeout + SYNC_WAIT_GRACE
+
+    # 批次
+
+    def start_batch(self, tenant, folder=None, paths=None, out=None):
+        """开始一个批次：在后台线程中扫描目录（或逐个检查路径）并提交，返回Batch
+
+        批次中的文件和单个文档一样占用队列位置，队列已满时抛出QueueFullError；
+        路径必须在允许的目录中，无效时抛出ValueError/PermissionError。
+        """
+        if out:
+            out = self._allowed_path(out)
+        if folder:
+            root = self._allowed_path(folder)
+            if not os.path.isdir(root):
+                raise ValueError(f"找不到文件夹: {folder}")
+            sources = scan_word_files(root)
+        else:
+            root = None
+            sources = [self._allowed_path(path) for path in paths]
+        if self._closed.is_set():
+            raise RuntimeError("服务正在停止")
+
+        batch = Batch(uuid.uuid4().hex, tenant)
+        with self._lock:
+            if self._reserved >= self.queue_size:
+                self.counters["rejected"] += 1
+                raise QueueFullError("转换队列已满，请稍后重试")
+            self._batches[batch.id] = batch
+        thread = threading.Thread(target=self._submit_batch, args=(batch, sources, root, out),
+                                  name=f"batch-{batch.id[:8]}", daemon=True)
+        thread.start()
+        return batch
+
+    def _submit_batch(self, batch, sources, root, out):
+        try:
+            for src in sources:
+                if self._closed.is_set():
+                    break
+                if not is_word_file(os.path.basename(src)) or not os.path.isfile(src):
+                    batch.counts["invalid"] += 1
+                    continue
+                if out is None:
+                    dst = os.path.splitext(src)[0] + ".pdf"
+                else:
+                    rel = os.path.relpath(src, root) if root else os.path.basename(src)
+                    dst = os.path.join(out, os.path.splitext(rel)[0] + ".pdf")
+                os.makedirs(os.path.dirname(dst), exist_ok=True)
+                with self._lock:
+                    if batch.stopped:
+                        break
+                    if batch.rejected or not self._reserve_locked():
+                        # 队列已满：之后的文件都不再提交，只统计数量
+                        batch.rejected += 1
+                        continue
+                    task_id = self.engine.submit(src, dst, lane=BATCH, tenant=batch.tenant,
+                                                 job=batch.id)
+                    if task_id is None:
+                        self._reserved -= 1
+                        break
+                    self._tasks[task_id] = batch
+                    batch.submitted += 1
+        except OSError as e:
+            batch.last_error = str(e)
+        finally:
+            with self._lock:
+                if batch.rejected:
+                    batch.last_error = f"转换队列已满，{batch.rejected} 个文件没有提交"
+                batch.scanning = False
+                if batch.done and batch.finished is None:
+                    batch.finished = time.time()
+
+    def get_batch(self, batch_id):
+        with self._lock:
+            return self._batches.get(batch_id)
+
+    def cancel_batch(self, batch_id):
+        """取消批次中还没有开始的文件，正在转换的文件会继续完成"""
+        batch = self.get_batch(batch_id)
+        if batch is None:
+            return None
+        with self._lock:
+            batch.stopped = True
+            cancelled = self.engine.cancel(batch_id)
+            for task in cancelled:
+                self._tasks.pop(task["id"], None)
+            self._reserved -= len(cancelled)
+            batch.cancelled += len(cancelled)
+            if batch.done and batch.finished is None:
+                batch.finished = time.time()
+        return batch
+
+    def delete(self, job_id):
+        """删除任务；还没有完成的任务不能删除，返回False"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or not job.done.is_set():
+                return False
+            del self._jobs[job_id]
+        if job.spool:
+            shutil.rmtree(job.spool, ignore_errors=True)
+        return True
+
+    def discard(self, job):
+        """没能提交的任务：删除临时文件"""
+        if job.spool:
+            shutil.rmtree(job.spool, ignore_errors=True)
+
+    def _on_started(self, task):
+        with self._lock:
+            job = self._tasks.get(task["id"])
+        if isinstance(job, Job):
+            job.status = RUNNING
+            job.started = time.time()
+
+    def _collect_results(self):
+        """结果线程：引擎一直运行，直到服务关闭"""
+        for result in self.engine.results():
+            with self._lock:
+                owner = self._tasks.pop(result["id"], None)
+                if owner is not None:
+                    self._reserved -= 1
+                if owner is not None and "queue_wait" in result:
+                    lane = owner.lane if isinstance(owner, Job) else BATCH
+                    self._lane_waits[lane].append(result["queue_wait"])
+                    self._tenant_waits[owner.tenant].append(result["queue_wait"])
+            if isinstance(owner, Batch):
+                with self._lock:
+                    owner.add_result(result)
+                self.counters[result["status"]] += 1
+                continue
+            if owner is None:
+                continue
+            job = owner
+            job.finished = time.time()
+            job.duration = result.get("duration")
+            job.pages = result.get("pages")
+            job.error = result.get("error") if result["status"] != "ok" else None
+            job.status = result["status"]
+            self.counters[result["status"]] += 1
+            with self._lock:
+                self._latencies.append(job.finished - job.created)
+                if job.started is not None:
+                    self._waits.append(job.started - job.created)
+                if job.duration is not None:
+                    self._durations.append(job.duration)
+            job.done.set()
+
+    def _expire_jobs(self):
+        """定期删除超过JOB_TTL的已完成任务及其临时文件"""
+        while not self._closed.wait(60):
+            now = time.time()
+            with self._lock:
+                expired = [job for job in self._jobs.values()
+                           if job.done.is_set() and now - job.finished > JOB_TTL]
+                for job in expired:
+                    del self._jobs[job.id]
+                for batch in list(self._batches.values()):
+                    if batch.finished is not None and now - batch.finished > JOB_TTL:
+                        del self._batches[batch.id]
+            for job in expired:
+                if job.spool:
+                    shutil.rmtree(job.spool, ignore_errors=True)
+
+    # 统计
+
+    def count_bytes(self, name, size):
+        """累加上传（bytes_in）或下载（bytes_out）的字节数，请求线程并发调用"""
+        with self._lock:
+            self.counters[name] += size
+
+    def metrics(self):
+        with self._lock:
+            counters = dict(self.counters)
+            latencies = sorted(self._latencies)
+            waits = sorted(self._waits)
+            states = collections.Counter(job.status for job in self._jobs.values())
+            reserved = self._reserved
+            lane_waits = {lane: _summary(sorted(waits)) for lane, waits in self._lane_waits.items()}
+            tenant_waits = {tenant: _summary(sorted(waits))
+                            for tenant, waits in self._tenant_waits.items()}
+            batches = sum(1 for batch in self._batches.values() if not batch.done)
+        scheduler = self.engine.scheduler_stats()
+        for tenant, stats in scheduler["tenants"].items():
+            stats["queue_wait"] = tenant_waits.get(tenant, {"count": 0})
+        uptime = time.time() - self.started_at
+
+        completed = sum(counters[state] for state in FINISHED_STATES)
+        return {
+            "backend": self.backend,
+            "workers": self.workers,
+            "uptime": round(uptime, 1),
+            "queue": {"capacity": self.queue_size, "used": reserved,
+                      "queued": states[QUEUED], "running": states[RUNNING]},
+            "accepted": counters["accepted"],
+            "rejected": counters["rejected"],
+            "ok": counters["ok"],
+            "failed": counters["failed"],
+            "timeout": counters["timeout"],
+            "bytes_in": counters["bytes_in"],
+            "bytes_out": counters["bytes_out"],
+            "files_per_min": round(completed / uptime * 60, 2) if uptime > 0 else 0.0,
+            "latency": _summary(latencies),
+            "queue_wait": _summary(waits),
+            "lanes": lane_waits,
+            "active_batches": batches,
+            "scheduler": scheduler,
+            "staging": self.engine.staging_stats,
+            "publish": self.engine.publish_stats,
+            "optimize": self.engine.optimize_stats,
+            "worker_crashes": self.engine.worker_crashes,
+        }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "w2p-service/1.0"
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def service(self):
+        return self.server.service
+
+    def handle_expect_100(self):
+        """客户端发送Expect: 100-continue时，在它上传文件之前就判断队列是否已满"""
+        if self.command == "POST" and not self._reserve():
+            return False
+        return super().handle_expect_100()
+
+    def _reserve(self):
+        """占用一个队列位置，队列已满时返回429"""
+        if getattr(self, "_slot", False):
+            return True  # 已在handle_expect_100中占用
+        if not self.service.try_reserve():
+            self.close_connection = True
+            self._send_error(429, "转换队列已满，请稍后重试",
+                             {"Retry-After": str(self.service.retry_after())})
+            return False
+        self._slot = True
+        return True
+
+    def _tenant(self, query, request=None):
+        """团队名称：X-Tenant请求头、tenant参数或JSON中的tenant字段"""
+        tenant = (self.headers.get("X-Tenant") or query.get("tenant", [""])[0]
+                  or (request or {}).get("tenant") or DEFAULT_TENANT)
+        return str(tenant).strip()[:MAX_TENANT_LENGTH] or DEFAULT_TENANT
+
+    @staticmethod
+    def _lane(query, request=None):
+        """单个文档默认走交互通道，priority=batch时和批量任务一起公平排队"""
+        priority = query.get("priority", [""])[0] or (request or {}).get("priority") or ""
+        return BATCH if str(priority).lower() == BATCH else INTERACTIVE
+
+    def log_message(self, format, *args):
+        if self.server.log is not None:
+            self.server.log(f"{self.address_string()} {format % args}")
+
+    # 响应
+
+    def _send_json(self, status, data, headers=None):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status, message, headers=None):
+        self._send_json(status, {"error": message}, headers)
+
+    def _send_pdf(self, job):
+        """分块发送PDF，不把整个文件读入内存"""
+        try:
+            f = open(job.dst, "rb")
+        except OSError:
+            self._send_error(410, "PDF已被删除")
+            return
+        with f:
+            size = os.fstat(f.fileno()).st_size
+            self.send_response(200)
+            self.send_header("Content-Type", "application/pdf")
+            self.send_header("Content-Length", str(size))
+            filename = os.path.splitext(job.name)[0] + ".pdf"
+            self.send_header("Content-Disposition", f"attachment; filename*=UTF-8''{quote(filename, safe='')}")
+            self.send_header("X-Job-Id", job.id)
+            self.end_headers()
+            shutil.copyfileobj(f, self.wfile, CHUNK_SIZE)
+        self.service.count_bytes("bytes_out", size)
+
+    def _send_result(self, job):
+        """同步请求：成功时返回PDF，失败时返回错误信息"""
+        if job.status == "ok":
+            self._send_pdf(job)
+        elif job.status == "timeout":
+            self._send_json(504, job.to_dict())
+        else:
+            self._send_json(422, job.to_dict())
+
+    # 路由
+
+    def do_GET(self):
+        path = urlsplit(self.path).path.rstrip("/")
+        if path == "/health":
+            alive = self.service.alive
+            self._send_json(200 if alive else 503, {
+                "status": "ok" if alive else "stopping",
+                "backend": self.service.backend,
+                "workers": self.service.workers,
+            })
+        elif path == "/metrics":
+            self._send_json(200, self.service.metrics())
+        elif path.startswith("/batches/"):
+            batch = self.service.get_batch(path.split("/")[2])
+            if batch is None or path.count("/") != 2:
+                self._send_error(404, "批次不存在")
+            else:
+                self._send_json(200, batch.to_dict())
+        elif path.startswith("/jobs/"):
+            parts = path.split("/")
+            job = self.service.get(parts[2]) if len(parts) > 2 else None
+            if job is None:
+                self._send_error(404, "任务不存在")
+            elif len(parts) == 3:
+                self._send_json(200, job.to_dict())
+            elif len(parts) == 4 and parts[3] == "pdf":
+                if not job.done.is_set():
+                    self._send_json(409, job.to_dict())
+                elif job.status != "ok":
+                    self._send_json(422, job.to_dict())
+                else:
+                    self._send_pdf(job)
+            else:
+                self._send_error(404, "接口不存在")
+        else:
+            self._send_error(404, "接口不存在")
+
+    def do_DELETE(self):
+        parts = urlsplit(self.path).path.rstrip("/").split("/")
+        if len(parts) == 3 and parts[1] == "batches":
+            batch = self.service.cancel_batch(parts[2])
+            if batch is None:
+                self._send_error(404, "批次不存在")
+            else:
+                self._send_json(200, batch.to_dict())
+        elif len(parts) != 3 or parts[1] != "jobs":
+            self._send_error(404, "接口不存在")
+        elif self.service.get(parts[2]) is None:
+            self._send_error(404, "任务不存在")
+        elif not self.service.delete(parts[2]):
+            self._send_error(409, "任务还没有完成")
+        else:
+            self._send_json(200, {"id": parts[2], "deleted": True})
+
+    def do_POST(self):
+        try:
+            self._post()
+        finally:
+            if getattr(self, "_slot", False):
+                self.service.release()  # 请求没有变成任务（出错或被拒绝）
+            self._slot = False  # 长连接中的下一个请求重新占用
+
+    def _post(self):
+        try:
+            # 请求行按latin-1解码，客户端没有转义的中文文件名需要还原
+            url = urlsplit(self.path.encode("latin-1").decode("utf-8"))
+        except UnicodeError:
+            url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        if url.path.rstrip("/") == "/batches":
+            self._post_batch(query)
+            return
+        if url.path.rstrip("/") != "/convert":
+            self._send_error(404, "接口不存在")
+            return
+        sync = query.get("sync", ["0"])[0].lower() in ("1", "true", "yes")
+
+        length = self.headers.get("Content-Length")
+        if length is None or not length.isdigit():
+            self.close_connection = True
+            self._send_error(411, "需要Content-Length")
+            return
+        length = int(length)
+        content_type = (self.headers.get("Content-Type") or "").split(";")[0].strip().lower()
+
+        # 队列已满时在读取请求体之前拒绝，不接收上传内容
+        if not self._reserve():
+            return
+
+        if content_type == "application/json":
+            job = self._path_job(length, query)
+        else:
+            job = self._upload_job(length, content_type, query)
+        if job is None:
+            return
+
+        try:
+            self.service.submit(job)
+        except RuntimeError as e:
+            self.service.discard(job)
+            self._send_error(503, str(e))
+            return
+        self._slot = False  # 队列位置由任务占用，转换完成时释放
+
+        # 同步请求等待的时间有上限，超过时和异步请求一样返回任务地址，转换继续进行
+        if not sync or not job.done.wait(self.service.sync_wait(job)):
+            self._send_json(202, job.to_dict(), {"Location": f"/jobs/{job.id}"})
+            return
+        self._send_result(job)
+
+    def _read_json(self, length, usage):
+        """读取JSON请求体，出错时返回None（已发送错误响应）"""
+        if length > MAX_JSON_BODY:
+            self._send_error(413, "请求体过大")
+            return None
+        try:
+            request = json.loads(self.rfile.read(length))
+        except ValueError:
+            request = None
+        if not isinstance(request, dict):
+            self._send_error(400, f"请求体应为 {usage}")
+            return None
+        return request
+
+    def _post_batch(self, query):
+        """批量任务：文件和单个文档共用队列位置，由调度器在团队之间公平分配"""
+        length = self.headers.get("Content-Length")
+        if length is None or not length.isdigit():
+            self.close_connection = True
+            self._send_error(411, "需要Content-Length")
+            return
+        usage = '{"folder": "..."} 或 {"paths": ["...", ...]}'
+        request = self._read_json(int(length), usage)
+        if request is None:
+            return
+        folder, paths = request.get("folder"), request.get("paths")
+        if not isinstance(folder, str) and not (
+                isinstance(paths, list) and paths and all(isinstance(p, str) for p in paths)):
+            self._send_error(400, f"请求体应为 {usage}")
+            return
+        try:
+            batch = self.service.start_batch(self._tenant(query, request),
+                                             folder=folder if isinstance(folder, str) else None,
+                                             paths=paths, out=request.get("out"))
+        except PermissionError as e:
+            self._send_error(403, str(e))
+        except QueueFullError as e:
+            self._send_error(429, str(e), {"Retry-After": str(self.service.retry_after())})
+        except RuntimeError as e:
+            self._send_error(503, str(e))
+        except (ValueError, OSError) as e:
+            self._send_error(400, str(e))
+        else:
+            self._send_json(202, batch.to_dict(), {"Location": f"/batches/{batch.id}"})
+
+    def _path_job(self, length, query):
+        """JSON请求：转换共享存储上的文档"""
+        request = self._read_json(length, '{"path": "..."}')
+        if request is None:
+            return None
+        path = request.get("path")
+        if not isinstance(path, str):
+            self._send_error(400, '请求体应为 {"path": "..."}')
+            return None
+        try:
+            return self.service.new_path_job(path, request.get("output"),
+                                             tenant=self._tenant(query, request),
+                                             lane=self._lane(query, request))
+        except PermissionError as e:
+            self._send_error(403, str(e))
+        except (ValueError, OSError) as e:
+            self._send_error(400, str(e))
+        return None
+
+    def _upload_job(self, length, content_type, query):
+        """上传的文档：边接收边写入临时文件"""
+        name = query.get("name", [""])[0] or ("document" + CONTENT_TYPES.get(content_type, ".docx"))
+        name = os.path.basename(name.replace("\\", "/"))
+        if not is_word_file(name):
+            self._send_error(415, "只支持.doc和.docx文件")
+            return None
+        if length > self.service.max_upload:
+            self.close_connection = True
+            self._send_error(413, f"文件超过 {self.service.max_upload // (1024 * 1024)} MB")
+            return None
+        if length == 0:
+            self._send_error(400, "请求体为空")
+            return None
+
+        job, src = self.service.new_upload_job(name, tenant=self._tenant(query),
+                                               lane=self._lane(query))
+        remaining = length
+        try:
+            with open(src, "wb") as f:
+                while remaining:
+                    chunk = self.rfile.read(min(CHUNK_SIZE, remaining))
+                    if not chunk:
+                        break
+                    f.write(chunk)
+                    remaining -= len(chunk)
+        except OSError as e:
+            shutil.rmtree(job.spool, ignore_errors=True)
+            self.close_connection = True
+            self._send_error(500, f"保存上传文件失败: {e}")
+            return None
+        if remaining:
+            shutil.rmtree(job.spool, ignore_errors=True)
+            self.close_connection = True  # 客户端中途断开
+            return None
+        self.service.count_bytes("bytes_in", length)
+        return job
+
+
+class ServiceHTTPServer(ThreadingHTTPServer):
+    """每个请求一个线程；service为ConversionService，log为记录请求的函数（None表示不记录）"""
+
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, address, service, log=None):
+        super().__init__(address, _Handler)
+        self.service = service
+        self.log = log
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
@@ -0,0 +1,933 @@
+"""
+Word转PDF命令行工具（不需要图形界面，不导入tkinter）
+每转换完一个文件向标准输出写一行JSON，最后写一行汇总，便于计划任务解析。
+
+示例:
+    python -m word_to_pdf_converter convert D:\\docs --out D:\\pdf --workers 4 --backend auto
+    python converter_cli.py convert docs --backend sim --force
+    python -m word_to_pdf_converter convert D:\\docs --out D:\\pdf --resume   （继续上次中断的转换）
+    python -m word_to_pdf_converter convert D:\\docs --archive \\\\server\\pdf\\docs.zip   （PDF写入压缩包）
+    python -m word_to_pdf_converter convert D:\\book --merge D:\\book.pdf   （再合并成一个带书签的PDF）
+    python -m word_to_pdf_converter plan D:\\docs --workers 4   （只预测耗时，不转换）
+    python -m word_to_pdf_converter watch D:\\drop --out D:\\pdf   （持续监视，新文件放入后立即转换）
+    python -m word_to_pdf_converter serve --port 8765 --allow-path \\\\server\\share   （HTTP转换服务）
+
+退出码: 0 全部成功，1 有文件转换失败，2 参数或环境错误，130 被用户中断
+（watch和serve用Ctrl+C或SIGTERM正常停止时退出码为0）
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import signal
+import argparse
+import tempfile
+import threading
+
+from conversion_engine import (
+    BACKEND_NAMES, DEFAULT_TIMEOUT, ConversionEngine, default_worker_count,
+    detect_office_apps, resolve_office_app,
+)
+from conversion_manifest import MANIFEST_NAME, ConversionManifest
+from job_journal import JobJournal, load_journal
+from archive_writer import DEFAULT_MAX_VOLUME_SIZE, ArchiveWriter
+from output_publisher import default_scratch_dir
+from pdf_merge import HAS_PYPDF, MERGE_ORDERS, MergeStage
+from export_profiles import DEFAULT_EXPORT_PROFILE, EXPORT_PROFILES
+from pdf_optimizer import DEFAULT_MAX_DPI, HAS_PIKEPDF, HAS_PIL
+from cost_model import CostModel, plan_schedule
+from run_report import RunReport, percentile
+from folder_watcher import DEFAULT_POLL_INTERVAL, DEFAULT_SETTLE, FolderWatcher
+from folder_scanner import scan_word_files, is_word_file
+from native_docx import HAS_NATIVE
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+EXIT_INTERRUPTED = 130
+
+COMMANDS = ("convert", "plan", "watch", "serve")
+
+BACKEND_CHOICES = ("auto", "word", "wps", "libreoffice", "sim")
+
+_output_lock = threading.Lock()  # 扫描线程和结果线程都会输出记录
+
+
+def _emit(record):
+    """写一行JSON记录并立即刷新"""
+    line = json.dumps(record, ensure_ascii=False) + "\n"
+    with _output_lock:
+        sys.stdout.write(line)
+        sys.stdout.flush()
+
+
+def _note(message):
+    """给人看的提示信息写到标准错误"""
+    print(message, file=sys.stderr, flush=True)
+
+
+def output_path(src, src_root, out):
+    """计算PDF路径：未指定--out时放在源文件旁边，否则在--out下保持相同的目录结构"""
+    if out is None:
+        return os.path.splitext(src)[0] + ".pdf"
+    if os.path.isfile(src_root) and out.lower().endswith(".pdf"):
+        return out
+    if os.path.isfile(src_root):
+        rel = os.path.basename(src)
+    else:
+        rel = os.path.relpath(src, src_root)
+    return os.path.join(out, os.path.splitext(rel)[0] + ".pdf")
+
+
+def _tenant_option(text):
+    """解析 团队=数值 形式的选项"""
+    name, sep, value = text.rpartition("=")
+    try:
+        number = float(value)
+    except ValueError:
+        number = None
+    if not sep or not name or number is None or number <= 0:
+        raise argparse.ArgumentTypeError(f"格式应为 团队=正数: {text}")
+    return name, number
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="word_to_pdf_converter",
+                                     description="批量将Word文件转换为PDF（命令行模式）")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    convert = commands.add_parser("convert", help="转换一个Word文件或整个文件夹")
+    convert.add_argument("src", help="Word文件或包含Word文件的文件夹")
+    convert.add_argument("--out", help="PDF输出目录（默认与源文件放在一起）")
+    convert.add_argument("--workers", type=int, default=default_worker_count(),
+                         help="并行转换进程数")
+    convert.add_argument("--backend", choices=BACKEND_CHOICES, default="auto",
+                         help="转换方式（sim为模拟后端，用于测试）")
+    convert.add_argument("--force", action="store_true",
+                         help="忽略增量转换清单，重新转换全部文件")
+    convert.add_argument("--no-fast-path", action="store_true",
+                         help="简单文档也使用Office转换")
+    convert.add_argument("--no-staging", action="store_true",
+                         help="网络共享上的文档不预先复制到本地临时目录")
+    convert.add_argument("--no-write-behind", action="store_true",
+                         help="输出目录在网络共享上时也直接保存PDF，不先导出到本地")
+    convert.add_argument("--no-cache", action="store_true",
+                         help="不使用按内容寻址的PDF缓存")
+    convert.add_argument("--profile", choices=EXPORT_PROFILES, default=DEFAULT_EXPORT_PROFILE,
+                         help="导出配置：screen文件最小、导出最快，print打印质量（默认），archive为PDF/A并按标题生成书签")
+    convert.add_argument("--optimize", action="store_true",
+                         help="转换后在单独的进程池中优化PDF：缩小高分辨率图片、压缩内容流、使用对象流（需要pikepdf和Pillow）")
+    convert.add_argument("--optimize-dpi", type=int, default=DEFAULT_MAX_DPI,
+                         help=f"优化时图片分辨率上限（默认{DEFAULT_MAX_DPI}）")
+    convert.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT,
+                         help="单个文件的基础超时秒数，大文件按大小自动延长（0表示不限制）")
+    convert.add_argument("--report", metavar="PATH",
+                         help="把分阶段耗时报告保存为PATH.json和PATH.csv")
+    convert.add_argument("--resume", action="store_true",
+                         help="继续上次中断的转换：跳过已完成的文件，重新转换未完成的文件")
+    convert.add_argument("--archive", metavar="PATH",
+                         help="把PDF依次写入压缩包（.zip/.tar/.tar.gz），不逐个创建PDF文件，"
+                              "同时写出索引PATH对应的.index.csv")
+    convert.add_argument("--archive-max-mb", type=int,
+                         help="单个压缩包分卷的大小上限(MB，默认2048)，超过后写入下一个分卷")
+    convert.add_argument("--merge", metavar="PATH",
+                         help="把所有PDF按顺序合并为一个PDF（每个Word文件一个书签），需要pypdf")
+    convert.add_argument("--merge-order", choices=MERGE_ORDERS, default="natural",
+                         help="合并顺序：natural为自然顺序（第2章在第10章前面，默认），path为按路径排序")
+
+    plan = commands.add_parser("plan", help="不转换，只预测转换一个文件夹需要的时间")
+    plan.add_argument("src", help="Word文件或包含Word文件的文件夹")
+    plan.add_argument("--out", help="PDF输出目录（用于判断哪些文件未修改，可以跳过）")
+    plan.add_argument("--workers", type=int, default=default_worker_count(),
+                      help="并行转换进程数")
+    plan.add_argument("--backend", choices=BACKEND_CHOICES, default="auto",
+                      help="按哪个转换方式的历史耗时预测")
+    plan.add_argument("--force", action="store_true",
+                      help="假设全部文件都需要重新转换")
+
+    watch = commands.add_parser("watch", help="持续监视文件夹，新放入或修改过的Word文件写完后立即转换")
+    watch.add_argument("src", help="要监视的文件夹（启动时已有的未转换文件也会转换）")
+    watch.add_argument("--out", help="PDF输出目录（默认与源文件放在一起）")
+    watch.add_argument("--workers", type=int, default=default_worker_count(),
+                       help="并行转换进程数（每个进程保持一个已启动的Office实例）")
+    watch.add_argument("--backend", choices=BACKEND_CHOICES, default="auto",
+                       help="转换方式（sim为模拟后端，用于测试）")
+    watch.add_argument("--no-fast-path", action="store_true",
+                       help="简单文档也使用Office转换")
+    watch.add_argument("--no-staging", action="store_true",
+                       help="网络共享上的文档不预先复制到本地临时目录")
+    watch.add_argument("--no-write-behind", action="store_true",
+                       help="输出目录在网络共享上时也直接保存PDF，不先导出到本地")
+    watch.add_argument("--no-cache", action="store_true",
+                       help="不使用按内容寻址的PDF缓存")
+    watch.add_argument("--profile", choices=EXPORT_PROFILES, default=DEFAULT_EXPORT_PROFILE,
+                       help="导出配置：screen文件最小、导出最快，print打印质量（默认），archive为PDF/A并按标题生成书签")
+    watch.add_argument("--optimize", action="store_true",
+                       help="转换后在单独的进程池中优化PDF：缩小高分辨率图片、压缩内容流、使用对象流（需要pikepdf和Pillow）")
+    watch.add_argument("--optimize-dpi", type=int, default=DEFAULT_MAX_DPI,
+                       help=f"优化时图片分辨率上限（默认{DEFAULT_MAX_DPI}）")
+    watch.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT,
+                       help="单个文件的基础超时秒数，大文件按大小自动延长（0表示不限制）")
+    watch.add_argument("--settle", type=float, default=DEFAULT_SETTLE,
+                       help="文件大小和修改时间保持不变多少秒后认为已经写完")
+    watch.add_argument("--poll", action="store_true",
+                       help="不使用文件变化通知，定期扫描（网络共享上更可靠）")
+    watch.add_argument("--poll-interval", type=float, default=DEFAULT_POLL_INTERVAL,
+                       help="轮询扫描的间隔秒数")
+    watch.add_argument("--stats-interval", type=float, default=60,
+                       help="每隔多少秒输出一次延迟统计（0表示只在退出时输出）")
+    watch.add_argument("--report", metavar="PATH",
+                       help="退出时把分阶段耗时报告保存为PATH.json和PATH.csv")
+
+    serve = commands.add_parser("serve", help="启动本地HTTP转换服务")
+    serve.add_argument("--host", default="127.0.0.1", help="监听地址（默认只接受本机连接）")
+    serve.add_argument("--port", type=int, default=8765, help="监听端口（0表示自动选择）")
+    serve.add_argument("--workers", type=int, default=default_worker_count(),
+                       help="并行转换进程数（每个进程保持一个已启动的Office实例）")
+    serve.add_argument("--backend", choices=BACKEND_CHOICES, default="auto",
+                       help="转换方式（sim为模拟后端，用于测试）")
+    serve.add_argument("--queue-size", type=int,
+                       help="等待和正在转换的任务数上限，超过时返回429（默认32）")
+    serve.add_argument("--max-upload-mb", type=int,
+                       help="上传文件大小上限(MB，默认200)")
+    serve.add_argument("--allow-path", action="append", default=[], metavar="DIR",
+                       help="允许按路径转换的目录（可以指定多次；不指定时只能上传文件）")
+    serve.add_argument("--spool-dir", help="上传文件和PDF的临时目录")
+    serve.add_argument("--tenant-weight", action="append", default=[], type=_tenant_option,
+                       metavar="TENANT=W", help="团队的调度权重（默认1，可以指定多次）")
+    serve.add_argument("--tenant-cap", action="append", default=[], type=_tenant_option,
+                       metavar="TENANT=N", help="团队同时转换的批量文件数上限（可以指定多次）")
+    serve.add_argument("--default-tenant-cap", type=int,
+                       help="没有单独指定上限的团队同时转换的批量文件数上限（默认0，不限制）")
+    serve.add_argument("--no-fast-path", action="store_true",
+                       help="简单文档也使用Office转换")
+    serve.add_argument("--no-staging", action="store_true",
+                       help="网络共享上的文档不预先复制到本地临时目录")
+    serve.add_argument("--no-write-behind", action="store_true",
+                       help="输出目录在网络共享上时也直接保存PDF，不先导出到本地")
+    serve.add_argument("--no-cache", action="store_true",
+                       help="不使用按内容寻址的PDF缓存")
+    serve.add_argument("--profile", choices=EXPORT_PROFILES, default=DEFAULT_EXPORT_PROFILE,
+                       help="导出配置：screen文件最小、导出最快，print打印质量（默认），archive为PDF/A并按标题生成书签")
+    serve.add_argument("--optimize", action="store_true",
+                       help="转换后在单独的进程池中优化PDF：缩小高分辨率图片、压缩内容流、使用对象流（需要pikepdf和Pillow）")
+    serve.add_argument("--optimize-dpi", type=int, default=DEFAULT_MAX_DPI,
+                       help=f"优化时图片分辨率上限（默认{DEFAULT_MAX_DPI}）")
+    serve.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT,
+                       help="单个文件的基础超时秒数，大文件按大小自动延长（0表示不限制）")
+    serve.add_argument("--verbose", action="store_true", help="把每个请求写到标准错误")
+    return parser
+
+
+def _resolve_backend(selected):
+    if selected == "sim":
+        return "sim"
+    available = detect_office_apps()
+    return resolve_office_app(selected, available)
+
+
+def _iter_tasks(args, src_root, manifest, counters, stop_event, resume_state=None, out=None, merge=None):
+    """边扫描边返回需要转换的 (源文件, PDF路径)，未修改的文件直接输出skipped记录
+
+    out为PDF的输出目录，默认为--out。merge不为None时在合并阶段登记每个文件，扫描完成后确定合并顺序。
+    stop_event只用于取消：扫描器结束时会设置传给它的事件，所以扫描使用单独的事件，
+    这样才能区分扫描正常完成和被取消。
+    """
+    if os.path.isfile(src_root):
+        sources = iter([src_root])
+    else:
+        sources = scan_word_files(src_root, stop_event=threading.Event())
+    for src in sources:
+        if stop_event.is_set():
+            return  # 被取消（扫描器随生成器关闭而停止），不确定合并顺序
+        dst = output_path(src, src_root, out or args.out)
+        if resume_state is not None and resume_state.is_done(src, dst):
+            counters["skipped"] += 1
+            counters["resumed"] += 1
+            _emit({"type": "skipped", "src": src, "dst": dst, "reason": "上次已完成"})
+            if merge is not None:
+                merge.expect(src, dst, done=True)
+            continue
+        if manifest is not None and not args.force:
+            try:
+                needed, reason = manifest.needs_conversion(src, dst)
+            except OSError:
+                needed, reason = True, ""
+            if not needed:
+                counters["skipped"] += 1
+                _emit({"type": "skipped", "src": src, "dst": dst, "reason": reason})
+                if merge is not None:
+                    merge.expect(src, dst, done=True)
+                continue
+        if merge is not None:
+            merge.expect(src, dst)
+        yield src, dst
+    if merge is not None and not stop_event.is_set():
+        merge.finish_input()  # 扫描正常完成，合并顺序已经确定，之后每完成一个文件就追加
+
+
+def _submit_all(engine, tasks, model, counters, journal=None):
+    """扫描线程：按预测耗时提交任务（耗时长的先转换）"""
+    try:
+        for src, dst in tasks:
+            cost = features = None
+            if model is not None:
+                cost, features = model.estimate(src)
+            os.makedirs(os.path.dirname(dst) or ".", exist_ok=True)
+            if journal is not None:
+                journal.queued(src, dst)  # 先于提交记录，保证不会排在running/done之后
+            if engine.submit(src, dst, cost=cost, features=features) is None:
+                tasks.close()  # 已停止，结束扫描线程
+                break
+            counters["submitted"] += 1
+    except Exception as e:
+        counters["scan_error"] = str(e)
+    finally:
+        engine.finish_input()
+
+
+def _check_source(args):
+    """检查SRC参数，返回绝对路径，无效时返回None"""
+    src_root = os.path.abspath(args.src)
+    if not os.path.exists(src_root):
+        _note(f"错误: 找不到 {args.src}")
+        return None
+    if os.path.isfile(src_root) and not is_word_file(os.path.basename(src_root)):
+        _note(f"错误: 不是Word文件 {args.src}")
+        return None
+    return src_root
+
+
+def _output_root(args, src_root):
+    """输出根目录（增量转换清单和任务日志保存在这里）"""
+    if args.out:
+        root = args.out if not args.out.lower().endswith(".pdf") else os.path.dirname(args.out)
+    else:
+        root = src_root if os.path.isdir(src_root) else os.path.dirname(src_root)
+    return root or "."
+
+
+def _open_manifest(args, src_root, backend, create=True):
+    """打开输出根目录中的增量转换清单，create=False时清单不存在就返回None"""
+    manifest_root = _output_root(args, src_root)
+    if not create and not os.path.exists(os.path.join(manifest_root, MANIFEST_NAME)):
+        return None
+    try:
+        os.makedirs(manifest_root, exist_ok=True)
+        return ConversionManifest(manifest_root, backend=backend)
+    except Exception as e:
+        _note(f"警告: 无法打开增量转换清单，将转换全部文件: {e}")
+        return None
+
+
+def _open_journal(args, src_root, backend):
+    """开始新的任务日志，--resume时先读取上一次的日志，返回 (日志, 上一次的状态)"""
+    journal_root = _output_root(args, src_root)
+    resume_state = None
+    if args.resume:
+        resume_state = load_journal(journal_root)
+        if resume_state.header is None:
+            _note("没有找到上一次的任务日志，将从头开始转换")
+            resume_state = None
+        else:
+            counts = resume_state.counts()
+            _note(f"继续上次的转换: 已完成 {counts['done']} 个，"
+                  f"未完成 {counts['queued'] + counts['running']} 个，失败 {counts['failed']} 个")
+    try:
+        os.makedirs(journal_root, exist_ok=True)
+        return JobJournal(journal_root, backend, resume_from=resume_state), resume_state
+    except OSError as e:
+        _note(f"警告: 无法写入任务日志，中断后将无法续传: {e}")
+        return None, resume_state
+
+
+def _open_cost_model(backend):
+    try:
+        return CostModel(backend=backend)
+    except Exception as e:
+        _note(f"警告: 无法打开耗时预测数据，按扫描顺序转换: {e}")
+        return None
+
+
+def _handle_result(result, counters, manifest, model, report):
+    """统计结果，更新增量转换清单、耗时预测样本和运行报告"""
+    if result["status"] == "ok":
+        counters["ok"] += 1
+    elif result["status"] == "timeout":
+        counters["timeout"] += 1
+    else:
+        counters["failed"] += 1
+    if "cache_hit" in result:
+        counters["cache_hits" if result["cache_hit"] else "cache_misses"] += 1
+    if manifest is not None and result["status"] == "ok":
+        try:
+            manifest.record(result)
+        except Exception:
+            pass
+    if model is not None:
+        model.add_result(result)
+    report.add(result)
+
+
+def _cache_summary(counters):
+    """缓存命中统计；有缓存查询时同时在标准错误输出一行给人看的结果"""
+    hits, misses = counters["cache_hits"], counters["cache_misses"]
+    lookups = hits + misses
+    if lookups:
+        _note(f"缓存命中: {hits}/{lookups} 个 ({hits * 100 // lookups}%)")
+    return {"hits": hits, "misses": misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0}
+
+
+def _open_archive(args):
+    """--archive时创建压缩包和存放PDF的本地临时目录，返回 (压缩包, 临时目录)，参数错误时抛出ValueError"""
+    if args.out or args.resume:
+        raise ValueError("--archive不能和--out、--resume同时使用")
+    max_size = args.archive_max_mb * 1024 * 1024 if args.archive_max_mb else DEFAULT_MAX_VOLUME_SIZE
+    archive = ArchiveWriter(args.archive, max_size)
+    base = default_scratch_dir()
+    os.makedirs(base, exist_ok=True)
+    return archive, tempfile.mkdtemp(prefix="archive_", dir=base)
+
+
+def _open_merge(args, src_root):
+    """--merge时创建合并阶段，参数错误时抛出ValueError"""
+    if args.archive:
+        raise ValueError("--merge不能和--archive同时使用")
+    if not HAS_PYPDF:
+        raise ValueError("合并PDF需要安装pypdf（pip install pypdf）")
+    return MergeStage(args.merge, src_root, order=args.merge_order)
+
+
+def _optimize_option(args):
+    """--optimize对应的引擎选项，未指定时为None"""
+    if not args.optimize:
+        return None
+    return {"max_dpi": args.optimize_dpi}
+
+
+def _check_optimize(args):
+    """检查--optimize需要的库，缺少pikepdf时返回False"""
+    if not args.optimize:
+        return True
+    if not HAS_PIKEPDF:
+        _note("错误: 优化PDF需要安装pikepdf（pip install pikepdf pillow）")
+        return False
+    if not HAS_PIL:
+        _note("警告: 未安装Pillow，只压缩内容流，不缩小图片")
+    return True
+
+
+def _result_record(result, start):
+    """一个文件的结果对应的JSON记录"""
+    record = {
+        "type": "result",
+        "src": result["src"],
+        "dst": result["dst"],
+        "status": result["status"],
+        "backend": result.get("backend"),
+        "engine": result.get("engine") or result.get("backend"),
+        "worker": result.get("worker"),
+        "duration": result.get("duration", 0.0),
+        "elapsed": round(time.perf_counter() - start, 4),
+    }
+    if result.get("pages"):
+        record["pages"] = result["pages"]
+    if "size" in result:
+        record["size"] = result["size"]
+    if "profile" in result:
+        record["profile"] = result["profile"]
+    if "optimize" in result:
+        record["optimize"] = result["optimize"]
+    if result.get("stages"):
+        record["stages"] = result["stages"]
+    if "predicted" in result:
+        record["predicted"] = round(result["predicted"], 4)
+    if "queue_wait" in result:
+        record["queue_wait"] = result["queue_wait"]
+    if "publish_time" in result:
+        record["publish_wait"] = result["publish_wait"]
+        record["publish_time"] = result["publish_time"]
+    if "cache_hit" in result:
+        record["cache_hit"] = result["cache_hit"]
+    if "archive" in result:
+        record["dst"] = record["archive"] = result["archive"]  # 临时PDF已经删除
+        record["member"] = result["member"]
+    if result["status"] != "ok":
+        record["error"] = result.get("error", "")
+    return record
+
+
+def run_convert(args):
+    src_root = _check_source(args)
+    if src_root is None:
+        return EXIT_USAGE
+
+    backend = _resolve_backend(args.backend)
+    if backend is None:
+        wanted = "可用的Office应用程序" if args.backend == "auto" else BACKEND_NAMES[args.backend]
+        _note(f"错误: 未检测到{wanted}")
+        return EXIT_USAGE
+
+    if not _check_optimize(args):
+        return EXIT_USAGE
+
+    archive = scratch = None
+    if args.archive:
+        # 压缩包每次重新生成，不使用增量转换清单和任务日志
+        try:
+            archive, scratch = _open_archive(args)
+        except (ValueError, OSError) as e:
+            _note(f"错误: {e}")
+            return EXIT_USAGE
+        manifest = journal = resume_state = None
+    else:
+        manifest = _open_manifest(args, src_root, backend)
+        journal, resume_state = _open_journal(args, src_root, backend)
+    merge = None
+    if args.merge:
+        try:
+            merge = _open_merge(args, src_root)
+        except (ValueError, OSError) as e:
+            _note(f"错误: {e}")
+            if archive is not None:
+                archive.close()
+                shutil.rmtree(scratch, ignore_errors=True)
+            return EXIT_USAGE
+    model = _open_cost_model(backend)
+
+    options = {
+        "fast_path": HAS_NATIVE and not args.no_fast_path,
+        "fingerprint": manifest is not None,
+        "cache": not args.no_cache,
+        "staging": not args.no_staging,
+        "write_behind": not args.no_write_behind,
+        "export_profile": args.profile,
+        "optimize": _optimize_option(args),
+        "timeout": args.timeout,
+    }
+    workers = max(1, args.workers)
+    _note(f"转换方式: {BACKEND_NAMES[backend]}，{workers} 个并行进程")
+
+    on_started = (lambda task: journal.started(task["src"])) if journal is not None else None
+    engine = ConversionEngine(backend, workers=workers, options=options, on_started=on_started)
+    report = RunReport(backend, workers)
+    counters = {"submitted": 0, "skipped": 0, "resumed": 0, "ok": 0, "failed": 0, "timeout": 0,
+                "cache_hits": 0, "cache_misses": 0}
+    stop_event = threading.Event()
+    interrupted = False
+    start = time.perf_counter()
+
+    engine.start()
+    tasks = _iter_tasks(args, src_root, manifest, counters, stop_event, resume_state, out=scratch, merge=merge)
+    scanner = threading.Thread(target=_submit_all, daemon=True,
+                               args=(engine, tasks, model, counters, journal))
+    scanner.start()
+    try:
+        results = engine.results()
+        while True:
+            try:
+                result = next(results)
+            except StopIteration:
+                break
+            except KeyboardInterrupt:
+                # 第一次Ctrl+C: 丢弃未开始的任务，等正在转换的文件完成
+                if interrupted:
+                    raise
+                interrupted = True
+                stop_event.set()
+                engine.stop()
+                _note("已中断，等待正在转换的文件完成（再次按Ctrl+C立即退出）...")
+                results = engine.results()  # 被中断的生成器已经结束，重新开始接收结果
+                continue
+
+            if archive is not None:
+                archive.add_result(result, scratch)
+            if journal is not None:
+                journal.finished(result)
+            _handle_result(result, counters, manifest, model, report)
+            _emit(_result_record(result, start))
+            if merge is not None:
+                # 排在前面的PDF都已完成时立即追加，不等整批转换结束
+                merge.part_done(result["src"], result["status"] == "ok")
+    except KeyboardInterrupt:
+        interrupted = True
+        engine.stop()
+    finally:
+        stop_event.set()
+        engine.close(timeout=5 if interrupted else 30)
+        if archive is not None:
+            archive.close()  # 被中断时已经写入的PDF仍然保存在完整的分卷中
+            shutil.rmtree(scratch, ignore_errors=True)
+        if merge is not None:
+            try:
+                merge.close(complete=not interrupted)  # 被中断时不留下缺少后半部分的PDF
+            except OSError as e:
+                merge.errors.append(str(e))
+        if journal is not None:
+            # 被中断或扫描出错时不写结束标记，下次可以用--resume继续
+            journal.close(complete=not interrupted and "scan_error" not in counters)
+        if manifest is not None:
+            manifest.close()
+        if model is not None:
+            model.close()
+
+    elapsed = time.perf_counter() - start
+    processed = counters["ok"] + counters["failed"] + counters["timeout"]
+    report.finish(engine.pool_stats)
+    report_data = report.to_dict()
+    summary = {
+        "type": "summary",
+        "backend": backend,
+        "workers": workers,
+        "submitted": counters["submitted"],
+        "ok": counters["ok"],
+        "failed": counters["failed"],
+        "timeout": counters["timeout"],
+        "skipped": counters["skipped"],
+        "resumed": counters["resumed"],
+        "elapsed": round(elapsed, 4),
+        "files_per_min": round(processed / elapsed * 60, 2) if elapsed > 0 else 0.0,
+        "pages": report_data["pages"],
+        "pages_per_min": report_data["pages_per_min"],
+        "stages": report_data["stages"],
+        "bytes": report_data["bytes"],
+        "profiles": report_data["profiles"],
+        "cache": _cache_summary(counters),
+        "interrupted": interrupted,
+        "pool": engine.pool_stats,
+        "staging": engine.staging_stats,
+        "publish": engine.publish_stats,
+        "optimize": engine.optimize_stats,
+        "worker_crashes": engine.worker_crashes,
+    }
+    if "scan_error" in counters:
+        summary["scan_error"] = counters["scan_error"]
+    if archive is not None:
+        summary["archive"] = {"volumes": archive.volumes, "index": archive.index_path,
+                              "files": archive.files, "bytes": archive.bytes}
+    if merge is not None and not interrupted:
+        summary["merge"] = {"path": merge.path, "files": merge.merged, "pages": merge.page_count,
+                            "missing": merge.missing, "errors": merge.errors}
+    if args.report:
+        try:
+            summary["report"] = report.save(args.report)[0]
+        except OSError as e:
+            _note(f"警告: 保存运行报告失败: {e}")
+    _emit(summary)
+
+    if interrupted:
+        return EXIT_INTERRUPTED
+    if counters["failed"] or counters["timeout"] or "scan_error" in counters:
+        return EXIT_FAILED
+    if merge is not None and merge.errors:
+        return EXIT_FAILED
+    return EXIT_OK
+
+
+def _latency_summary(latencies):
+    """从发现文件到PDF完成的延迟统计（秒）"""
+    values = sorted(latencies)
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "p50": round(percentile(values, 0.5), 3),
+        "p95": round(percentile(values, 0.95), 3),
+        "max": round(values[-1], 3),
+        "mean": round(sum(values) / len(values), 3),
+    }
+
+
+def _raise_interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
+def run_watch(args):
+    src_root = os.path.abspath(args.src)
+    if not os.path.isdir(src_root):
+        _note(f"错误: 找不到文件夹 {args.src}")
+        return EXIT_USAGE
+
+    backend = _resolve_backend(args.backend)
+    if backend is None:
+        wanted = "可用的Office应用程序" if args.backend == "auto" else BACKEND_NAMES[args.backend]
+        _note(f"错误: 未检测到{wanted}")
+        return EXIT_USAGE
+
+    if not _check_optimize(args):
+        return EXIT_USAGE
+
+    manifest = _open_manifest(args, src_root, backend)
+    model = _open_cost_model(backend)
+    options = {
+        "fast_path": HAS_NATIVE and not args.no_fast_path,
+        "fingerprint": manifest is not None,
+        "cache": not args.no_cache,
+        "staging": not args.no_staging,
+        "write_behind": not args.no_write_behind,
+        "export_profile": args.profile,
+        "optimize": _optimize_option(args),
+        "timeout": args.timeout,
+        "prewarm": True,  # 文件到达时Office已经启动好
+    }
+    workers = max(1, args.workers)
+    engine = ConversionEngine(backend, workers=workers, options=options)
+    report = RunReport(backend, workers)
+    counters = {"submitted": 0, "skipped": 0, "ok": 0, "failed": 0, "timeout": 0,
+                "cache_hits": 0, "cache_misses": 0}
+    arrivals = {}  # 任务id -> (发现时间, 写完时间, 是否为启动时已有的文件)
+    arrivals_lock = threading.Lock()
+    latencies = []  # 新到达的文件从发现到PDF完成的秒数
+    start = time.perf_counter()
+
+    def on_ready(src, detected, backlog):
+        """监视线程：文件写完后检查清单并提交转换"""
+        dst = output_path(src, src_root, args.out)
+        if manifest is not None:
+            try:
+                needed, reason = manifest.needs_conversion(src, dst)
+            except OSError:
+                needed, reason = True, ""
+            if not needed:
+                counters["skipped"] += 1
+                _emit({"type": "skipped", "src": src, "dst": dst, "reason": reason})
+                return
+        cost = features = None
+        if model is not None:
+            cost, features = model.estimate(src)
+        os.makedirs(os.path.dirname(dst) or ".", exist_ok=True)
+        ready = time.time()
+        with arrivals_lock:
+            task_id = engine.submit(src, dst, cost=cost, features=features)
+            if task_id is not None:
+                arrivals[task_id] = (detected, ready, backlog)
+                counters["submitted"] += 1
+
+    def on_error(src, error):
+        """监视线程：提交文件失败（例如无法创建输出目录）"""
+        counters["failed"] += 1
+        _emit({"type": "error", "src": src, "error": str(error)})
+
+    watcher = FolderWatcher(src_root, on_ready, settle=args.settle,
+                            poll_interval=args.poll_interval,
+                            use_events=False if args.poll else None, on_error=on_error)
+    engine.start()
+    watcher.start()
+    how = "文件变化通知" if watcher.mode == "events" else f"每 {watcher.poll_interval:g} 秒扫描一次"
+    _note(f"正在监视 {src_root}（{how}），转换方式: {BACKEND_NAMES[backend]}，"
+          f"{workers} 个并行进程，按Ctrl+C停止")
+
+    previous_sigterm = signal.signal(signal.SIGTERM, _raise_interrupt)
+    interrupted = False
+    last_stats = time.monotonic()
+    try:
+        results = engine.results()
+        while True:
+            try:
+                result = next(results)
+            except StopIteration:
+                break
+            except KeyboardInterrupt:
+                # 第一次Ctrl+C: 停止监视，等正在转换的文件完成
+                if interrupted:
+                    raise
+                interrupted = True
+                watcher.stop()
+                engine.stop()
+                _note("正在停止，等待正在转换的文件完成（再次按Ctrl+C立即退出）...")
+                results = engine.results()
+                continue
+
+            finished = time.time()
+            with arrivals_lock:
+                arrival = arrivals.pop(result.get("id"), None)
+            _handle_result(result, counters, manifest, model, report)
+            if manifest is not None:
+                manifest.commit()  # 长时间运行，每个文件都提交，随时停止都不会丢失记录
+            record = _result_record(result, start)
+            if arrival is not None:
+                detected, ready, backlog = arrival
+                record["latency"] = round(finished - detected, 4)
+                record["settle"] = round(ready - detected, 4)
+                if backlog:
+                    record["backlog"] = True  # 启动时已有的文件，不计入延迟统计
+                elif result["status"] == "ok":
+                    latencies.append(finished - detected)
+            _emit(record)
+
+            if args.stats_interval and time.monotonic() - last_stats >= args.stats_interval:
+                last_stats = time.monotonic()
+                _emit({"type": "stats", "ok": counters["ok"],
+                       "failed": counters["failed"] + counters["timeout"],
+                       "waiting": watcher.pending_count() + engine.pending_count(),
+                       "latency": _latency_summary(latencies)})
+    except KeyboardInterrupt:
+        interrupted = True
+        engine.stop()
+    finally:
+        signal.signal(signal.SIGTERM, previous_sigterm)
+        watcher.stop()
+        engine.close(timeout=5 if interrupted else 30)
+        if manifest is not None:
+            manifest.close()
+        if model is not None:
+            model.close()
+
+    report.finish(engine.pool_stats)
+    summary = {
+        "type": "summary",
+        "backend": backend,
+        "workers": workers,
+        "mode": watcher.mode,
+        "submitted": counters["submitted"],
+        "ok": counters["ok"],
+        "failed": counters["failed"],
+        "timeout": counters["timeout"],
+        "skipped": counters["skipped"],
+        "elapsed": round(time.perf_counter() - start, 4),
+        "latency": _latency_summary(latencies),
+        "events": watcher.events,
+        "polls": watcher.polls,
+        "profiles": report.profile_summary(),
+        "cache": _cache_summary(counters),
+        "pool": engine.pool_stats,
+        "staging": engine.staging_stats,
+        "publish": engine.publish_stats,
+        "optimize": engine.optimize_stats,
+        "worker_crashes": engine.worker_crashes,
+    }
+    if args.report:
+        try:
+            summary["report"] = report.save(args.report)[0]
+        except OSError as e:
+            _note(f"警告: 保存运行报告失败: {e}")
+    _emit(summary)
+    return EXIT_OK
+
+
+def run_serve(args):
+    # http.server只在启动服务时导入，不拖慢其他命令的启动
+    from conversion_service import (
+        DEFAULT_MAX_UPLOAD, DEFAULT_QUEUE_SIZE, ConversionService, ServiceHTTPServer,
+    )
+
+    backend = _resolve_backend(args.backend)
+    if backend is None:
+        wanted = "可用的Office应用程序" if args.backend == "auto" else BACKEND_NAMES[args.backend]
+        _note(f"错误: 未检测到{wanted}")
+        return EXIT_USAGE
+
+    if not _check_optimize(args):
+        return EXIT_USAGE
+
+    options = {
+        "fast_path": HAS_NATIVE and not args.no_fast_path,
+        "cache": not args.no_cache,
+        "staging": not args.no_staging,
+        "write_behind": not args.no_write_behind,
+        "export_profile": args.profile,
+        "optimize": _optimize_option(args),
+        "timeout": args.timeout,
+    }
+    service = ConversionService(backend, workers=args.workers, options=options,
+                                queue_size=args.queue_size or DEFAULT_QUEUE_SIZE,
+                                spool_dir=args.spool_dir, allowed_roots=args.allow_path,
+                                max_upload=(args.max_upload_mb * 1024 * 1024 if args.max_upload_mb
+                                            else DEFAULT_MAX_UPLOAD),
+                                tenant_weights=dict(args.tenant_weight),
+                                tenant_caps={name: max(1, int(cap)) for name, cap in args.tenant_cap},
+                                default_tenant_cap=args.default_tenant_cap or None)
+    try:
+        server = ServiceHTTPServer((args.host, args.port), service,
+                                   log=_note if args.verbose else None)
+    except OSError as e:
+        _note(f"错误: 无法监听 {args.host}:{args.port}: {e}")
+        return EXIT_USAGE
+
+    service.start()
+    _emit({"type": "listening", "url": server.url, "backend": backend,
+           "workers": service.workers, "queue_size": service.queue_size})
+    _note(f"转换服务已启动: {server.url}，转换方式: {BACKEND_NAMES[backend]}，"
+          f"{service.workers} 个并行进程，按Ctrl+C停止")
+
+    previous_sigterm = signal.signal(signal.SIGTERM, _raise_interrupt)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        _note("正在停止，等待正在转换的文件完成...")
+    finally:
+        signal.signal(signal.SIGTERM, previous_sigterm)
+        server.server_close()
+        service.close()
+
+    metrics = service.metrics()
+    metrics["type"] = "summary"
+    _emit(metrics)
+    return EXIT_OK
+
+
+def run_plan(args):
+    src_root = _check_source(args)
+    if src_root is None:
+        return EXIT_USAGE
+    backend = _resolve_backend(args.backend) or ("word" if args.backend == "auto" else args.backend)
+    manifest = _open_manifest(args, src_root, backend, create=False)
+    model = _open_cost_model(backend)
+    if model is None:
+        return EXIT_USAGE
+
+    counters = {"skipped": 0}
+    costs = []
+    try:
+        for src, dst in _iter_tasks(args, src_root, manifest, counters, threading.Event()):
+            cost, features = model.estimate(src)
+            costs.append(cost)
+            _emit({"type": "plan", "src": src, "dst": dst, "predicted": round(cost, 4),
+                   "features": features})
+    finally:
+        if manifest is not None:
+            manifest.close()
+        model.close()
+
+    workers = max(1, args.workers)
+    serial = sum(costs)
+    longest_first = plan_schedule(sorted(costs, reverse=True), workers)
+    in_order = plan_schedule(costs, workers)
+    _emit({
+        "type": "plan_summary",
+        "backend": backend,
+        "workers": workers,
+        "files": len(costs),
+        "skipped": counters["skipped"],
+        "serial_seconds": round(serial, 2),
+        "predicted_seconds": round(longest_first, 2),
+        "in_order_seconds": round(in_order, 2),
+        "model_trained": model.trained,
+        "samples": model.sample_count,
+    })
+    basis = f"根据 {model.sample_count} 个历史样本" if model.trained else "历史样本不足，使用默认估计"
+    _note(f"共 {len(costs)} 个文件需要转换，{workers} 个并行进程预计需要 "
+          f"{longest_first / 60:.1f} 分钟（{basis}）")
+    return EXIT_OK
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if getattr(args, "out", None):
+        # 结果记录、清单和任务日志中的PDF路径都使用绝对路径，与SRC一致
+        args.out = os.path.abspath(args.out)
+    if args.command == "convert":
+        return run_convert(args)
+    if args.command == "plan":
+        return run_plan(args)
+    if args.command == "watch":
+        return run_watch(args)
+    if args.command == "serve":
+        return run_serve(args)
+    return EXIT_USAGE
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,212 @@
+"""
+文档转换耗时预测
+根据廉价的静态特征（文件大小、.doc/.docx、docx中的图片数、表格数和页数）预测每个文档的
+转换耗时，用于并行转换时让耗时长的文档先开始（最长作业优先），以及转换前估算总耗时。
+每次转换的实际耗时会记录下来，样本足够后用最小二乘重新拟合模型。
+"""
+import os
+import re
+import time
+import heapq
+import sqlite3
+import zipfile
+import threading
+
+from conversion_cache import default_cache_dir
+
+# 特征顺序（模型系数与之对应，第一个是常数项）
+FEATURES = ("bias", "size_mb", "is_doc", "images", "tables", "pages")
+
+# 样本不足时使用的先验系数（秒）
+DEFAULT_COEFFICIENTS = (1.0, 0.8, 0.5, 0.05, 0.1, 0.08)
+
+# 至少有这么多样本时才用历史数据拟合
+MIN_SAMPLES = 30
+
+# 每个后端最多保留的样本数（只保留最近的）
+MAX_SAMPLES = 5000
+
+# 岭回归正则化系数，样本少或特征共线时保持系数稳定
+RIDGE = 1e-3
+
+# 预测耗时的下限（秒）
+MIN_PREDICTION = 0.05
+
+# document.xml超过这个大小时不再读取统计表格数，按文件大小估计
+MAX_XML_SCAN = 4 * 1024 * 1024
+
+_PAGES_RE = re.compile(rb"<Pages>(\d+)</Pages>")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS samples (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    backend     TEXT NOT NULL,
+    size_mb     REAL NOT NULL,
+    is_doc      INTEGER NOT NULL,
+    images      INTEGER NOT NULL,
+    tables      INTEGER NOT NULL,
+    pages       INTEGER NOT NULL,
+    duration    REAL NOT NULL,
+    recorded_at REAL NOT NULL
+)
+"""
+
+
+def default_model_path():
+    """耗时样本数据库的位置，可用环境变量W2P_COST_MODEL指定"""
+    configured = os.environ.get("W2P_COST_MODEL")
+    if configured:
+        return configured
+    return os.path.join(os.path.dirname(default_cache_dir()), "cost_model.sqlite")
+
+
+def extract_features(path):
+    """读取文档的静态特征，返回与FEATURES对应的字典（不包含bias）"""
+    features = {"size_mb": 0.0, "is_doc": 0, "images": 0, "tables": 0, "pages": 0}
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        return features
+    features["size_mb"] = round(size / (1024 * 1024), 4)
+    if not path.lower().endswith(".docx"):
+        features["is_doc"] = 1  # 旧格式没有可以廉价读取的结构信息
+        return features
+
+    try:
+        with zipfile.ZipFile(path) as archive:
+            infos = archive.infolist()
+            features["images"] = sum(1 for info in infos if info.filename.startswith("word/media/"))
+            names = {info.filename: info for info in infos}
+
+            app = names.get("docProps/app.xml")
+            if app is not None and app.file_size < 64 * 1024:
+                match = _PAGES_RE.search(archive.read(app))
+                if match:
+                    features["pages"] = int(match.group(1))
+
+            document = names.get("word/document.xml")
+            if document is not None:
+                if document.file_size <= MAX_XML_SCAN:
+                    features["tables"] = archive.read(document).count(b"<w:tbl>")
+                else:
+                    features["tables"] = document.file_size // (256 * 1024)
+    except (zipfile.BadZipFile, OSError, RuntimeError):
+        pass
+    return features
+
+
+def _vector(features):
+    return [1.0] + [float(features.get(name, 0)) for name in FEATURES[1:]]
+
+
+def _solve(matrix, vector):
+    """高斯消元解线性方程组（特征只有几个，不需要numpy）"""
+    n = len(vector)
+    a = [row[:] + [vector[i]] for i, row in enumerate(matrix)]
+    for col in range(n):
+        pivot = max(range(col, n), key=lambda r: abs(a[r][col]))
+        if abs(a[pivot][col]) < 1e-12:
+            return None
+        a[col], a[pivot] = a[pivot], a[col]
+        for r in range(n):
+            if r != col:
+                factor = a[r][col] / a[col][col]
+                for c in range(col, n + 1):
+                    a[r][c] -= factor * a[col][c]
+    return [a[i][n] / a[i][i] for i in range(n)]
+
+
+def fit(samples):
+    """用岭回归拟合系数，samples为 (特征字典, 耗时) 列表，失败时返回None"""
+    n = len(FEATURES)
+    xtx = [[0.0] * n for _ in range(n)]
+    xty = [0.0] * n
+    for features, duration in samples:
+        x = _vector(features)
+        for i in range(n):
+            xty[i] += x[i] * duration
+            for j in range(n):
+                xtx[i][j] += x[i] * x[j]
+    for i in range(1, n):
+        xtx[i][i] += RIDGE * len(samples)
+    return _solve(xtx, xty)
+
+
+def plan_schedule(costs, workers):
+    """模拟把任务按给定顺序分配给最先空闲的进程，返回预计总耗时（秒）"""
+    loads = [0.0] * max(1, workers)
+    for cost in costs:
+        heapq.heapreplace(loads, loads[0] + cost)
+    return max(loads)
+
+
+class CostModel:
+    """按后端维护的耗时预测模型，样本保存在SQLite中（可在多个线程中使用）"""
+
+    def __init__(self, path=None, backend="word"):
+        self.path = path or default_model_path()
+        self.backend = backend
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(_SCHEMA)
+        self._conn.commit()
+        self._new_samples = []
+        self.coefficients, self.sample_count = self._load_coefficients()
+
+    def _load_coefficients(self):
+        rows = self._conn.execute(
+            "SELECT size_mb, is_doc, images, tables, pages, duration FROM samples "
+            "WHERE backend = ? ORDER BY id DESC LIMIT ?", (self.backend, MAX_SAMPLES)).fetchall()
+        if len(rows) < MIN_SAMPLES:
+            return DEFAULT_COEFFICIENTS, len(rows)
+        samples = [(dict(zip(FEATURES[1:], row[:5])), row[5]) for row in rows]
+        coefficients = fit(samples)
+        if coefficients is None:
+            return DEFAULT_COEFFICIENTS, len(rows)
+        return tuple(coefficients), len(rows)
+
+    @property
+    def trained(self):
+        return self.sample_count >= MIN_SAMPLES
+
+    def predict(self, features):
+        """预测转换耗时（秒）"""
+        x = _vector(features)
+        return max(MIN_PREDICTION, sum(c * v for c, v in zip(self.coefficients, x)))
+
+    def estimate(self, path):
+        """读取文件特征并预测耗时，返回 (预测秒数, 特征)"""
+        features = extract_features(path)
+        return self.predict(features), features
+
+    def add_result(self, result):
+        """记录一次实际由Office完成的转换（缓存命中和快速转换不代表Office耗时，忽略）"""
+        features = result.get("features")
+        if (features is None or result.get("status") != "ok"
+                or result.get("engine") != result.get("backend")):
+            return
+        with self._lock:
+            self._new_samples.append((
+                self.backend, features["size_mb"], features["is_doc"], features["images"],
+                features["tables"], features["pages"], result["duration"], time.time()))
+
+    def save(self):
+        """保存新样本，只保留最近MAX_SAMPLES条"""
+        with self._lock:
+            samples, self._new_samples = self._new_samples, []
+            if not samples:
+                return
+            self._conn.executemany(
+                "INSERT INTO samples (backend, size_mb, is_doc, images, tables, pages, duration, "
+                "recorded_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", samples)
+            self._conn.execute(
+                "DELETE FROM samples WHERE backend = ? AND id NOT IN "
+                "(SELECT id FROM samples WHERE backend = ? ORDER BY id DESC LIMIT ?)",
+                (self.backend, self.backend, MAX_SAMPLES))
+            self._conn.commit()
+
+    def close(self):
+        self.save()
+        self._conn.close()
@@ -0,0 +1,99 @@
+"""
+PDF导出配置
+Word/WPS的ExportAsFixedFormat可以控制图片优化方式、结构标记、缺失字体处理和PDF/A，
+这些选项明显影响导出耗时和PDF大小。每个配置对应一组导出参数：
+    screen   快速/屏幕阅读：图片按屏幕分辨率压缩，不生成结构标记和书签，文件最小、导出最快
+    print    打印（默认，与以前SaveAs的输出相同）：图片保留打印质量，生成结构标记
+    archive  归档：PDF/A-1，嵌入字体（无法嵌入的字体转为图片），按标题生成书签
+LibreOffice后端把同一组参数转换为writer_pdf_Export的过滤器选项。
+"""
+
+# 默认配置
+DEFAULT_EXPORT_PROFILE = "print"
+
+# Word常量
+WD_EXPORT_FORMAT_PDF = 17
+WD_EXPORT_OPTIMIZE_FOR_PRINT = 0
+WD_EXPORT_OPTIMIZE_FOR_ON_SCREEN = 1
+WD_EXPORT_ALL_DOCUMENT = 0
+WD_EXPORT_DOCUMENT_CONTENT = 0
+WD_EXPORT_CREATE_NO_BOOKMARKS = 0
+WD_EXPORT_CREATE_HEADING_BOOKMARKS = 1
+
+# 配置名 -> 显示名称和导出参数
+EXPORT_PROFILES = {
+    "screen": {
+        "label": "快速/屏幕阅读（文件最小）",
+        "optimize_for": WD_EXPORT_OPTIMIZE_FOR_ON_SCREEN,
+        "structure_tags": False,
+        "bitmap_missing_fonts": False,
+        "bookmarks": WD_EXPORT_CREATE_NO_BOOKMARKS,
+        "doc_props": False,
+        "pdfa": False,
+    },
+    "print": {
+        "label": "打印（默认）",
+        "optimize_for": WD_EXPORT_OPTIMIZE_FOR_PRINT,
+        "structure_tags": True,
+        "bitmap_missing_fonts": True,
+        "bookmarks": WD_EXPORT_CREATE_NO_BOOKMARKS,
+        "doc_props": True,
+        "pdfa": False,
+    },
+    "archive": {
+        "label": "归档（PDF/A，按标题生成书签）",
+        "optimize_for": WD_EXPORT_OPTIMIZE_FOR_PRINT,
+        "structure_tags": True,
+        "bitmap_missing_fonts": True,
+        "bookmarks": WD_EXPORT_CREATE_HEADING_BOOKMARKS,
+        "doc_props": True,
+        "pdfa": True,
+    },
+}
+
+# LibreOffice图片压缩：OptimizeFor -> (最大分辨率DPI, JPEG质量)
+_LIBREOFFICE_IMAGES = {
+    WD_EXPORT_OPTIMIZE_FOR_ON_SCREEN: (150, 75),
+    WD_EXPORT_OPTIMIZE_FOR_PRINT: (300, 90),
+}
+
+
+def get_export_profile(name):
+    """按名称返回导出配置，名称未知时抛出ValueError"""
+    try:
+        return EXPORT_PROFILES[name or DEFAULT_EXPORT_PROFILE]
+    except KeyError:
+        raise ValueError(f"未知的导出配置: {name}（可用 {', '.join(EXPORT_PROFILES)}）") from None
+
+
+def export_arguments(name):
+    """配置对应的Document.ExportAsFixedFormat关键字参数（不含OutputFileName）"""
+    profile = get_export_profile(name)
+    return {
+        "ExportFormat": WD_EXPORT_FORMAT_PDF,
+        "OpenAfterExport": False,
+        "OptimizeFor": profile["optimize_for"],
+        "Range": WD_EXPORT_ALL_DOCUMENT,
+        "Item": WD_EXPORT_DOCUMENT_CONTENT,
+        "IncludeDocProps": profile["doc_props"],
+        "KeepIRM": True,
+        "CreateBookmarks": profile["bookmarks"],
+        "DocStructureTags": profile["structure_tags"],
+        "BitmapMissingFonts": profile["bitmap_missing_fonts"],
+        "UseISO19005_1": profile["pdfa"],
+    }
+
+
+def libreoffice_filter_data(arguments):
+    """把ExportAsFixedFormat参数转换为LibreOffice writer_pdf_Export的FilterData"""
+    optimize_for = arguments.get("OptimizeFor", WD_EXPORT_OPTIMIZE_FOR_PRINT)
+    resolution, quality = _LIBREOFFICE_IMAGES.get(optimize_for, _LIBREOFFICE_IMAGES[WD_EXPORT_OPTIMIZE_FOR_PRINT])
+    return {
+        "ReduceImageResolution": True,
+        "MaxImageResolution": resolution,
+        "Quality": quality,
+        "UseTaggedPDF": bool(arguments.get("DocStructureTags", True)),
+        "ExportBookmarks": arguments.get("CreateBookmarks", WD_EXPORT_CREATE_NO_BOOKMARKS)
+                           != WD_EXPORT_CREATE_NO_BOOKMARKS,
+        "SelectPdfVersion": 1 if arguments.get("UseISO19005_1") else 0,  # 1为PDF/A-1b
+    }
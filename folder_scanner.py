@@ -0,0 +1,115 @@
+"""
+并行目录扫描
+使用os.scandir和线程池并行遍历子目录，边扫描边返回找到的Word文件，
+不需要等整个目录树（例如网络共享上的几十万个条目）遍历完才开始转换。
+"""
+import os
+import sys
+import functools
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+WORD_EXTENSIONS = ('.doc', '.docx')
+
+# 不需要进入的目录
+SKIP_DIRS = {
+    "$recycle.bin", "system volume information", ".git", ".svn",
+    "__pycache__", "node_modules", ".w2p_staging",
+}
+
+# 常见的临时/锁定文件前缀
+JUNK_PREFIXES = (
+    "~$",       # Word打开文档时生成的锁定文件
+    ".~lock.",  # LibreOffice锁定文件
+    "._",       # macOS资源分叉文件
+    "~wrl",     # Word保存时的临时文件
+)
+
+# GetDriveTypeW返回值：网络驱动器
+DRIVE_REMOTE = 4
+
+_DONE = object()
+
+
+def is_word_file(name):
+    """是否是需要转换的Word文件（排除临时和锁定文件）"""
+    lower = name.lower()
+    if not lower.endswith(WORD_EXTENSIONS):
+        return False
+    return not lower.startswith(JUNK_PREFIXES)
+
+
+def is_network_path(path):
+    """是否是网络共享上的路径：UNC路径（\\\\server\\share）或Windows上映射的网络驱动器"""
+    if path.startswith(("\\\\", "//")):
+        return True
+    if sys.platform != "win32":
+        return False
+    drive = os.path.splitdrive(os.path.abspath(path))[0]
+    return drive.endswith(":") and _is_remote_drive(drive.upper())
+
+
+@functools.lru_cache(maxsize=32)
+def _is_remote_drive(drive):
+    try:
+        import ctypes
+        return ctypes.windll.kernel32.GetDriveTypeW(drive + "\\") == DRIVE_REMOTE
+    except (AttributeError, OSError):
+        return False
+
+
+def _skip_dir(name):
+    return name.lower() in SKIP_DIRS
+
+
+def scan_word_files(root, workers=8, stop_event=None, entries=False):
+    """并行扫描目录树，找到一个Word文件就立即返回一个（生成器）
+
+    结果顺序不固定。stop_event被设置后尽快停止扫描。
+    无法访问的子目录会被跳过。
+    entries=True时返回os.DirEntry而不是路径（Windows上entry.stat()不需要再访问文件系统，
+    轮询网络共享时可以省掉每个文件一次的stat）。
+    """
+    if stop_event is None:
+        stop_event = threading.Event()
+    results = queue.Queue()
+    pending = [1]  # 尚未扫描完的目录数
+    lock = threading.Lock()
+
+    def scan_dir(path, executor):
+        try:
+            if stop_event.is_set():
+                return
+            with os.scandir(path) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if not _skip_dir(entry.name):
+                                with lock:
+                                    pending[0] += 1
+                                executor.submit(scan_dir, entry.path, executor)
+                        elif is_word_file(entry.name) and entry.is_file():
+                            results.put(entry if entries else entry.path)
+                    except OSError:
+                        continue
+        except OSError:
+            pass  # 没有权限或目录已被删除
+        finally:
+            with lock:
+                pending[0] -= 1
+                finished = pending[0] == 0
+            if finished:
+                results.put(_DONE)
+
+    executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="scan")
+    try:
+        executor.submit(scan_dir, root, executor)
+        while True:
+            item = results.get()
+            if item is _DONE:
+                break
+            yield item
+    finally:
+        stop_event.set()
+        executor.shutdown(wait=False)
@@ -0,0 +1,198 @@
+"""
+监视文件夹
+持续监视投放目录，新放入或修改过的Word文件写完后立即交给转换引擎。
+安装了watchdog时使用系统的文件变化通知（Windows的ReadDirectoryChangesW、Linux的inotify），
+网络共享（SMB）上通知不可靠，使用并行扫描定期轮询。
+文件在一段时间内大小和修改时间都不再变化、并且可以打开读取，才认为已经写完（去抖动）。
+"""
+import os
+import time
+import logging
+import threading
+import importlib.util
+
+from app_log import LOGGER_NAME
+from folder_scanner import scan_word_files, is_word_file, is_network_path
+
+# 只检查watchdog是否安装，真正的导入推迟到开始监视时
+HAS_WATCHDOG = importlib.util.find_spec("watchdog") is not None
+
+# 文件大小和修改时间保持不变多少秒后认为已经写完
+DEFAULT_SETTLE = 2.0
+
+# 轮询模式下扫描整个目录的间隔（秒）
+DEFAULT_POLL_INTERVAL = 5.0
+
+# 使用变化通知时仍然定期完整扫描，补上丢失的通知（例如通知缓冲区溢出）
+EVENT_RESCAN_INTERVAL = 60.0
+
+# 检查待转换文件是否已经写完的间隔（秒）
+CHECK_INTERVAL = 0.25
+
+
+def _signature(st):
+    return st.st_size, st.st_mtime_ns
+
+
+def _can_open(path):
+    """复制或保存过程中文件可能被独占打开"""
+    try:
+        with open(path, "rb"):
+            return True
+    except OSError:
+        return False
+
+
+class FolderWatcher:
+    """监视目录树中的Word文件，文件写完后调用on_ready(路径, 发现时间, 是否为启动时已有的文件)
+
+    on_ready在监视线程中调用，发现时间为time.time()的值。on_ready抛出异常时调用
+    on_error(路径, 异常)，没有指定on_error时写入转换日志（app_log）。
+    use_events=None时自动选择：安装了watchdog且不是网络路径时使用变化通知，否则轮询。
+    """
+
+    def __init__(self, root, on_ready, settle=DEFAULT_SETTLE,
+                 poll_interval=DEFAULT_POLL_INTERVAL, use_events=None, on_error=None):
+        self.root = os.path.abspath(root)
+        self.on_ready = on_ready
+        self.on_error = on_error
+        self.settle = settle
+        if use_events is None:
+            use_events = HAS_WATCHDOG and not is_network_path(self.root)
+        self.use_events = use_events and HAS_WATCHDOG
+        self.poll_interval = EVENT_RESCAN_INTERVAL if self.use_events else poll_interval
+
+        self._lock = threading.Lock()
+        self._candidates = {}  # 路径 -> 等待写完的文件信息
+        self._known = {}  # 路径 -> 上次交给转换时的 (大小, 修改时间)
+        self._stop = threading.Event()
+        self._thread = None
+        self._observer = None
+        self.events = 0  # 收到的变化通知数
+        self.polls = 0  # 完整扫描次数
+
+    @property
+    def mode(self):
+        return "events" if self.use_events else "polling"
+
+    def start(self):
+        if self.use_events:
+            self._observer = self._start_observer()
+        self._thread = threading.Thread(target=self._run, name="folder-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join(timeout=5)
+            self._observer = None
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+            self._thread = None
+
+    def pending_count(self):
+        """已经发现但还没有写完的文件数"""
+        with self._lock:
+            return len(self._candidates)
+
+    def _start_observer(self):
+        from watchdog.observers import Observer
+        from watchdog.events import FileSystemEventHandler
+
+        watcher = self
+
+        class _Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                if event.is_directory:
+                    return
+                path = getattr(event, "dest_path", None) or event.src_path
+                if event.event_type in ("created", "modified", "moved", "closed"):
+                    watcher.events += 1
+                    watcher._touch(path)
+
+        observer = Observer()
+        observer.schedule(_Handler(), self.root, recursive=True)
+        observer.start()
+        return observer
+
+    def _touch(self, path, backlog=False):
+        """收到变化通知或扫描发现变化：开始等待文件写完"""
+        if not is_word_file(os.path.basename(path)):
+            return
+        with self._lock:
+            if path not in self._candidates:
+                self._candidates[path] = {"sig": None, "since": time.monotonic(),
+                                          "detected": time.time(), "backlog": backlog}
+
+    def _run(self):
+        self._poll(initial=True)
+        next_poll = time.monotonic() + self.poll_interval
+        while not self._stop.wait(CHECK_INTERVAL):
+            if time.monotonic() >= next_poll:
+                self._poll()
+                next_poll = time.monotonic() + self.poll_interval
+            self._check_candidates()
+
+    def _poll(self, initial=False):
+        """完整扫描一次，记录新增和修改过的文件，忘记已删除的文件"""
+        seen = set()
+        changed = []
+        # scan_word_files结束时会设置传入的事件，每次扫描使用单独的事件
+        scan_stop = threading.Event()
+        for entry in scan_word_files(self.root, stop_event=scan_stop, entries=True):
+            if self._stop.is_set():
+                scan_stop.set()
+                break
+            try:
+                sig = _signature(entry.stat())
+            except OSError:
+                continue
+            seen.add(entry.path)
+            if self._known.get(entry.path) != sig:
+                changed.append(entry.path)
+        if self._stop.is_set():
+            return
+        self.polls += 1
+        with self._lock:
+            for path in list(self._known):
+                if path not in seen:
+                    del self._known[path]
+        for path in changed:
+            self._touch(path, backlog=initial)
+
+    def _check_candidates(self):
+        """把已经写完的文件交给on_ready"""
+        now = time.monotonic()
+        ready = []
+        with self._lock:
+            for path, info in list(self._candidates.items()):
+                try:
+                    sig = _signature(os.stat(path))
+                except OSError:
+                    del self._candidates[path]  # 已被删除或改名
+                    continue
+                if sig != info["sig"]:
+                    info["sig"] = sig
+                    info["since"] = now
+                    continue
+                if now - info["since"] < self.settle or sig[0] == 0:
+                    continue
+                if sig == self._known.get(path):
+                    del self._candidates[path]  # 内容没有变化（例如只是被打开过）
+                    continue
+                if not _can_open(path):
+                    info["since"] = now
+                    continue
+                del self._candidates[path]
+                self._known[path] = sig
+                ready.append((path, info))
+
+        for path, info in ready:
+            try:
+                self.on_ready(path, info["detected"], info["backlog"])
+            except Exception as e:
+                if self.on_error is not None:
+                    self.on_error(path, e)
+                else:
+                    logging.getLogger(LOGGER_NAME).warning("处理文件失败: %s: %s", path, e)
@@ -0,0 +1,180 @@
+"""
+转换任务日志（断点续传）
+在输出目录中以追加方式记录每个文件的状态（queued 等待、running 转换中、done 完成、failed 失败），
+程序崩溃、电脑重启或用户停止后，下次可以跳过已完成的文件，只重新转换未完成的文件。
+记录由后台线程批量写入，每批只调用一次fsync，每分钟几千个文件时也不会拖慢转换。
+"""
+import os
+import json
+import time
+import threading
+
+JOURNAL_NAME = ".w2p_journal.jsonl"
+
+# 批量写入的间隔（秒）和触发立即写入的记录数
+FLUSH_INTERVAL = 0.2
+FLUSH_BATCH = 500
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+def _key(path):
+    return os.path.normcase(os.path.abspath(path))
+
+
+def _source_mtime(src):
+    try:
+        return os.stat(src).st_mtime_ns
+    except OSError:
+        return None
+
+
+class JournalState:
+    """读取上一次的任务日志得到的各文件最终状态"""
+
+    def __init__(self):
+        self.header = None
+        self.finished = False  # 上一次转换是否正常结束
+        self.files = {}  # 源文件 -> 最后一条记录
+
+    @property
+    def done(self):
+        return {key: record for key, record in self.files.items() if record["state"] == DONE}
+
+    @property
+    def unfinished(self):
+        """上一次转换被中断，且还有没完成的文件"""
+        return (self.header is not None and not self.finished
+                and any(record["state"] != DONE for record in self.files.values()))
+
+    def counts(self):
+        counts = {QUEUED: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+        for record in self.files.values():
+            counts[record["state"]] = counts.get(record["state"], 0) + 1
+        return counts
+
+    def is_done(self, src, dst):
+        """文件在上一次转换中已经完成，且源文件没有修改、PDF仍然存在"""
+        record = self.files.get(_key(src))
+        if record is None or record["state"] != DONE:
+            return False
+        if record.get("mtime_ns") is not None and record["mtime_ns"] != _source_mtime(src):
+            return False
+        return os.path.exists(dst)
+
+
+def load_journal(root, name=JOURNAL_NAME):
+    """读取任务日志，不存在时返回空状态（崩溃时写了一半的最后一行会被忽略）"""
+    state = JournalState()
+    path = os.path.join(root, name)
+    try:
+        f = open(path, encoding="utf-8")
+    except OSError:
+        return state
+    with f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            kind = record.get("type")
+            if kind == "run":
+                state.header = record
+                state.finished = False
+            elif kind == "end":
+                state.finished = True
+            elif "state" in record and "src" in record:
+                state.files[_key(record["src"])] = record
+    return state
+
+
+class JobJournal:
+    """追加写入的任务日志（可以在扫描线程和转换线程中同时使用）
+
+    resume_from为上一次的JournalState时，已完成文件的记录会先写入新日志，
+    日志不会随着多次续传无限增长。
+    """
+
+    def __init__(self, root, backend, name=JOURNAL_NAME, resume_from=None):
+        self.root = os.path.abspath(root)
+        self.path = os.path.join(self.root, name)
+        self._lock = threading.Lock()
+        self._buffer = []
+        self._wakeup = threading.Event()
+        self._closed = False
+
+        # 先完整写好新日志再替换旧日志，替换前崩溃不会丢失上一次的记录
+        header = {"type": "run", "backend": backend, "started": time.time(),
+                  "resumed": resume_from is not None}
+        lines = [header]
+        if resume_from is not None:
+            lines.extend(resume_from.done.values())
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.writelines(json.dumps(line, ensure_ascii=False) + "\n" for line in lines)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._writer = threading.Thread(target=self._write_loop, name="job-journal", daemon=True)
+        self._writer.start()
+
+    def _append(self, record):
+        with self._lock:
+            if self._closed:
+                return
+            self._buffer.append(json.dumps(record, ensure_ascii=False) + "\n")
+            if len(self._buffer) >= FLUSH_BATCH:
+                self._wakeup.set()
+
+    def queued(self, src, dst):
+        self._append({"state": QUEUED, "src": src, "dst": dst})
+
+    def started(self, src):
+        self._append({"state": RUNNING, "src": src})
+
+    def finished(self, result):
+        """记录转换结果：成功记为done，失败和超时记为failed"""
+        record = {"src": result["src"], "dst": result["dst"]}
+        if result["status"] == "ok":
+            record["state"] = DONE
+            mtime_ns = result.get("source_mtime_ns")
+            record["mtime_ns"] = mtime_ns if mtime_ns is not None else _source_mtime(result["src"])
+        else:
+            record["state"] = FAILED
+            record["error"] = result.get("error", "")
+        self._append(record)
+
+    def _write_loop(self):
+        while not self._closed:
+            self._wakeup.wait(FLUSH_INTERVAL)
+            self._wakeup.clear()
+            self.flush()
+
+    def flush(self):
+        """把缓冲的记录写入文件并fsync（一批记录只同步一次）"""
+        with self._lock:
+            lines, self._buffer = self._buffer, []
+        if not lines:
+            return
+        try:
+            self._file.writelines(lines)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        except (OSError, ValueError):
+            pass  # 磁盘写满等情况下不影响转换本身，只是无法续传
+
+    def close(self, complete=False):
+        """关闭日志，complete=True表示本次转换正常结束（不需要续传）"""
+        if complete:
+            self._append({"type": "end", "finished": time.time()})
+        with self._lock:
+            self._closed = True
+        self._wakeup.set()
+        self._writer.join()
+        self.flush()
+        self._file.close()
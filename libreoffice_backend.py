@@ -0,0 +1,253 @@
+"""
+LibreOffice转换后端
+为每个工作进程保持一个常驻的soffice监听进程（通过soffice_bridge.py），
+并包装成与Word/WPS COM对象相同的接口，从而可以直接放进Office实例池中复用。
+"""
+import os
+import sys
+import json
+import glob
+import socket
+import shutil
+import secrets
+import subprocess
+
+from export_profiles import libreoffice_filter_data
+
+BRIDGE_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "soffice_bridge.py")
+
+# 使用替身监听进程（不需要安装LibreOffice）时的soffice设置值
+SIMULATE = "simulate"
+
+# 启动监听进程时通过这个环境变量传入访问令牌，每个请求都要带上
+TOKEN_ENV = "W2P_BRIDGE_TOKEN"
+
+
+def find_soffice():
+    """查找soffice可执行文件，可用环境变量W2P_SOFFICE指定（设为simulate使用替身）"""
+    configured = os.environ.get("W2P_SOFFICE")
+    if configured:
+        return configured
+
+    for name in ("soffice", "libreoffice"):
+        path = shutil.which(name)
+        if path:
+            return path
+
+    if sys.platform == "win32":
+        for base in (os.environ.get("ProgramFiles"), os.environ.get("ProgramFiles(x86)")):
+            if not base:
+                continue
+            for path in glob.glob(os.path.join(base, "LibreOffice*", "program", "soffice.exe")):
+                return path
+    return None
+
+
+def _own_python():
+    """当前程序的Python解释器；打包成exe（PyInstaller等）后sys.executable是程序本身，不能运行脚本"""
+    if getattr(sys, "frozen", False):
+        return None
+    return sys.executable
+
+
+def find_uno_python(soffice):
+    """查找可以import uno的Python解释器"""
+    configured = os.environ.get("W2P_UNO_PYTHON")
+    if configured:
+        return configured
+
+    # LibreOffice自带的Python（Windows和官方安装包）
+    program_dir = os.path.dirname(os.path.realpath(soffice))
+    for name in ("python.exe", "python"):
+        path = os.path.join(program_dir, name)
+        if os.path.isfile(path):
+            return path
+
+    # 系统Python安装了python3-uno（常见于Linux发行版）
+    for candidate in (_own_python(), shutil.which("python3")):
+        if not candidate:
+            continue
+        try:
+            subprocess.run([candidate, "-c", "import uno"], check=True, timeout=10,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            return candidate
+        except (OSError, subprocess.SubprocessError):
+            continue
+    return None
+
+
+def is_libreoffice_available():
+    """检测LibreOffice后端是否可用（只查找文件，不启动soffice）"""
+    soffice = find_soffice()
+    if soffice == SIMULATE:
+        return True
+    return bool(soffice and os.path.exists(soffice))
+
+
+class LibreOfficeListener:
+    """一个常驻的soffice_bridge监听进程及其连接"""
+
+    def __init__(self, soffice=None, startup_timeout=120, request_timeout=None):
+        self.soffice = soffice or find_soffice()
+        self.startup_timeout = startup_timeout
+        self.request_timeout = request_timeout
+        self.process = None
+        self._token = None
+        self._sock = None
+        self._stream = None
+
+    @property
+    def pid(self):
+        return self.process.pid if self.process else None
+
+    def start(self):
+        if not self.soffice:
+            raise Exception("Class not registered: 未找到LibreOffice (soffice)")
+
+        if self.soffice == SIMULATE:
+            python = _own_python() or shutil.which("python3") or shutil.which("python")
+            if not python:
+                raise Exception("Class not registered: 未找到运行监听进程的Python")
+            cmd = [python, BRIDGE_SCRIPT, "--simulate"]
+        else:
+            python = find_uno_python(self.soffice)
+            if not python:
+                raise Exception("Class not registered: 未找到带uno模块的Python")
+            cmd = [python, BRIDGE_SCRIPT, "--soffice", self.soffice]
+
+        # 监听端口本机的其他程序也能连接，只接受带有这个令牌的请求。
+        # 令牌通过环境变量传入，不出现在命令行中
+        self._token = secrets.token_hex(16)
+        env = dict(os.environ, **{TOKEN_ENV: self._token})
+        # 在POSIX上使用独立的进程组，超时时可以连同soffice一起结束
+        self.process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stdin=subprocess.DEVNULL,
+                                        cwd=os.path.dirname(BRIDGE_SCRIPT), env=env,
+                                        start_new_session=sys.platform != "win32")
+        line = self._read_ready_line()
+        if not line.startswith("READY "):
+            self.stop()
+            raise Exception(f"LibreOffice监听进程启动失败: {line or '进程已退出'}")
+
+        port = int(line.split()[1])
+        self._sock = socket.create_connection(("127.0.0.1", port), timeout=self.startup_timeout)
+        self._sock.settimeout(self.request_timeout)
+        self._stream = self._sock.makefile("rwb")
+        return self
+
+    def _read_ready_line(self):
+        # 在单独的线程中读取，避免soffice卡死时永远等待
+        import threading
+        lines = []
+        reader = threading.Thread(target=lambda: lines.append(self.process.stdout.readline()),
+                                  daemon=True)
+        reader.start()
+        reader.join(self.startup_timeout)
+        if not lines:
+            return ""
+        return lines[0].decode("utf-8", "replace").strip()
+
+    def convert(self, src, dst, filter_data=None):
+        """请求监听进程转换，filter_data为writer_pdf_Export的过滤器选项"""
+        if self._stream is None:
+            raise Exception("RPC服务器不可用: LibreOffice监听进程未启动")
+        request = {"token": self._token, "src": src, "dst": dst}
+        if filter_data:
+            request["filter"] = filter_data
+        request = json.dumps(request, ensure_ascii=False)
+        try:
+            self._stream.write(request.encode("utf-8") + b"\n")
+            self._stream.flush()
+            line = self._stream.readline()
+        except OSError as e:
+            raise Exception(f"RPC服务器不可用: {e}")
+        if not line:
+            raise Exception("RPC服务器不可用: LibreOffice监听进程已退出")
+        response = json.loads(line)
+        if not response.get("ok"):
+            raise Exception(response.get("error") or "LibreOffice转换失败")
+
+    def stop(self):
+        if self._stream is not None:
+            try:
+                quit_request = json.dumps({"token": self._token, "cmd": "quit"})
+                self._stream.write(quit_request.encode("utf-8") + b"\n")
+                self._stream.flush()
+                self._stream.readline()
+            except OSError:
+                pass
+            try:
+                self._stream.close()
+                self._sock.close()
+            except OSError:
+                pass
+            self._stream = None
+            self._sock = None
+
+        if self.process is not None:
+            try:
+                self.process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+            self.process = None
+
+
+class LibreOfficeDocument:
+    """模仿Word Document对象：SaveAs/ExportAsFixedFormat时请求监听进程转换"""
+
+    def __init__(self, app, path):
+        self.app = app
+        self.FullName = path
+
+    def SaveAs(self, path, FileFormat=17, *args, **kwargs):
+        if FileFormat != 17:
+            raise Exception(f"Command failed: LibreOffice后端只支持PDF格式(17)，收到 {FileFormat}")
+        self.app.listener.convert(self.FullName, path)
+
+    def ExportAsFixedFormat(self, OutputFileName, ExportFormat=17, *args, **kwargs):
+        if ExportFormat != 17:
+            raise Exception(f"Command failed: LibreOffice后端只支持PDF格式(17)，收到 {ExportFormat}")
+        # 导出配置中的Word参数转换为LibreOffice的PDF过滤器选项
+        self.app.listener.convert(self.FullName, OutputFileName, libreoffice_filter_data(kwargs))
+
+    def Close(self, SaveChanges=False):
+        pass
+
+
+class LibreOfficeDocuments:
+    def __init__(self, app):
+        self.app = app
+
+    def Open(self, path, *args, **kwargs):
+        if not os.path.exists(path):
+            raise Exception(f"Command failed: 找不到文件 {path}")
+        return LibreOfficeDocument(self.app, path)
+
+
+class LibreOfficeApplication:
+    """模仿Word.Application对象，对应一个常驻的LibreOffice监听进程"""
+
+    def __init__(self, listener):
+        self.listener = listener
+        self.Visible = False
+        self.DisplayAlerts = 0
+        self.Documents = LibreOfficeDocuments(self)
+
+    @property
+    def pid(self):
+        return self.listener.pid
+
+    def Quit(self):
+        self.listener.stop()
+
+
+class LibreOfficeDispatcher:
+    """代替DispatchEx的可调用对象，供OfficeInstancePool启动LibreOffice监听进程"""
+
+    def __init__(self, soffice=None, startup_timeout=120):
+        self.soffice = soffice
+        self.startup_timeout = startup_timeout
+
+    def __call__(self, prog_id):
+        listener = LibreOfficeListener(self.soffice, startup_timeout=self.startup_timeout)
+        return LibreOfficeApplication(listener.start())
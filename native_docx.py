@@ -0,0 +1,382 @@
+"""
+简单.docx文档的快速转换
+直接用python-docx解析文档、用reportlab生成PDF，不需要启动Word/WPS。
+只处理由标题、正文段落和列表组成的简单文档（支持对齐、分页、文字的字号和颜色），
+包含表格、图片、页眉页脚等复杂排版的文档仍然交给Office转换，由classify_docx()负责判断。
+"""
+import os
+import re
+import zipfile
+import importlib.util
+import xml.etree.ElementTree as ElementTree
+from html import escape
+
+# 可选依赖：python-docx和reportlab都安装时才启用快速转换。
+# 这里只检查是否安装，真正的导入推迟到第一次快速转换时，避免拖慢程序启动
+HAS_NATIVE = all(importlib.util.find_spec(name) is not None for name in ("docx", "reportlab"))
+
+# document.xml中出现这些标记说明排版复杂，需要Office转换
+COMPLEX_MARKERS = {
+    b"<w:tbl>": "表格",
+    b"<w:drawing": "图片或图形",
+    b"<w:pict": "图片或图形",
+    b"<w:object": "嵌入对象",
+    b"<mc:AlternateContent": "兼容性内容",
+    b"<m:oMath": "公式",
+    b"<w:txbxContent": "文本框",
+    b"<w:fldChar": "域代码",
+    b"<w:fldSimple": "域代码",
+    b"<w:ins ": "修订记录",
+    b"<w:del ": "修订记录",
+    b"<w:footnoteReference": "脚注",
+    b"<w:endnoteReference": "尾注",
+    b"<w:commentReference": "批注",
+    b"<w:headerReference": "页眉",
+    b"<w:footerReference": "页脚",
+    b"<w:framePr": "图文框",
+}
+
+# 超过这个大小的document.xml不再逐个检查，直接交给Office
+MAX_DOCUMENT_XML = 2 * 1024 * 1024
+
+# 标题样式对应的字号（磅）
+HEADING_SIZES = {"Title": 24, "Heading 1": 18, "Heading 2": 15, "Heading 3": 13}
+
+_COLUMNS_RE = re.compile(rb'<w:cols [^>]*w:num="([2-9])"')
+
+_CJK_FONT = "STSong-Light"
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+# 能直接生成的列表编号格式（numbering.xml中的numFmt）
+LIST_FORMATS = ("bullet", "decimal", "lowerLetter", "upperLetter", "lowerRoman", "upperRoman", "none")
+
+_ROMAN = ((1000, "m"), (900, "cm"), (500, "d"), (400, "cd"), (100, "c"), (90, "xc"),
+          (50, "l"), (40, "xl"), (10, "x"), (9, "ix"), (5, "v"), (4, "iv"), (1, "i"))
+
+
+def _val(element, path):
+    """element下path元素的w:val属性，不存在时返回None"""
+    child = element.find(path)
+    return None if child is None else child.get(_W + "val")
+
+
+def read_numbering(archive):
+    """读取列表编号定义，返回 (编号格式, 样式的编号)
+
+    编号格式为 {numId: {级别: (numFmt, 起始值)}}，样式的编号为 {样式ID: (numId, 级别)}
+    （沿basedOn继承）。通过numStyleLink等间接引用的编号定义不解析，在编号格式中缺失。
+    """
+    formats = {}
+    try:
+        root = ElementTree.fromstring(archive.read("word/numbering.xml"))
+    except KeyError:
+        root = None
+    if root is not None:
+        abstract = {}
+        for node in root.findall(_W + "abstractNum"):
+            levels = {}
+            for lvl in node.findall(_W + "lvl"):
+                start = _val(lvl, _W + "start")
+                levels[int(lvl.get(_W + "ilvl", "0"))] = (_val(lvl, _W + "numFmt") or "decimal",
+                                                         int(start) if start else 1)
+            abstract[node.get(_W + "abstractNumId")] = levels
+        for num in root.findall(_W + "num"):
+            levels = dict(abstract.get(_val(num, _W + "abstractNumId"), {}))
+            for override in num.findall(_W + "lvlOverride"):
+                ilvl = int(override.get(_W + "ilvl", "0"))
+                lvl = override.find(_W + "lvl")
+                if lvl is not None and _val(lvl, _W + "numFmt"):
+                    start = _val(lvl, _W + "start")
+                    levels[ilvl] = (_val(lvl, _W + "numFmt"), int(start) if start else 1)
+                start = _val(override, _W + "startOverride")
+                if start and ilvl in levels:
+                    levels[ilvl] = (levels[ilvl][0], int(start))
+            if levels:
+                formats[num.get(_W + "numId")] = levels
+
+    styles = {}
+    try:
+        root = ElementTree.fromstring(archive.read("word/styles.xml"))
+    except KeyError:
+        root = None
+    if root is not None:
+        based_on, direct = {}, {}
+        for style in root.findall(_W + "style"):
+            style_id = style.get(_W + "styleId")
+            based_on[style_id] = _val(style, _W + "basedOn")
+            num_pr = style.find(f"{_W}pPr/{_W}numPr")
+            if num_pr is not None:
+                direct[style_id] = (_val(num_pr, _W + "numId"), int(_val(num_pr, _W + "ilvl") or 0))
+        for style_id in based_on:
+            current, seen = style_id, set()
+            while current is not None and current not in seen:
+                if current in direct:
+                    styles[style_id] = direct[current]
+                    break
+                seen.add(current)
+                current = based_on.get(current)
+    return formats, styles
+
+
+def paragraph_numbering(p, style_numbering):
+    """段落（w:p元素）的 (numId, 级别)，不是列表时返回None；段落自己的numPr优先于样式"""
+    num_pr = p.find(f"{_W}pPr/{_W}numPr")
+    style_id = _val(p, f"{_W}pPr/{_W}pStyle")
+    inherited = style_numbering.get(style_id)
+    if num_pr is not None:
+        num_id = _val(num_pr, _W + "numId")
+        ilvl = _val(num_pr, _W + "ilvl")
+        if num_id is None and inherited is not None:
+            num_id = inherited[0]
+        if ilvl is None:
+            ilvl = inherited[1] if inherited is not None else 0
+        numbering = (num_id, int(ilvl))
+    else:
+        numbering = inherited
+    if numbering is None or numbering[0] in (None, "0"):
+        return None  # numId为0表示取消编号
+    return numbering
+
+
+def classify_docx(path):
+    """判断文档能否快速转换，返回 (是否简单, 原因)"""
+    if not path.lower().endswith(".docx"):
+        return False, "不是.docx格式"
+
+    try:
+        with zipfile.ZipFile(path) as archive:
+            names = archive.namelist()
+            if any(name.startswith("word/media/") or name.startswith("word/embeddings/")
+                   for name in names):
+                return False, "包含图片或嵌入对象"
+
+            info = archive.getinfo("word/document.xml")
+            if info.file_size > MAX_DOCUMENT_XML:
+                return False, "文档过大"
+            xml = archive.read(info)
+
+            for marker, reason in COMPLEX_MARKERS.items():
+                if marker in xml:
+                    return False, f"包含{reason}"
+            if xml.count(b"<w:sectPr") > 1:
+                return False, "包含多个分节"
+            if _COLUMNS_RE.search(xml):
+                return False, "包含分栏"
+
+            # 列表的项目符号或编号由numPr和编号定义决定，无法确定时交给Office
+            formats, style_numbering = read_numbering(archive)
+            for p in ElementTree.fromstring(xml).iter(_W + "p"):
+                numbering = paragraph_numbering(p, style_numbering)
+                if numbering is None:
+                    continue
+                level = formats.get(numbering[0], {}).get(numbering[1])
+                if level is None or level[0] not in LIST_FORMATS:
+                    return False, "包含无法识别的列表编号"
+    except (zipfile.BadZipFile, KeyError, OSError, ElementTree.ParseError, ValueError):
+        return False, "无法解析docx结构"
+    return True, "简单文档"
+
+
+def _register_fonts():
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.cidfonts import UnicodeCIDFont
+
+    if _CJK_FONT not in pdfmetrics.getRegisteredFontNames():
+        pdfmetrics.registerFont(UnicodeCIDFont(_CJK_FONT))
+        # 中文字体没有单独的粗体/斜体，映射到同一字体
+        pdfmetrics.registerFontFamily(_CJK_FONT, normal=_CJK_FONT, bold=_CJK_FONT,
+                                      italic=_CJK_FONT, boldItalic=_CJK_FONT)
+
+
+def _run_markup(run, text):
+    """一段文字加上run的粗体/斜体/下划线、字号和颜色标记"""
+    if run.bold:
+        text = f"<b>{text}</b>"
+    if run.italic:
+        text = f"<i>{text}</i>"
+    if run.underline:
+        text = f"<u>{text}</u>"
+    attributes = []
+    if run.font.size is not None:
+        attributes.append(f'size="{run.font.size.pt:g}"')
+    try:
+        color = run.font.color.rgb
+    except (AttributeError, ValueError):
+        color = None
+    if color is not None:
+        attributes.append(f'color="#{color}"')
+    if attributes:
+        text = f"<font {' '.join(attributes)}>{text}</font>"
+    return text
+
+
+def _paragraph_chunks(paragraph):
+    """把段落转换成reportlab标记，按分页符分成多段，返回 (各段标记, 最大字号或None)"""
+    chunks = [[]]
+    largest = None
+    for run in paragraph.runs:
+        if run.font.size is not None:
+            largest = max(largest or 0, run.font.size.pt)
+        text = []
+
+        def flush():
+            if text:
+                chunks[-1].append(_run_markup(run, "".join(text)))
+                text.clear()
+
+        for child in run._r:
+            tag = child.tag.rsplit("}", 1)[-1]
+            if tag == "t":
+                text.append(escape(child.text or "", quote=False))
+            elif tag == "tab":
+                text.append("    ")
+            elif tag == "br" and child.get(_W + "type") in ("page", "column"):
+                flush()
+                chunks.append([])  # 单栏文档中分栏符和分页符效果相同
+            elif tag in ("br", "cr"):
+                text.append("<br/>")
+        flush()
+    return ["".join(chunk) for chunk in chunks], largest
+
+
+def _paragraph_format(paragraph, name):
+    """段落格式属性，段落本身没有设置时沿样式的basedOn查找"""
+    value = getattr(paragraph.paragraph_format, name)
+    style = paragraph.style
+    while value is None and style is not None:
+        value = getattr(style.paragraph_format, name)
+        style = style.base_style
+    return value
+
+
+def _format_number(number, fmt):
+    if fmt == "decimal":
+        return str(number)
+    if fmt in ("lowerLetter", "upperLetter"):
+        letters = ""
+        while number > 0:
+            number, rest = divmod(number - 1, 26)
+            letters = chr(ord("a") + rest) + letters
+        return letters if fmt == "lowerLetter" else letters.upper()
+    roman = ""
+    for value, symbol in _ROMAN:
+        while number >= value:
+            roman += symbol
+            number -= value
+    return roman if fmt == "lowerRoman" else roman.upper()
+
+
+def _list_prefix(paragraph, numbering, counters):
+    """列表段落的前缀和级别：项目符号或编号，不是列表时返回 ("", 0)
+
+    numbering为read_numbering()的结果。编号按numId和级别计数，与Word一样，
+    中间隔着普通段落时同一个列表继续编号，上一级出现新的一项时下一级重新编号。
+    """
+    formats, style_numbering = numbering
+    found = paragraph_numbering(paragraph._p, style_numbering)
+    if found is None:
+        return "", 0
+    num_id, ilvl = found
+    fmt, start = formats.get(num_id, {}).get(ilvl, ("bullet", 1))
+    for key in [key for key in counters if key[0] == num_id and key[1] > ilvl]:
+        del counters[key]
+    if fmt == "none":
+        return "", ilvl
+    if fmt not in LIST_FORMATS or fmt == "bullet":
+        return "• ", ilvl
+    counters[num_id, ilvl] = counters.get((num_id, ilvl), start - 1) + 1
+    return f"{_format_number(counters[num_id, ilvl], fmt)}. ", ilvl
+
+
+def render_docx_to_pdf(word_path, pdf_path):
+    """用python-docx + reportlab把简单文档直接生成PDF"""
+    if not HAS_NATIVE:
+        raise Exception("未安装python-docx或reportlab，无法快速转换")
+    import docx
+    from docx.enum.text import WD_ALIGN_PARAGRAPH
+    from reportlab.lib.enums import TA_CENTER, TA_JUSTIFY, TA_LEFT, TA_RIGHT
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import ParagraphStyle
+    from reportlab.platypus import SimpleDocTemplate, PageBreak, Paragraph, Spacer
+
+    _register_fonts()
+    alignments = {
+        WD_ALIGN_PARAGRAPH.LEFT: TA_LEFT,
+        WD_ALIGN_PARAGRAPH.CENTER: TA_CENTER,
+        WD_ALIGN_PARAGRAPH.RIGHT: TA_RIGHT,
+        WD_ALIGN_PARAGRAPH.JUSTIFY: TA_JUSTIFY,
+        WD_ALIGN_PARAGRAPH.DISTRIBUTE: TA_JUSTIFY,
+    }
+
+    with zipfile.ZipFile(word_path) as archive:
+        numbering = read_numbering(archive)
+    document = docx.Document(word_path)
+    pagesize, margins = A4, (72, 72, 72, 72)
+    if document.sections:
+        section = document.sections[0]
+        if section.page_width and section.page_height:
+            pagesize = (section.page_width.pt, section.page_height.pt)
+        margins = tuple(m.pt if m is not None else 72 for m in (
+            section.left_margin, section.right_margin, section.top_margin, section.bottom_margin))
+
+    body = ParagraphStyle("body", fontName=_CJK_FONT, fontSize=10.5, leading=16,
+                          wordWrap="CJK", spaceAfter=4)
+    styles = {}
+    story = []
+    counters = {}
+
+    def paragraph_style(kind, size, level, alignment, largest):
+        """按类型、对齐方式和最大字号缓存段落样式"""
+        key = (kind, size, level, alignment, largest)
+        style = styles.get(key)
+        if style is None:
+            style = body
+            if size:
+                style = ParagraphStyle(kind, parent=body, fontSize=size, leading=size * 1.4,
+                                       spaceBefore=size / 2, spaceAfter=size / 3)
+            elif kind == "list":
+                style = ParagraphStyle(kind, parent=body, leftIndent=18 * (level + 1),
+                                       firstLineIndent=-12)
+            # 比样式字号大的文字需要更大的行距
+            leading = max(style.leading, largest * 1.4) if largest else style.leading
+            style = ParagraphStyle(f"{kind}-{len(styles)}", parent=style, leading=leading,
+                                   alignment=alignments.get(alignment, style.alignment))
+            styles[key] = style
+        return style
+
+    for paragraph in document.paragraphs:
+        style_name = paragraph.style.name if paragraph.style is not None else ""
+        chunks, largest = _paragraph_chunks(paragraph)
+        if _paragraph_format(paragraph, "page_break_before") and story:
+            story.append(PageBreak())
+        alignment = _paragraph_format(paragraph, "alignment")
+
+        size = HEADING_SIZES.get(style_name)
+        if size is None and style_name.startswith("Heading"):
+            size = 12
+        prefix, level = ("", 0) if size else _list_prefix(paragraph, numbering, counters)
+
+        for index, markup in enumerate(chunks):
+            if index:
+                story.append(PageBreak())
+            if not markup.strip():
+                if len(chunks) == 1:
+                    story.append(Spacer(1, body.leading / 2))
+                continue
+            if size:
+                style = paragraph_style(style_name, size, 0, alignment, largest)
+                story.append(Paragraph(f"<b>{markup}</b>", style))
+            elif prefix:
+                style = paragraph_style("list", None, level, alignment, largest)
+                story.append(Paragraph(escape(prefix, quote=False) + markup, style))
+                prefix = ""  # 分页后的后半段不再重复编号
+            else:
+                story.append(Paragraph(markup, paragraph_style("body", None, 0, alignment, largest)))
+
+    left, right, top, bottom = margins
+    title = os.path.splitext(os.path.basename(word_path))[0]
+    template = SimpleDocTemplate(pdf_path, pagesize=pagesize, title=title,
+                                 leftMargin=left, rightMargin=right,
+                                 topMargin=top, bottomMargin=bottom)
+    template.build(story or [Spacer(1, 1)])
@@ -0,0 +1,213 @@
+"""
+Office实例池
+在多个文档之间复用Word/WPS的Application对象，避免每个文件都重新启动Office
+"""
+import threading
+import time
+import importlib.util
+from contextlib import contextmanager
+
+# 只检查pywin32是否安装，真正的导入推迟到第一次启动Word/WPS时（导入win32com需要几百毫秒）
+HAS_WIN32COM = importlib.util.find_spec("win32com") is not None
+
+
+def dispatch_office_app(prog_id):
+    """使用DispatchEx创建新的Office实例（默认的创建方式）"""
+    if not HAS_WIN32COM:
+        raise Exception("未安装pywin32库")
+    import win32com.client
+    return win32com.client.DispatchEx(prog_id)
+
+
+class _PooledInstance:
+    """池中的一个Office实例及其使用记录"""
+
+    def __init__(self, app):
+        self.app = app
+        self.created_at = time.monotonic()
+        self.documents = 0
+
+
+class OfficeInstancePool:
+    """可回收的Office实例池
+
+    - 实例在多个文档之间复用，转换完成后放回池中
+    - 转换满max_documents个文档、存活超过max_age秒或发生COM错误后回收重启
+    - dispatch参数可替换为模拟实现，便于在没有Office的环境中测试
+
+    注意: COM对象属于创建它的线程（单线程套间），池只能在同一个线程中使用。
+    """
+
+    def __init__(self, prog_id, dispatch=None, size=1, max_documents=50,
+                 max_age=600, com_init=True):
+        self.prog_id = prog_id
+        self.dispatch = dispatch or dispatch_office_app
+        self.size = size
+        self.max_documents = max_documents
+        self.max_age = max_age
+        # 使用模拟实现时不需要初始化COM
+        self.com_init = com_init and dispatch is None and HAS_WIN32COM
+
+        self._lock = threading.Lock()
+        self._idle = []
+        self._busy = {}  # id(app) -> _PooledInstance
+        self._com_initialized = False
+        self._closed = False
+
+        # 统计计数
+        self.hits = 0       # 复用已有实例
+        self.misses = 0     # 需要启动新实例
+        self.restarts = 0   # 因回收或错误而关闭的实例
+        self.startup_time = 0.0
+        self.quit_time = 0.0
+        self._stage_times = {}  # 自上次take_stage_times()以来各阶段的耗时
+
+    def _start_instance(self):
+        """启动一个新的Office实例"""
+        if self.com_init and not self._com_initialized:
+            start = time.perf_counter()
+            import pythoncom
+            pythoncom.CoInitialize()  # 初始化COM
+            self._com_initialized = True
+            self._add_stage_time("com_init", time.perf_counter() - start)
+
+        start = time.perf_counter()
+        app = self.dispatch(self.prog_id)
+        try:
+            app.Visible = False
+            app.DisplayAlerts = 0  # 禁用警告对话框
+        except Exception:
+            self._quit(app)
+            raise
+        elapsed = time.perf_counter() - start
+        self.startup_time += elapsed
+        self._add_stage_time("dispatch", elapsed)
+        return _PooledInstance(app)
+
+    def _quit(self, app):
+        """关闭Office实例，忽略已失效实例的错误"""
+        start = time.perf_counter()
+        try:
+            app.Quit()
+        except:
+            pass
+        elapsed = time.perf_counter() - start
+        self.quit_time += elapsed
+        self._add_stage_time("quit", elapsed)
+
+    def _add_stage_time(self, stage, seconds):
+        self._stage_times[stage] = self._stage_times.get(stage, 0.0) + seconds
+
+    def take_stage_times(self):
+        """返回并清空自上次调用以来COM初始化、启动和退出Office的耗时"""
+        stage_times, self._stage_times = self._stage_times, {}
+        return stage_times
+
+    def _is_expired(self, instance):
+        if self.max_documents and instance.documents >= self.max_documents:
+            return True
+        if self.max_age and time.monotonic() - instance.created_at >= self.max_age:
+            return True
+        return False
+
+    def acquire(self):
+        """取出一个可用的Office实例"""
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("实例池已关闭")
+            while self._idle:
+                instance = self._idle.pop()
+                if self._is_expired(instance):
+                    self._quit(instance.app)
+                    self.restarts += 1
+                    continue
+                self.hits += 1
+                self._busy[id(instance.app)] = instance
+                return instance.app
+            self.misses += 1
+
+        instance = self._start_instance()
+        with self._lock:
+            self._busy[id(instance.app)] = instance
+        return instance.app
+
+    def release(self, app, error=False):
+        """归还Office实例；error=True表示本次使用发生了COM错误，实例将被重启"""
+        with self._lock:
+            instance = self._busy.pop(id(app), None)
+            if instance is None:
+                return
+            instance.documents += 1
+            recycle = error or self._is_expired(instance)
+            keep = not recycle and not self._closed and len(self._idle) < self.size
+            if keep:
+                self._idle.append(instance)
+            elif recycle:
+                self.restarts += 1
+
+        if not keep:
+            self._quit(app)
+
+    def warm(self):
+        """空闲时预先启动一个Office实例（并替换已过期的空闲实例），下一个文档不需要等待Office启动"""
+        with self._lock:
+            if self._closed:
+                return
+            expired = [instance for instance in self._idle if self._is_expired(instance)]
+            self._idle = [instance for instance in self._idle if instance not in expired]
+            self.restarts += len(expired)
+            needed = not self._idle and not self._busy
+            if needed:
+                self.misses += 1
+
+        for instance in expired:
+            self._quit(instance.app)
+        if needed:
+            instance = self._start_instance()
+            with self._lock:
+                self._idle.append(instance)
+
+    @contextmanager
+    def instance(self):
+        """上下文管理器形式：with pool.instance() as app: ..."""
+        app = self.acquire()
+        error = False
+        try:
+            yield app
+        except Exception:
+            error = True
+            raise
+        finally:
+            self.release(app, error=error)
+
+    def stats(self):
+        """返回池的统计信息"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "restarts": self.restarts,
+                "idle": len(self._idle),
+                "busy": len(self._busy),
+                "startup_time": round(self.startup_time, 3),
+                "quit_time": round(self.quit_time, 3),
+            }
+
+    def close(self):
+        """关闭池中所有实例"""
+        with self._lock:
+            self._closed = True
+            instances = self._idle + list(self._busy.values())
+            self._idle = []
+            self._busy = {}
+
+        for instance in instances:
+            self._quit(instance.app)
+
+        if self._com_initialized:
+            try:
+                import pythoncom
+                pythoncom.CoUninitialize()  # 清理COM
+            except:
+                pass
+            self._com_initialized = False
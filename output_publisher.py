@@ -0,0 +1,145 @@
+"""
+PDF写回
+Office直接把PDF保存到网络共享上时，工作进程要等远程写入完成，其他人还可能读到写了一半的PDF。
+输出目录在网络共享上时，工作进程先把PDF导出到本地临时目录，
+OutputPublisher在后台线程中把PDF复制到目标目录的临时文件，写完后再改名为最终文件名，
+读者只会看到旧文件或完整的新文件。写回和后面文件的转换同时进行。
+"""
+import os
+import time
+import queue
+import shutil
+import tempfile
+import threading
+
+from folder_scanner import is_network_path
+from source_staging import remove_stale_runs
+
+# 同时写回的文件数
+DEFAULT_PUBLISH_WORKERS = 4
+
+# 目标文件被其他程序打开时改名会失败，重试次数和间隔（秒）
+REPLACE_RETRIES = 5
+REPLACE_RETRY_DELAY = 0.5
+
+# 写回时使用的临时文件后缀（以"."开头的隐藏文件，写完后改名）
+PARTIAL_SUFFIX = ".w2p-partial"
+
+
+def default_scratch_dir():
+    """PDF的本地临时目录，可以用环境变量W2P_SCRATCH_DIR修改"""
+    return os.environ.get("W2P_SCRATCH_DIR") or os.path.join(tempfile.gettempdir(), "w2p_scratch")
+
+
+def publish_file(path, dst):
+    """把本地文件复制到dst旁边的临时文件，再原子地替换dst"""
+    folder = os.path.dirname(dst) or "."
+    os.makedirs(folder, exist_ok=True)
+    fd, partial = tempfile.mkstemp(prefix=f".{os.path.basename(dst)}.", suffix=PARTIAL_SUFFIX, dir=folder)
+    os.close(fd)
+    try:
+        shutil.copyfile(path, partial)
+        for attempt in range(REPLACE_RETRIES):
+            try:
+                os.replace(partial, dst)
+                return
+            except PermissionError:
+                if attempt == REPLACE_RETRIES - 1:
+                    raise
+                time.sleep(REPLACE_RETRY_DELAY)
+    except BaseException:
+        try:
+            os.remove(partial)
+        except OSError:
+            pass
+        raise
+
+
+class OutputPublisher:
+    """把工作进程导出到本地的PDF写回目标目录（由ConversionEngine在父进程中使用）
+
+    scratch_path(task)为任务分配本地导出路径；publish(result, path, on_done)在后台写回，
+    完成后在result中记录publish_wait/publish_time（失败时把状态改为failed）并调用on_done(result)。
+    network_only=False时本地目标目录也先导出到临时目录（用于测试）。
+    """
+
+    def __init__(self, root=None, workers=DEFAULT_PUBLISH_WORKERS, network_only=True):
+        base = root or default_scratch_dir()
+        os.makedirs(base, exist_ok=True)
+        remove_stale_runs(base)
+        self.root = tempfile.mkdtemp(prefix="run_", dir=base)
+        self.network_only = network_only
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._depth = 0  # 等待和正在写回的文件数
+        self.stats = {"published": 0, "bytes": 0, "errors": 0, "publish_time": 0.0,
+                      "max_publish_time": 0.0, "max_depth": 0}
+        self._threads = [
+            threading.Thread(target=self._run, name=f"publish-{i}", daemon=True)
+            for i in range(max(1, workers))
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def wants(self, dst):
+        """这个PDF是否先导出到本地"""
+        return not self.network_only or is_network_path(dst)
+
+    def scratch_path(self, task):
+        return os.path.join(self.root, f"{task['id']}.pdf")
+
+    @property
+    def depth(self):
+        with self._lock:
+            return self._depth
+
+    def publish(self, result, path, on_done):
+        with self._lock:
+            self._depth += 1
+            self.stats["max_depth"] = max(self.stats["max_depth"], self._depth)
+        self._queue.put((result, path, on_done, time.perf_counter()))
+
+    def discard(self, path):
+        """删除不需要写回的本地PDF（转换失败、超时等）"""
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def close(self):
+        """等待写回完成，停止线程并删除本地临时目录"""
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            result, path, on_done, queued = item
+            start = time.perf_counter()
+            try:
+                size = os.path.getsize(path)
+                publish_file(path, result["dst"])
+            except OSError as e:
+                error = f"写入PDF失败: {e}"
+                result.update(status="failed", error=error, hints=[f"⚠ {error}"])
+                with self._lock:
+                    self.stats["errors"] += 1
+            else:
+                elapsed = time.perf_counter() - start
+                with self._lock:
+                    self.stats["published"] += 1
+                    self.stats["bytes"] += size
+                    self.stats["publish_time"] += elapsed
+                    self.stats["max_publish_time"] = max(self.stats["max_publish_time"], elapsed)
+            finally:
+                self.discard(path)
+                with self._lock:
+                    self._depth -= 1
+            result["publish_wait"] = round(start - queued, 4)
+            result["publish_time"] = round(time.perf_counter() - start, 4)
+            on_done(result)
@@ -0,0 +1,292 @@
+"""
+PDF合并
+把一个文件夹转换出的PDF按路径或自然顺序（第2章排在第10章前面）合并成一个PDF，每个源文件一个书签。
+
+StreamingPdfMerger边读边写：每个PDF只在追加时打开，页面和它引用的对象重新编号后立即写入输出文件，
+内存中只保留每页的对象编号和每个书签，几千个PDF合并时内存占用基本不变。
+读取PDF使用pypdf（可选依赖，pip install pypdf）。
+
+MergeStage接在转换之后：扫描时登记每个源文件，转换完成的PDF只要前面的都已完成就立即追加，
+不需要等整批转换结束再合并。
+"""
+import os
+import re
+import threading
+import importlib.util
+
+HAS_PYPDF = importlib.util.find_spec("pypdf") is not None
+
+# 合并顺序
+MERGE_ORDERS = ("natural", "path")
+
+# 写入过程中使用的后缀，完成后改名
+PARTIAL_SUFFIX = ".partial"
+
+_DIGITS_RE = re.compile(r"(\d+)")
+
+
+def natural_key(rel_path):
+    """自然排序键：逐级比较目录和文件名，数字按数值比较"""
+    parts = rel_path.replace("\\", "/").split("/")
+    return [[int(token) if token.isdigit() else token.lower() for token in _DIGITS_RE.split(part)]
+            for part in parts]
+
+
+def path_key(rel_path):
+    """按路径排序：逐级比较目录和文件名（不区分大小写）"""
+    return [part.lower() for part in rel_path.replace("\\", "/").split("/")]
+
+
+def _pdf_string(text):
+    """书签标题（UTF-16BE，支持中文）"""
+    from pypdf.generic import ByteStringObject
+    return ByteStringObject(b"\xfe\xff" + text.encode("utf-16-be"))
+
+
+class StreamingPdfMerger:
+    """把多个PDF依次追加到一个输出文件（在一个线程中使用）
+
+    用法:
+        merger = StreamingPdfMerger("book.pdf")
+        merger.append("ch1.pdf", "第1章")
+        merger.close()
+    close()之前输出写在 book.pdf.partial 中，异常退出时不会留下不完整的PDF。
+    """
+
+    def __init__(self, path):
+        if not HAS_PYPDF:
+            raise RuntimeError("合并PDF需要安装pypdf（pip install pypdf）")
+        self.path = os.path.abspath(path)
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._file = open(self.path + PARTIAL_SUFFIX, "wb")
+        self._file.write(b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n")
+        self._offsets = [None, None, None]  # 对象编号 -> 文件中的位置（1为目录，2为页面树，写在最后）
+        self._pages = []  # 每页的对象编号
+        self._bookmarks = []  # (标题, 第一页的对象编号)
+
+    @property
+    def page_count(self):
+        return len(self._pages)
+
+    def _allocate(self):
+        self._offsets.append(None)
+        return len(self._offsets) - 1
+
+    def _write_object(self, number, obj):
+        # 流对象原样写出编码后的数据（不解压再压缩），/Length按数据长度重新生成
+        self._offsets[number] = self._file.tell()
+        self._file.write(f"{number} 0 obj\n".encode())
+        obj.write_to_stream(self._file)
+        self._file.write(b"\nendobj\n")
+
+    def append(self, pdf_path, title=None):
+        """追加一个PDF的所有页面，title不为None时添加指向第一页的书签，返回追加的页数"""
+        from pypdf import PdfReader
+        from pypdf.generic import ArrayObject, DictionaryObject, IndirectObject, NameObject, StreamObject
+
+        with open(pdf_path, "rb") as f:
+            reader = PdfReader(f)
+            if reader.is_encrypted:
+                raise ValueError("PDF已加密，无法合并")
+            pages = list(reader.pages)
+            # 旧对象 -> 新编号。先为所有页面分配编号，页面之间的链接不会把整个页面树复制进来
+            mapping = {}
+            for page in pages:
+                mapping[page.indirect_reference.idnum, page.indirect_reference.generation] = self._allocate()
+            pending = []  # 待写入的 (新编号, 原对象)
+
+            def copy(obj):
+                if isinstance(obj, IndirectObject):
+                    key = (obj.idnum, obj.generation)
+                    number = mapping.get(key)
+                    if number is None:
+                        number = mapping[key] = self._allocate()
+                        pending.append((number, obj.get_object()))
+                    return IndirectObject(number, 0, None)
+                if isinstance(obj, StreamObject):
+                    result = StreamObject()
+                    result._data = obj._data
+                    for key, value in obj.items():
+                        if key != "/Length":
+                            result[NameObject(key)] = copy(value)
+                    return result
+                if isinstance(obj, DictionaryObject):
+                    result = DictionaryObject()
+                    for key, value in obj.items():
+                        result[NameObject(key)] = copy(value)
+                    return result
+                if isinstance(obj, ArrayObject):
+                    return ArrayObject(copy(value) for value in obj)
+                return obj
+
+            first = None
+            merged = len(self._pages)
+            try:
+                self._copy_pages(pages, mapping, pending, copy)
+            except Exception:
+                del self._pages[merged:]  # 已写出的对象成为没有引用的垃圾，不影响结果
+                raise
+            if len(self._pages) > merged:
+                first = self._pages[merged]
+        if title is not None and first is not None:
+            self._bookmarks.append((title, first))
+        return len(pages)
+
+    def _copy_pages(self, pages, mapping, pending, copy):
+        from pypdf.generic import DictionaryObject, IndirectObject, NameObject
+        for page in pages:
+            number = mapping[page.indirect_reference.idnum, page.indirect_reference.generation]
+            copied = DictionaryObject()
+            for key, value in page.items():
+                if key not in ("/Parent", "/B"):  # 不复制原页面树和文章线程
+                    copied[NameObject(key)] = copy(value)
+            copied[NameObject("/Parent")] = IndirectObject(2, 0, None)
+            self._write_object(number, copied)
+            # 页面引用的字体、图片等对象写完后就不再保留在内存中
+            while pending:
+                ref_number, obj = pending.pop()
+                self._write_object(ref_number, copy(obj))
+            self._pages.append(number)
+
+    def close(self):
+        """写出页面树、书签、交叉引用表，并改名为最终文件名"""
+        from pypdf.generic import (
+            ArrayObject, DictionaryObject, IndirectObject, NameObject, NumberObject,
+        )
+
+        def ref(number):
+            return IndirectObject(number, 0, None)
+
+        if self._file is None:
+            return
+        catalog = DictionaryObject({NameObject("/Type"): NameObject("/Catalog"),
+                                    NameObject("/Pages"): ref(2)})
+        if self._bookmarks:
+            outlines = self._allocate()
+            items = [self._allocate() for _ in self._bookmarks]
+            for i, ((title, page), number) in enumerate(zip(self._bookmarks, items)):
+                item = DictionaryObject({
+                    NameObject("/Title"): _pdf_string(title),
+                    NameObject("/Parent"): ref(outlines),
+                    NameObject("/Dest"): ArrayObject([ref(page), NameObject("/Fit")]),
+                })
+                if i > 0:
+                    item[NameObject("/Prev")] = ref(items[i - 1])
+                if i < len(items) - 1:
+                    item[NameObject("/Next")] = ref(items[i + 1])
+                self._write_object(number, item)
+            self._write_object(outlines, DictionaryObject({
+                NameObject("/Type"): NameObject("/Outlines"),
+                NameObject("/First"): ref(items[0]),
+                NameObject("/Last"): ref(items[-1]),
+                NameObject("/Count"): NumberObject(len(items)),
+            }))
+            catalog[NameObject("/Outlines")] = ref(outlines)
+            catalog[NameObject("/PageMode")] = NameObject("/UseOutlines")
+        self._write_object(2, DictionaryObject({
+            NameObject("/Type"): NameObject("/Pages"),
+            NameObject("/Kids"): ArrayObject(ref(number) for number in self._pages),
+            NameObject("/Count"): NumberObject(len(self._pages)),
+        }))
+        self._write_object(1, catalog)
+
+        xref = self._file.tell()
+        lines = [f"xref\n0 {len(self._offsets)}\n", "0000000000 65535 f \n"]
+        for offset in self._offsets[1:]:
+            lines.append(f"{offset:010d} 00000 n \n" if offset is not None else "0000000000 00000 f \n")
+        self._file.write("".join(lines).encode())
+        self._file.write(f"trailer\n<< /Size {len(self._offsets)} /Root 1 0 R >>\n"
+                         f"startxref\n{xref}\n%%EOF\n".encode())
+        self._file.close()
+        self._file = None
+        os.replace(self.path + PARTIAL_SUFFIX, self.path)
+
+    def abort(self):
+        """放弃合并，删除未完成的输出"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            try:
+                os.remove(self.path + PARTIAL_SUFFIX)
+            except OSError:
+                pass
+
+
+class MergeStage:
+    """转换后的合并阶段：按顺序追加已经转换完成的PDF（expect可在扫描线程中调用）
+
+    root为源文件夹，书签标题为相对root的路径（不含扩展名）。所有源文件登记完（finish_input）之前
+    顺序还不能确定，不追加；之后每完成一个文件，就把排在最前面、已经完成的PDF依次追加。
+    转换失败的文件跳过，记在missing中。
+    """
+
+    def __init__(self, path, root, order="natural"):
+        if order not in MERGE_ORDERS:
+            raise ValueError(f"不支持的合并顺序: {order}")
+        self.root = root if os.path.isdir(root) else os.path.dirname(root)
+        self._key = natural_key if order == "natural" else path_key
+        self._merger = StreamingPdfMerger(path)
+        self.path = self._merger.path
+        self._lock = threading.Lock()
+        self._parts = {}  # 源文件 -> PDF路径
+        self._state = {}  # 源文件 -> True（已完成）/ False（失败）
+        self._order = None  # 登记完成后排好序的源文件
+        self._next = 0
+        self.merged = 0
+        self.missing = []
+        self.errors = []
+
+    def expect(self, src, dst, done=False):
+        """登记一个源文件；done=True表示PDF已经存在（未修改跳过的文件）"""
+        with self._lock:
+            self._parts[src] = dst
+            if done:
+                self._state[src] = True
+
+    def finish_input(self):
+        with self._lock:
+            self._order = sorted(self._parts, key=lambda src: self._key(os.path.relpath(src, self.root)))
+            self._flush()
+
+    def part_done(self, src, ok):
+        """一个文件转换完成（成功或失败），追加所有可以追加的PDF"""
+        with self._lock:
+            if src in self._parts:
+                self._state[src] = ok
+                self._flush()
+
+    def _flush(self):
+        if self._order is None:
+            return
+        while self._next < len(self._order):
+            src = self._order[self._next]
+            if src not in self._state:
+                return  # 还没有转换完，后面的文件先等待
+            self._next += 1
+            if not self._state[src]:
+                self.missing.append(src)
+                continue
+            title = os.path.splitext(os.path.relpath(src, self.root))[0].replace("\\", "/")
+            try:
+                self._merger.append(self._parts[src], title)
+                self.merged += 1
+            except Exception as e:
+                self.missing.append(src)
+                self.errors.append(f"{os.path.basename(src)}: {e}")
+
+    @property
+    def page_count(self):
+        return self._merger.page_count
+
+    def close(self, complete=True):
+        """complete=True时把剩下的文件当作失败，写完合并的PDF；False时放弃（例如被中断）"""
+        with self._lock:
+            if not complete:
+                self._merger.abort()
+                return
+            if self._order is None:
+                self._order = sorted(self._parts, key=lambda src: self._key(os.path.relpath(src, self.root)))
+            for src in self._order[self._next:]:
+                self._state.setdefault(src, False)
+            self._flush()
+            self._merger.close()
@@ -0,0 +1,208 @@
+"""
+PDF优化
+Word中嵌入的扫描图片通常按原始分辨率写进PDF，文件比需要的大几十倍，传输和存储都慢。
+转换成功后PdfOptimizer在单独的进程池中优化PDF：
+    - 图片按页面尺寸估算的分辨率超过上限时缩小并重新压缩为JPEG（需要Pillow）
+    - 未压缩的内容流压缩，对象放进对象流（减少交叉引用表和对象头的大小）
+优化在独立进程中进行，不占用Office工作进程，后面的文件继续转换。
+优化后的文件不比原文件小时保留原文件。启用了转换缓存时，优化后的PDF由优化进程写入缓存。
+需要pikepdf（pip install pikepdf pillow）。
+"""
+import io
+import os
+import time
+import threading
+import multiprocessing
+import importlib.util
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+HAS_PIKEPDF = importlib.util.find_spec("pikepdf") is not None
+HAS_PIL = importlib.util.find_spec("PIL") is not None
+
+# 图片分辨率上限（DPI）和重新压缩的JPEG质量
+DEFAULT_MAX_DPI = 150
+DEFAULT_JPEG_QUALITY = 80
+
+# 分辨率超过上限的比例小于这个值时不缩小（收益太小，还会损失画质）
+MIN_DOWNSAMPLE_RATIO = 1.2
+
+# 写入过程中使用的临时文件后缀
+PARTIAL_SUFFIX = ".w2p-optimize"
+
+
+def default_optimize_workers():
+    """优化进程数：CPU核数的一半，剩下的留给Office工作进程"""
+    return max(1, (os.cpu_count() or 2) // 2)
+
+
+def _downsample_image(image, page_size, max_dpi, quality):
+    """按分辨率上限缩小一个图片对象，返回是否修改"""
+    from PIL import Image
+    from pikepdf import Array, Name, PdfImage
+
+    if image.get("/ImageMask") or "/Decode" in image or isinstance(image.get("/Mask"), Array):
+        return False  # 蒙版、解码数组和颜色键蒙版在有损压缩后会出错
+    if int(image.get("/BitsPerComponent", 8)) < 8:
+        return False  # 黑白扫描件（CCITT/JBIG2）已经很小
+    width, height = int(image.Width), int(image.Height)
+    page_width, page_height = page_size
+    if page_width <= 0 or page_height <= 0:
+        return False
+    # 图片最多铺满整页，按页面尺寸估算的是实际分辨率的下限，缩小后不会低于上限
+    dpi = max(width / page_width, height / page_height)
+    if dpi < max_dpi * MIN_DOWNSAMPLE_RATIO:
+        return False
+
+    color_space = image.get("/ColorSpace")
+    indexed = isinstance(color_space, Array) and len(color_space) > 0 and color_space[0] == Name.Indexed
+    pil = PdfImage(image).as_pil_image()
+    converted = pil.mode not in ("L", "RGB")
+    if converted:
+        if pil.mode in ("P", "LA", "RGBA"):
+            pil = pil.convert("RGB")  # 透明度在单独的SMask中
+        else:
+            return False  # CMYK等颜色空间重新编码后颜色可能不对
+    scale = max_dpi / dpi
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    buffer = io.BytesIO()
+    pil.resize(size, Image.LANCZOS).save(buffer, "JPEG", quality=quality, optimize=True)
+    data = buffer.getvalue()
+    if len(data) >= len(image.read_raw_bytes()):
+        return False
+
+    image.write(data, filter=Name.DCTDecode)
+    image.Width, image.Height = size
+    image.BitsPerComponent = 8
+    if indexed or converted:
+        image.ColorSpace = Name.DeviceGray if pil.mode == "L" else Name.DeviceRGB
+    if "/DecodeParms" in image:
+        del image["/DecodeParms"]
+    return True
+
+
+def optimize_pdf(path, max_dpi=DEFAULT_MAX_DPI, quality=DEFAULT_JPEG_QUALITY, output_hash=False,
+                 cache=None, cache_key=None):
+    """优化一个PDF（在优化进程中运行），返回统计字典
+
+    before/after为优化前后的字节数，images为缩小的图片数；
+    output_hash=True时同时返回最终文件的output_hash（增量转换清单使用）。
+    cache为ConversionCache的参数，cache_key不为None时把最终文件写入转换缓存。
+    """
+    import pikepdf
+
+    start = time.perf_counter()
+    before = os.path.getsize(path)
+    images = 0
+    partial = path + PARTIAL_SUFFIX
+    try:
+        with pikepdf.open(path) as pdf:
+            if HAS_PIL and max_dpi:
+                seen = set()
+                for page in pdf.pages:
+                    box = [float(v) for v in page.mediabox]
+                    page_size = (abs(box[2] - box[0]) / 72, abs(box[3] - box[1]) / 72)
+                    # 新版本pikepdf的get_images()也会找到表单对象中的图片
+                    images_of = page.get_images() if hasattr(page, "get_images") else page.images
+                    for image in images_of.values():
+                        if image.objgen in seen:
+                            continue  # 多页共用的图片（例如页眉中的标志）只处理一次
+                        seen.add(image.objgen)
+                        try:
+                            if _downsample_image(image, page_size, max_dpi, quality):
+                                images += 1
+                        except Exception:
+                            pass  # 无法解码的图片保持原样
+            pdf.save(partial, compress_streams=True,
+                     object_stream_mode=pikepdf.ObjectStreamMode.generate)
+        after = os.path.getsize(partial)
+        if after < before:
+            os.replace(partial, path)
+        else:
+            os.remove(partial)
+            after = before
+    except BaseException:
+        try:
+            os.remove(partial)
+        except OSError:
+            pass
+        raise
+    stats = {"before": before, "after": after, "images": images,
+             "time": round(time.perf_counter() - start, 4)}
+    if output_hash:
+        from conversion_manifest import hash_file
+        stats["output_hash"] = hash_file(path)
+    if cache is not None and cache_key is not None:
+        from conversion_cache import ConversionCache
+        try:
+            conversion_cache = ConversionCache(**cache)
+            try:
+                conversion_cache.store(cache_key, path)
+            finally:
+                conversion_cache.close()
+        except Exception:
+            pass  # 缓存写入失败不影响转换结果
+    return stats
+
+
+class PdfOptimizer:
+    """在进程池中优化转换完成的PDF（由ConversionEngine在父进程中使用）
+
+    optimize(result, path, on_done)提交优化，完成后在result中记录optimize
+    （before/after/images/time/wait，失败时为error，不影响转换结果），
+    更新size和output_hash，并在进程池的回调线程中调用on_done(result, path)。
+    cache为ConversionCache的参数，optimize()指定cache_key时优化后的PDF写入缓存。
+    """
+
+    def __init__(self, workers=None, max_dpi=DEFAULT_MAX_DPI, quality=DEFAULT_JPEG_QUALITY, cache=None):
+        if not HAS_PIKEPDF:
+            raise RuntimeError("优化PDF需要安装pikepdf（pip install pikepdf pillow）")
+        self.workers = workers or default_optimize_workers()
+        self.max_dpi = max_dpi
+        self.quality = quality
+        self.cache = cache
+        self._lock = threading.Lock()
+        self._executor = self._create_executor()
+        self.stats = {"optimized": 0, "before": 0, "after": 0, "images": 0, "errors": 0,
+                      "optimize_time": 0.0}
+
+    def _create_executor(self):
+        return ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def optimize(self, result, path, on_done, cache_key=None):
+        queued = time.perf_counter()
+        args = (path, self.max_dpi, self.quality, "output_hash" in result, self.cache, cache_key)
+        with self._lock:
+            try:
+                future = self._executor.submit(optimize_pdf, *args)
+            except BrokenProcessPool:
+                # 优化进程异常退出（例如损坏的PDF导致崩溃），换一个新的进程池
+                self._executor.shutdown(wait=False)
+                self._executor = self._create_executor()
+                future = self._executor.submit(optimize_pdf, *args)
+        future.add_done_callback(lambda f: self._done(f, result, path, queued, on_done))
+
+    def _done(self, future, result, path, queued, on_done):
+        try:
+            stats = future.result()
+        except BaseException as e:  # 包括取消
+            result["optimize"] = {"error": str(e) or type(e).__name__}
+            with self._lock:
+                self.stats["errors"] += 1
+        else:
+            if "output_hash" in stats:
+                result["output_hash"] = stats.pop("output_hash")
+            stats["wait"] = round(time.perf_counter() - queued - stats["time"], 4)
+            result["optimize"] = stats
+            result["size"] = stats["after"]
+            with self._lock:
+                self.stats["optimized"] += 1
+                self.stats["before"] += stats["before"]
+                self.stats["after"] += stats["after"]
+                self.stats["images"] += stats["images"]
+                self.stats["optimize_time"] += stats["time"]
+        on_done(result, path)
+
+    def close(self):
+        """等待正在优化的文件，停止优化进程"""
+        self._executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,210 @@
+"""
+转换运行报告
+汇总每个文件的分阶段耗时（COM初始化、启动Office、打开文档、导出、关闭文档、退出Office、
+写出结果），计算各阶段的p50/p95/最大值、吞吐量（文件/分钟、页/分钟）和最慢的文件，
+保存为JSON和CSV，用来区分Office启动开销和转换慢的文档。
+按导出配置分别统计转换耗时和PDF大小，用来比较各配置的速度和存储成本；
+启用PDF优化时统计优化前后的大小和优化耗时。
+"""
+import os
+import re
+import csv
+import mmap
+import json
+import time
+
+# 阶段名称 -> 显示名称（按转换流程排序）
+STAGES = {
+    "com_init": "COM初始化",
+    "dispatch": "启动Office",
+    "open": "打开文档",
+    "export": "导出PDF",
+    "close": "关闭文档",
+    "quit": "退出Office",
+    "native": "快速转换",
+    "cache": "读取缓存",
+    "write": "写出结果",
+}
+
+# 报告中列出的最慢文件数
+SLOWEST_FILES = 10
+
+_PAGE_RE = re.compile(rb"/Type\s*/Page(?![a-zA-Z])")
+_COUNT_RE = re.compile(rb"/Type\s*/Pages\b[^>]*?/Count\s+(\d+)|/Count\s+(\d+)[^>]*?/Type\s*/Pages\b")
+
+
+def count_pdf_pages(path):
+    """粗略统计PDF页数（内存映射后用正则查找，不解析整个文件），无法确定时返回None"""
+    try:
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return None
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                pages = sum(1 for _ in _PAGE_RE.finditer(data))
+                if pages:
+                    return pages
+                # 页面对象在压缩的对象流中时，退而使用页面树根节点的/Count
+                counts = [int(m.group(1) or m.group(2)) for m in _COUNT_RE.finditer(data)]
+                return max(counts) if counts else None
+    except (OSError, ValueError):
+        return None
+
+
+def percentile(values, fraction):
+    """线性插值的百分位数，values需要已排序"""
+    if not values:
+        return 0.0
+    position = (len(values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+class RunReport:
+    """收集一次批量转换的结果并生成报告"""
+
+    def __init__(self, backend, workers):
+        self.backend = backend
+        self.workers = workers
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.elapsed = None
+        self.stage_samples = {}  # 阶段 -> 耗时列表
+        self.files = []  # (耗时, 源文件, 状态, 页数, 引擎)
+        self.status_counts = {}
+        self.pages = 0
+        self.bytes = 0
+        self.profile_samples = {}  # 导出配置 -> [(耗时, PDF字节数, 页数)]
+        self.optimize_samples = []  # (优化耗时, 优化前字节数, 优化后字节数)
+        self.pool_stats = {}
+
+    def add(self, result):
+        status = result.get("status", "failed")
+        self.status_counts[status] = self.status_counts.get(status, 0) + 1
+        for stage, seconds in (result.get("stages") or {}).items():
+            self.stage_samples.setdefault(stage, []).append(seconds)
+        pages = result.get("pages")
+        if status == "ok" and pages:
+            self.pages += pages
+        if status == "ok":
+            self.bytes += result.get("size") or 0
+            if result.get("profile"):
+                # 只统计由Office导出的文件，缓存和快速转换不受导出配置影响
+                self.profile_samples.setdefault(result["profile"], []).append(
+                    (result.get("duration", 0.0), result.get("size") or 0, pages or 0))
+            optimized = result.get("optimize")
+            if optimized and "before" in optimized:
+                self.optimize_samples.append((optimized["time"], optimized["before"], optimized["after"]))
+        self.files.append((result.get("duration", 0.0), result.get("src", ""), status,
+                           pages, result.get("engine")))
+
+    def finish(self, pool_stats=None):
+        self.elapsed = time.perf_counter() - self._start
+        self.pool_stats = dict(pool_stats or {})
+
+    def stage_summary(self):
+        """每个阶段的次数、p50、p95、最大值和合计（秒）"""
+        summary = {}
+        order = list(STAGES)
+        for stage in sorted(self.stage_samples, key=lambda s: order.index(s) if s in order else len(order)):
+            values = sorted(self.stage_samples[stage])
+            summary[stage] = {
+                "count": len(values),
+                "p50": round(percentile(values, 0.5), 4),
+                "p95": round(percentile(values, 0.95), 4),
+                "max": round(values[-1], 4),
+                "total": round(sum(values), 4),
+            }
+        return summary
+
+    def profile_summary(self):
+        """每个导出配置的文件数、转换耗时（p50/平均）和PDF大小（合计、每个文件、每页）"""
+        summary = {}
+        for profile, samples in sorted(self.profile_samples.items()):
+            durations = sorted(duration for duration, _, _ in samples)
+            size = sum(size for _, size, _ in samples)
+            pages = sum(pages for _, _, pages in samples)
+            summary[profile] = {
+                "files": len(samples),
+                "p50": round(percentile(durations, 0.5), 4),
+                "mean": round(sum(durations) / len(durations), 4),
+                "bytes": size,
+                "bytes_per_file": size // len(samples),
+                "bytes_per_page": size // pages if pages else None,
+            }
+        return summary
+
+    def optimize_summary(self):
+        """PDF优化的文件数、优化前后的总字节数和优化耗时（未启用时为空字典）"""
+        if not self.optimize_samples:
+            return {}
+        times = sorted(seconds for seconds, _, _ in self.optimize_samples)
+        before = sum(size for _, size, _ in self.optimize_samples)
+        after = sum(size for _, _, size in self.optimize_samples)
+        return {
+            "files": len(times),
+            "before": before,
+            "after": after,
+            "ratio": round(after / before, 4) if before else 1.0,
+            "p50": round(percentile(times, 0.5), 4),
+            "max": round(times[-1], 4),
+            "total": round(sum(times), 4),
+        }
+
+    def to_dict(self):
+        elapsed = self.elapsed if self.elapsed is not None else time.perf_counter() - self._start
+        minutes = elapsed / 60 if elapsed > 0 else 0
+        processed = len(self.files)
+        slowest = sorted(self.files, key=lambda f: f[0], reverse=True)[:SLOWEST_FILES]
+        return {
+            "backend": self.backend,
+            "workers": self.workers,
+            "started_at": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.started_at)),
+            "elapsed": round(elapsed, 3),
+            "files": processed,
+            "status": self.status_counts,
+            "pages": self.pages,
+            "bytes": self.bytes,
+            "files_per_min": round(processed / minutes, 2) if minutes else 0.0,
+            "pages_per_min": round(self.pages / minutes, 2) if minutes else 0.0,
+            "stages": self.stage_summary(),
+            "profiles": self.profile_summary(),
+            "optimize": self.optimize_summary(),
+            "slowest": [{"src": src, "duration": round(duration, 4), "status": status,
+                         "pages": pages, "engine": engine}
+                        for duration, src, status, pages, engine in slowest],
+            "pool": self.pool_stats,
+        }
+
+    def save(self, base_path):
+        """保存为 base_path.json 和 base_path.csv（各阶段统计），返回两个路径"""
+        os.makedirs(os.path.dirname(base_path) or ".", exist_ok=True)
+        data = self.to_dict()
+        json_path = base_path + ".json"
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+
+        csv_path = base_path + ".csv"
+        with open(csv_path, "w", encoding="utf-8-sig", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["stage", "name", "count", "p50", "p95", "max", "total"])
+            for stage, row in data["stages"].items():
+                writer.writerow([stage, STAGES.get(stage, stage), row["count"], row["p50"],
+                                 row["p95"], row["max"], row["total"]])
+        return json_path, csv_path
+
+    def summary_lines(self):
+        """给日志窗口显示的几行摘要"""
+        data = self.to_dict()
+        lines = [f"吞吐量: {data['files_per_min']} 文件/分钟，{data['pages_per_min']} 页/分钟"]
+        for stage, row in data["stages"].items():
+            lines.append(f"  {STAGES.get(stage, stage)}: {row['count']} 次，p50 {row['p50']:.2f} 秒，"
+                         f"p95 {row['p95']:.2f} 秒，最大 {row['max']:.2f} 秒")
+        for profile, row in data["profiles"].items():
+            lines.append(f"  导出配置 {profile}: {row['files']} 个，平均 {row['mean']:.2f} 秒，"
+                         f"平均 {row['bytes_per_file'] / 1024:.0f} KB/文件")
+        optimize = data["optimize"]
+        if optimize:
+            lines.append(f"  PDF优化: {optimize['files']} 个，大小为原来的 {optimize['ratio']:.0%}，"
+                         f"p50 {optimize['p50']:.2f} 秒，最大 {optimize['max']:.2f} 秒")
+        return lines
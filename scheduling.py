@@ -0,0 +1,211 @@
+"""
+任务调度
+决定等待中的转换任务以什么顺序分发给工作进程（由ConversionEngine在持有锁时调用）。
+
+- LongestJobFirst: 一次批量转换使用（默认），预测耗时长的文件先开始
+- FairShareScheduler: 多个团队共用转换服务时使用。单个文档走交互通道优先分发；
+  批量任务先在团队（tenant）之间按权重公平分配，再在同一团队的多个批次之间公平分配，
+  一个团队提交5万个文件不会让其他团队的小批次一直排队。可以限制每个团队同时转换的文件数。
+"""
+import heapq
+import itertools
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+DEFAULT_TENANT = "default"
+
+# 没有预测耗时的任务按这个耗时计算公平份额（相当于按文件数轮流）
+DEFAULT_COST = 1.0
+
+
+def _cost(task):
+    return task.get("predicted") or DEFAULT_COST
+
+
+class LongestJobFirst:
+    """按预测耗时从长到短分发，没有预测耗时时按提交顺序"""
+
+    def __init__(self):
+        self._heap = []  # (-预测耗时, 任务id, 任务)
+
+    def __len__(self):
+        return len(self._heap)
+
+    def push(self, task):
+        heapq.heappush(self._heap, (-(task.get("predicted") or 0.0), task["id"], task))
+
+    def pop(self):
+        """取出下一个要分发的任务，没有时返回None"""
+        if not self._heap:
+            return None
+        return heapq.heappop(self._heap)[2]
+
+    def task_done(self, task):
+        pass
+
+    def remove(self, job):
+        """删除某个批次中还没有分发的任务，返回被删除的任务"""
+        removed = [task for _, _, task in self._heap if task.get("job") == job]
+        if removed:
+            self._heap = [item for item in self._heap if item[2].get("job") != job]
+            heapq.heapify(self._heap)
+        return removed
+
+    def clear(self):
+        tasks = [task for _, _, task in self._heap]
+        self._heap = []
+        return tasks
+
+    def stats(self):
+        return {"queued": len(self._heap)}
+
+
+class _Flow:
+    """公平排队中的一个流：维护开始标记，finish_tag越小越先被服务"""
+
+    def __init__(self, name, weight, order):
+        self.name = name
+        self.weight = weight
+        self.order = order  # 标记相同时先来的先服务
+        self.finish_tag = 0.0
+
+
+class _Job(_Flow):
+    def __init__(self, name, order):
+        super().__init__(name, 1.0, order)
+        self.queue = []  # 批次内按预测耗时从长到短: (-耗时, 任务id, 任务)
+
+
+class _Tenant(_Flow):
+    def __init__(self, name, weight, cap, order):
+        super().__init__(name, weight, order)
+        self.cap = cap  # 同时转换的文件数上限（None表示不限制）
+        self.jobs = {}  # 批次 -> _Job（只包含还有等待任务的批次）
+        self.vtime = 0.0  # 团队内各批次之间的虚拟时间
+        self.queued = 0
+        self.running = 0
+
+    def can_run(self):
+        return self.queued and (self.cap is None or self.running < self.cap)
+
+
+def _pick(flows, vtime):
+    """选择开始标记最小的流（start-time fair queuing），返回 (流, 开始标记)"""
+    flow = min(flows, key=lambda f: (max(f.finish_tag, vtime), f.order))
+    return flow, max(flow.finish_tag, vtime)
+
+
+class FairShareScheduler:
+    """两级加权公平排队：团队之间按权重，团队内各批次之间平均分配
+
+    任务字段:
+        lane    "interactive"（单个文档，优先于所有批量任务）或 "batch"
+        tenant  团队名称，默认 "default"
+        job     批次id，同一批次的文件在团队的份额内按预测耗时从长到短分发
+    weights为 {团队: 权重}，caps为 {团队: 同时转换数上限}，default_cap用于其他团队。
+    交互通道的任务不受并发上限限制，也不占用团队的份额。
+    """
+
+    def __init__(self, weights=None, caps=None, default_cap=None):
+        self.weights = dict(weights or {})
+        self.caps = dict(caps or {})
+        self.default_cap = default_cap
+        self._interactive = []  # (任务id, 任务)，先提交的先分发
+        self._tenants = {}
+        self._vtime = 0.0
+        self._count = 0
+        self._order = itertools.count()
+
+    def __len__(self):
+        return self._count
+
+    def _tenant(self, name):
+        tenant = self._tenants.get(name)
+        if tenant is None:
+            weight = max(float(self.weights.get(name, 1.0)), 1e-6)
+            cap = self.caps.get(name, self.default_cap)
+            tenant = self._tenants[name] = _Tenant(name, weight, cap, next(self._order))
+        return tenant
+
+    def push(self, task):
+        self._count += 1
+        if task.get("lane") == INTERACTIVE:
+            heapq.heappush(self._interactive, (task["id"], task))
+            return
+        tenant = self._tenant(task.get("tenant") or DEFAULT_TENANT)
+        job = tenant.jobs.get(task.get("job"))
+        if job is None:
+            job = tenant.jobs[task.get("job")] = _Job(task.get("job"), next(self._order))
+        heapq.heappush(job.queue, (-_cost(task), task["id"], task))
+        tenant.queued += 1
+
+    def pop(self):
+        """取出下一个要分发的任务；剩下的任务所属团队都达到并发上限时返回None"""
+        if self._interactive:
+            self._count -= 1
+            return heapq.heappop(self._interactive)[1]
+
+        eligible = [tenant for tenant in self._tenants.values() if tenant.can_run()]
+        if not eligible:
+            return None
+        tenant, start = _pick(eligible, self._vtime)
+        self._vtime = start
+        job, job_start = _pick(tenant.jobs.values(), tenant.vtime)
+        tenant.vtime = job_start
+
+        _, _, task = heapq.heappop(job.queue)
+        cost = _cost(task)
+        tenant.finish_tag = start + cost / tenant.weight
+        job.finish_tag = job_start + cost
+        if not job.queue:
+            del tenant.jobs[job.name]  # 批次再有新任务时从当前虚拟时间开始，不能用过去的额度插队
+        tenant.queued -= 1
+        tenant.running += 1
+        self._count -= 1
+        return task
+
+    def task_done(self, task):
+        """已分发的任务结束（完成、失败、超时或被丢弃），释放团队的并发名额"""
+        if task.get("lane") == INTERACTIVE:
+            return
+        tenant = self._tenants.get(task.get("tenant") or DEFAULT_TENANT)
+        if tenant is not None and tenant.running:
+            tenant.running -= 1
+
+    def remove(self, job):
+        """删除某个批次中还没有分发的任务，返回被删除的任务"""
+        removed = []
+        for tenant in self._tenants.values():
+            flow = tenant.jobs.pop(job, None)
+            if flow is not None:
+                tenant.queued -= len(flow.queue)
+                removed.extend(task for _, _, task in flow.queue)
+        kept = [item for item in self._interactive if item[1].get("job") != job]
+        if len(kept) != len(self._interactive):
+            removed.extend(task for _, task in self._interactive if task.get("job") == job)
+            self._interactive = kept
+            heapq.heapify(self._interactive)
+        self._count -= len(removed)
+        return removed
+
+    def clear(self):
+        tasks = [task for _, task in self._interactive]
+        for tenant in self._tenants.values():
+            for job in tenant.jobs.values():
+                tasks.extend(task for _, _, task in job.queue)
+            tenant.jobs = {}
+            tenant.queued = 0
+        self._interactive = []
+        self._count = 0
+        return tasks
+
+    def stats(self):
+        """各团队的等待数、正在转换数、权重和并发上限"""
+        return {
+            "interactive": len(self._interactive),
+            "tenants": {
+                name: {"queued": tenant.queued, "running": tenant.running, "jobs": len(tenant.jobs),
+                       "weight": tenant.weight, "cap": tenant.cap}
+                for name, tenant in self._tenants.items()
+            },
+        }
@@ -0,0 +1,255 @@
+"""
+模拟Office应用程序
+提供与Word/WPS COM对象模型相同接口的假实现（Documents.Open、SaveAs、
+ExportAsFixedFormat、Close、Quit），用于在没有Office的环境（如Linux）中
+对实例池、并行调度、图形界面等功能进行压力和延迟测试
+
+模拟参数通过SimProfile配置，也可以用环境变量W2P_SIM_PROFILE传入JSON，例如:
+    {"startup": "lognormal:2.0,0.3", "open": "uniform:0.05,0.2",
+     "save": "fixed:0.1", "failure_rate": 0.02, "hang_rate": 0.01, "crash_rate": 0.001}
+"""
+import os
+import json
+import time
+import random
+
+def make_placeholder_pdf(title, pages=1):
+    """生成一个带交叉引用表的合法PDF，每页写一行标题，作为模拟转换的输出"""
+    title = title.encode("ascii", "replace").decode("ascii")
+    title = title.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+    pages = max(1, int(pages))
+
+    objects = [
+        b"<</Type/Catalog/Pages 2 0 R>>",
+        None,  # 页面树，页面对象编号确定后再生成
+        b"<</Type/Font/Subtype/Type1/BaseFont/Helvetica>>",
+    ]
+    kids = []
+    for number in range(1, pages + 1):
+        text = f"BT /F1 14 Tf 72 770 Td ({title} - {number}/{pages}) Tj ET".encode("ascii")
+        objects.append(b"<</Length %d>>stream\n%s\nendstream" % (len(text), text))
+        content_id = len(objects)
+        objects.append(b"<</Type/Page/Parent 2 0 R/MediaBox[0 0 595 842]"
+                       b"/Resources<</Font<</F1 3 0 R>>>>/Contents %d 0 R>>" % content_id)
+        kids.append(b"%d 0 R" % len(objects))
+    objects[1] = b"<</Type/Pages/Kids[%s]/Count %d>>" % (b" ".join(kids), pages)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref_offset = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<</Size %d/Root 1 0 R>>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1, xref_offset)
+    return bytes(out)
+
+
+# SimProfile默认值
+DEFAULT_PROFILE = {
+    "startup": "fixed:0.5",     # Office启动耗时
+    "open": "fixed:0.05",       # Documents.Open耗时
+    "save": "fixed:0.1",        # SaveAs/ExportAsFixedFormat耗时
+    "quit": "fixed:0.05",       # Quit耗时
+    "failure_rate": 0.0,        # 打开文档失败的概率
+    "save_failure_rate": 0.0,   # 导出失败的概率
+    "hang_rate": 0.0,           # 导出时卡死的概率（模拟弹出对话框）
+    "hang_seconds": 3600,       # 卡死持续时间
+    "crash_rate": 0.0,          # 导出时进程崩溃的概率（模拟实例在工作进程中，整个工作进程退出）
+    "memory_per_document": 0,   # 每个文档泄漏的内存（字节），模拟Office内存增长
+    "seed": None,               # 随机数种子（与工作进程序号和重启次数组合，可以重现）
+}
+
+
+def parse_distribution(spec):
+    """解析耗时分布描述，返回一个无参函数，每次调用得到一个耗时（秒）
+
+    支持: fixed:秒, uniform:最小,最大, normal:均值,标准差,
+         lognormal:中位数,sigma, exp:均值；也可以直接传数字
+    """
+    if isinstance(spec, (int, float)):
+        value = float(spec)
+        return lambda rng: value
+
+    kind, _, args = str(spec).partition(":")
+    params = [float(x) for x in args.split(",") if x.strip()]
+    kind = kind.strip().lower()
+
+    if kind == "fixed":
+        return lambda rng: params[0]
+    if kind == "uniform":
+        return lambda rng: rng.uniform(params[0], params[1])
+    if kind == "normal":
+        return lambda rng: max(0.0, rng.gauss(params[0], params[1]))
+    if kind == "lognormal":
+        import math
+        mu = math.log(params[0]) if params[0] > 0 else 0.0
+        return lambda rng: rng.lognormvariate(mu, params[1])
+    if kind == "exp":
+        return lambda rng: rng.expovariate(1.0 / params[0]) if params[0] > 0 else 0.0
+    raise ValueError(f"未知的耗时分布: {spec}")
+
+
+class SimProfile:
+    """模拟Office的行为配置
+
+    worker为工作进程的序号，generation为该序号的工作进程被替换过几次。
+    """
+
+    def __init__(self, *, worker=0, generation=0, **overrides):
+        values = dict(DEFAULT_PROFILE)
+        unknown = set(overrides) - set(values)
+        if unknown:
+            raise ValueError(f"未知的模拟参数: {', '.join(sorted(unknown))}")
+        values.update(overrides)
+        self.values = values
+
+        # 每个工作进程（包括重启后的）都会创建自己的SimProfile，seed与序号和重启次数组合，
+        # 否则所有进程得到相同的随机序列，例如hang_rate=0.5时每个进程的第一个文件都卡死。
+        # 不使用进程号，同样的seed每次运行得到同样的结果
+        seed = values["seed"]
+        self.rng = random.Random(None if seed is None else f"{seed}/{worker}/{generation}")
+        self._startup = parse_distribution(values["startup"])
+        self._open = parse_distribution(values["open"])
+        self._save = parse_distribution(values["save"])
+        self._quit = parse_distribution(values["quit"])
+
+    @classmethod
+    def from_env(cls, *, worker=0, generation=0, **overrides):
+        """从环境变量W2P_SIM_PROFILE读取配置（JSON），overrides优先"""
+        values = {}
+        raw = os.environ.get("W2P_SIM_PROFILE")
+        if raw:
+            values.update(json.loads(raw))
+        values.update(overrides)
+        return cls(worker=worker, generation=generation, **values)
+
+    def __getitem__(self, key):
+        return self.values[key]
+
+    def startup_delay(self):
+        return self._startup(self.rng)
+
+    def open_delay(self):
+        return self._open(self.rng)
+
+    def save_delay(self):
+        return self._save(self.rng)
+
+    def quit_delay(self):
+        return self._quit(self.rng)
+
+    def chance(self, key):
+        rate = self.values[key]
+        return rate > 0 and self.rng.random() < rate
+
+
+class FakeDocument:
+    """模拟的Document对象"""
+
+    def __init__(self, app, path):
+        self.app = app
+        self.FullName = path
+        self.closed = False
+
+    def _export(self, path):
+        if self.closed:
+            raise Exception("Command failed: 文档已关闭")
+        profile = self.app.profile
+        if profile.chance("hang_rate"):
+            # 模拟Word弹出模态对话框后卡死
+            time.sleep(profile["hang_seconds"])
+        time.sleep(profile.save_delay())
+        if profile.chance("crash_rate"):
+            os._exit(1)  # 导出进行到一半时崩溃
+        if profile.chance("save_failure_rate"):
+            raise Exception("此命令无效 (模拟导出失败)")
+        # 按源文件大小估算页数（约每20KB一页）
+        pages = 1 + os.path.getsize(self.FullName) // 20480
+        with open(path, "wb") as f:
+            f.write(make_placeholder_pdf(os.path.basename(self.FullName), pages))
+
+    def SaveAs(self, path, FileFormat=17, *args, **kwargs):
+        if FileFormat != 17:
+            raise Exception(f"Command failed: 模拟实现只支持PDF格式(17)，收到 {FileFormat}")
+        self._export(path)
+
+    def ExportAsFixedFormat(self, OutputFileName, ExportFormat=17, *args, **kwargs):
+        if ExportFormat != 17:
+            raise Exception(f"Command failed: 模拟实现只支持PDF格式(17)，收到 {ExportFormat}")
+        self._export(OutputFileName)
+
+    def Close(self, SaveChanges=False):
+        if not self.closed:
+            self.closed = True
+            self.app.Documents.open_count -= 1
+
+
+class FakeDocuments:
+    """模拟的Documents集合"""
+
+    def __init__(self, app):
+        self.app = app
+        self.open_count = 0
+
+    def Open(self, path, *args, **kwargs):
+        if self.app.quit:
+            raise Exception("RPC服务器不可用: 实例已退出")
+        profile = self.app.profile
+        time.sleep(profile.open_delay())
+        if not os.path.exists(path):
+            raise Exception(f"Command failed: 找不到文件 {path}")
+        if profile.chance("failure_rate"):
+            raise Exception("Command failed: 模拟打开文档失败")
+        self.open_count += 1
+        self.app.leak()
+        return FakeDocument(self.app, path)
+
+
+class FakeOfficeApplication:
+    """模拟的Word.Application / KWPS.Application对象"""
+
+    def __init__(self, prog_id, profile=None):
+        self.prog_id = prog_id
+        self.profile = profile or SimProfile()
+        self.Visible = True
+        self.DisplayAlerts = -1
+        self.Documents = FakeDocuments(self)
+        self.quit = False
+        self.pid = os.getpid()  # 模拟实例运行在当前进程中
+        self._leaked = []
+
+    def leak(self):
+        """模拟Office长时间运行后的内存增长"""
+        size = int(self.profile["memory_per_document"])
+        if size > 0:
+            self._leaked.append(bytearray(size))
+
+    @property
+    def memory_usage(self):
+        return sum(len(block) for block in self._leaked)
+
+    def Quit(self):
+        if not self.quit:
+            time.sleep(self.profile.quit_delay())
+            self.quit = True
+            self._leaked = []
+
+
+class FakeOfficeDispatcher:
+    """代替win32com.client.DispatchEx的可调用对象，模拟Office启动耗时"""
+
+    def __init__(self, startup_latency=None, profile=None):
+        if profile is None:
+            overrides = {} if startup_latency is None else {"startup": startup_latency}
+            profile = SimProfile(**overrides)
+        self.profile = profile
+        self.started = 0
+
+    def __call__(self, prog_id):
+        time.sleep(self.profile.startup_delay())
+        self.started += 1
+        return FakeOfficeApplication(prog_id, self.profile)
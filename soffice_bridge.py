@@ -0,0 +1,203 @@
+"""
+LibreOffice常驻转换服务
+启动一个 soffice --headless --accept 监听进程并通过UNO保持连接，
+然后在本地TCP端口上按行接收JSON转换请求，避免每个文件都重新启动soffice。
+
+需要使用带uno模块的Python运行（Windows上是LibreOffice自带的program\\python.exe，
+Linux上一般是安装了python3-uno的系统Python）。
+
+协议（每行一个JSON）:
+    请求: {"token": "...", "src": "C:\\\\a.docx", "dst": "C:\\\\a.pdf", "filter": {"Quality": 75, ...}}
+          filter可选，为writer_pdf_Export的FilterData（图片分辨率、PDF/A、结构标记等）
+    响应: {"ok": true, "duration": 0.8} 或 {"ok": false, "error": "..."}
+    请求: {"token": "...", "cmd": "quit"} 退出服务并关闭soffice
+
+token为启动时环境变量W2P_BRIDGE_TOKEN的值，令牌不对的请求返回错误并断开连接，
+本机的其他程序不能借用监听进程读写文件。
+
+启动成功后向标准输出打印一行 "READY <端口>"。
+--simulate 模式不需要LibreOffice，使用sim_office生成占位PDF，用于测试。
+"""
+import os
+import sys
+import hmac
+import json
+import time
+import socket
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+
+UNAUTHORIZED = json.dumps({"ok": False, "error": "访问令牌不正确"}, ensure_ascii=False).encode("utf-8") + b"\n"
+
+
+def _free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class UnoConverter:
+    """通过UNO连接常驻的soffice进程进行转换"""
+
+    def __init__(self, soffice, connect_timeout=60):
+        import uno
+        self.uno = uno
+
+        self.profile_dir = tempfile.mkdtemp(prefix="w2p_lo_profile_")
+        self.port = _free_port()
+        # 每个监听进程使用独立的用户配置目录，才能同时运行多个soffice
+        self.process = subprocess.Popen([
+            soffice,
+            "--headless", "--invisible", "--nologo", "--nodefault",
+            "--norestore", "--nolockcheck",
+            "-env:UserInstallation=" + uno.systemPathToFileUrl(self.profile_dir),
+            f"--accept=socket,host=127.0.0.1,port={self.port};urp;StarOffice.ComponentContext",
+        ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+        local = uno.getComponentContext()
+        resolver = local.ServiceManager.createInstanceWithContext(
+            "com.sun.star.bridge.UnoUrlResolver", local)
+        url = f"uno:socket,host=127.0.0.1,port={self.port};urp;StarOffice.ComponentContext"
+
+        deadline = time.monotonic() + connect_timeout
+        while True:
+            try:
+                ctx = resolver.resolve(url)
+                break
+            except Exception:
+                if self.process.poll() is not None or time.monotonic() > deadline:
+                    self.close()
+                    raise RuntimeError("无法连接到soffice监听进程")
+                time.sleep(0.25)
+
+        self.desktop = ctx.ServiceManager.createInstanceWithContext(
+            "com.sun.star.frame.Desktop", ctx)
+
+    def _props(self, **values):
+        from com.sun.star.beans import PropertyValue
+        props = []
+        for name, value in values.items():
+            prop = PropertyValue()
+            prop.Name = name
+            prop.Value = value
+            props.append(prop)
+        return tuple(props)
+
+    def convert(self, src, dst, filter_data=None):
+        uno = self.uno
+        doc = self.desktop.loadComponentFromURL(
+            uno.systemPathToFileUrl(os.path.abspath(src)), "_blank", 0,
+            self._props(Hidden=True, ReadOnly=True))
+        if doc is None:
+            raise RuntimeError("Command failed: LibreOffice无法打开文档")
+        try:
+            props = {"FilterName": "writer_pdf_Export"}
+            if filter_data:
+                props["FilterData"] = uno.Any("[]com.sun.star.beans.PropertyValue",
+                                              self._props(**filter_data))
+            # 含uno.Any的属性需要通过uno.invoke传递，否则FilterData的类型会丢失
+            uno.invoke(doc, "storeToURL", (uno.systemPathToFileUrl(os.path.abspath(dst)),
+                                           self._props(**props)))
+        finally:
+            doc.close(True)
+
+    def close(self):
+        try:
+            self.desktop.terminate()
+        except Exception:
+            pass
+        try:
+            self.process.wait(timeout=10)
+        except Exception:
+            self.process.kill()
+        shutil.rmtree(self.profile_dir, ignore_errors=True)
+
+
+class SimulatedConverter:
+    """不依赖LibreOffice的替身，行为参数与sim_office相同"""
+
+    def __init__(self):
+        from sim_office import SimProfile, make_placeholder_pdf
+        self.profile = SimProfile.from_env()
+        self.make_pdf = make_placeholder_pdf
+        time.sleep(self.profile.startup_delay())
+
+    def convert(self, src, dst, filter_data=None):
+        time.sleep(self.profile.open_delay())
+        if not os.path.exists(src):
+            raise RuntimeError(f"Command failed: 找不到文件 {src}")
+        if self.profile.chance("failure_rate"):
+            raise RuntimeError("Command failed: 模拟打开文档失败")
+        time.sleep(self.profile.save_delay())
+        pages = 1 + os.path.getsize(src) // 20480
+        with open(dst, "wb") as f:
+            f.write(self.make_pdf(os.path.basename(src), pages))
+
+    def close(self):
+        time.sleep(self.profile.quit_delay())
+
+
+def serve(converter, port, token):
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    server.bind(("127.0.0.1", port))
+    server.listen(1)
+    print(f"READY {server.getsockname()[1]}", flush=True)
+
+    try:
+        while True:
+            conn, _ = server.accept()
+            with conn, conn.makefile("rwb") as stream:
+                for line in stream:
+                    try:
+                        request = json.loads(line)
+                        authorized = hmac.compare_digest(str(request.get("token", "")), token)
+                    except (ValueError, AttributeError):
+                        authorized = False
+                    if not authorized:
+                        stream.write(UNAUTHORIZED)
+                        stream.flush()
+                        break
+                    if request.get("cmd") == "quit":
+                        stream.write(b'{"ok": true}\n')
+                        stream.flush()
+                        return
+                    start = time.perf_counter()
+                    try:
+                        converter.convert(request["src"], request["dst"], request.get("filter"))
+                        response = {"ok": True}
+                    except Exception as e:
+                        response = {"ok": False, "error": str(e)}
+                    response["duration"] = round(time.perf_counter() - start, 4)
+                    stream.write(json.dumps(response, ensure_ascii=False).encode("utf-8") + b"\n")
+                    stream.flush()
+    finally:
+        server.close()
+        converter.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LibreOffice常驻转换服务")
+    parser.add_argument("--soffice", help="soffice可执行文件路径")
+    parser.add_argument("--port", type=int, default=0, help="监听端口（0表示自动选择）")
+    parser.add_argument("--simulate", action="store_true", help="不启动LibreOffice，生成模拟PDF")
+    args = parser.parse_args()
+
+    token = os.environ.get("W2P_BRIDGE_TOKEN")
+    if not token:
+        print("ERROR 缺少访问令牌（环境变量W2P_BRIDGE_TOKEN）", flush=True)
+        return 1
+    try:
+        converter = SimulatedConverter() if args.simulate else UnoConverter(args.soffice or "soffice")
+    except Exception as e:
+        print(f"ERROR {e}", flush=True)
+        return 1
+    serve(converter, args.port, token)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
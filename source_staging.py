@@ -0,0 +1,196 @@
+"""
+源文件预取
+网络共享上的文档由Office直接打开时要经过高延迟的网络读取，而且读取和转换不能重叠。
+SourceStager在后台线程中把即将转换的文档复制到本地临时目录，
+工作进程打开本地副本；任务结束后立即删除副本。
+
+复制并发数和本地磁盘占用都有上限：占用达到上限时后面的复制等待前面的副本被删除，
+单个超过上限的文件和复制失败的文件直接从原路径转换。
+"""
+import os
+import time
+import queue
+import shutil
+import tempfile
+import threading
+
+from folder_scanner import is_network_path
+
+# 同时复制的文件数
+DEFAULT_STAGING_WORKERS = 4
+
+# 本地副本占用的磁盘空间上限
+DEFAULT_STAGING_BUDGET = 2 * 1024 * 1024 * 1024
+
+# 最多使用临时目录所在磁盘剩余空间的比例
+MAX_FREE_SPACE_RATIO = 0.5
+
+# 异常退出的进程留下的临时目录超过这个时间（秒）后删除
+STALE_RUN_AGE = 24 * 3600
+
+
+def default_staging_dir():
+    """本地副本的存放目录，可以用环境变量W2P_STAGING_DIR修改"""
+    return os.environ.get("W2P_STAGING_DIR") or os.path.join(tempfile.gettempdir(), "w2p_staging")
+
+
+def default_staging_budget():
+    """磁盘占用上限（字节），可以用环境变量W2P_STAGING_BUDGET_MB修改"""
+    try:
+        return int(os.environ["W2P_STAGING_BUDGET_MB"]) * 1024 * 1024
+    except (KeyError, ValueError):
+        return DEFAULT_STAGING_BUDGET
+
+
+def remove_stale_runs(base, max_age=STALE_RUN_AGE):
+    """删除异常退出的进程留下的run_*临时目录"""
+    cutoff = time.time() - max_age
+    try:
+        entries = list(os.scandir(base))
+    except OSError:
+        return
+    for entry in entries:
+        try:
+            if entry.name.startswith("run_") and entry.stat().st_mtime < cutoff:
+                shutil.rmtree(entry.path, ignore_errors=True)
+        except OSError:
+            pass
+
+
+class SourceStager:
+    """把网络共享上的源文件复制到本地临时目录（由ConversionEngine在父进程中使用）
+
+    stage(task, on_ready)在后台复制，完成后设置task["staged"]为本地路径并调用on_ready(task)；
+    不需要或无法复制时不设置staged，同样调用on_ready。任务结束后调用release(task)删除副本。
+    network_only=False时本地文件也复制（用于测试）。
+    """
+
+    def __init__(self, root=None, workers=DEFAULT_STAGING_WORKERS, budget=None, network_only=True):
+        base = root or default_staging_dir()
+        os.makedirs(base, exist_ok=True)
+        remove_stale_runs(base)
+        # 每个引擎使用单独的子目录，关闭时整个删除
+        self.root = tempfile.mkdtemp(prefix="run_", dir=base)
+        budget = default_staging_budget() if budget is None else budget
+        try:
+            budget = min(budget, int(shutil.disk_usage(self.root).free * MAX_FREE_SPACE_RATIO))
+        except OSError:
+            pass
+        self.budget = max(0, budget)
+        self.network_only = network_only
+
+        self._cond = threading.Condition()
+        self._used = 0  # 本地副本占用的字节数（包括正在复制的文件）
+        self._closed = False
+        self._queue = queue.Queue()
+        self.stats = {"staged": 0, "bytes": 0, "skipped": 0, "errors": 0,
+                      "copy_time": 0.0, "budget_wait": 0.0, "peak_bytes": 0}
+        self._threads = [
+            threading.Thread(target=self._run, name=f"staging-{i}", daemon=True)
+            for i in range(max(1, workers))
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def wants(self, path):
+        """这个源文件是否需要复制到本地"""
+        return not self.network_only or is_network_path(path)
+
+    def stage(self, task, on_ready):
+        self._queue.put((task, on_ready))
+
+    def drop_pending(self):
+        """还没有开始复制的任务不再复制，直接调用on_ready（引擎停止时使用）"""
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if item is None:
+                self._queue.put(None)  # close()发出的退出信号，放回去
+                return
+            task, on_ready = item
+            on_ready(task)
+
+    def release(self, task):
+        """删除任务的本地副本并释放磁盘额度"""
+        staged = task.pop("staged", None)
+        if staged is None:
+            return
+        shutil.rmtree(os.path.dirname(staged), ignore_errors=True)
+        with self._cond:
+            self._used -= task.pop("staged_size", 0)
+            self._cond.notify_all()
+
+    def close(self):
+        """停止复制线程并删除所有本地副本"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout=5)
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def _reserve(self, size):
+        """等待磁盘额度，返回是否成功（文件超过上限或已关闭时返回False）"""
+        if size > self.budget:
+            return False
+        start = time.perf_counter()
+        with self._cond:
+            while not self._closed and self._used + size > self.budget:
+                self._cond.wait(0.5)
+            if self._closed:
+                return False
+            self._used += size
+            self.stats["peak_bytes"] = max(self.stats["peak_bytes"], self._used)
+            self.stats["budget_wait"] += time.perf_counter() - start
+        return True
+
+    def _unreserve(self, size):
+        with self._cond:
+            self._used -= size
+            self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            task, on_ready = item
+            try:
+                self._copy(task)
+            finally:
+                on_ready(task)
+
+    def _copy(self, task):
+        src = task["src"]
+        try:
+            size = os.path.getsize(src)
+        except OSError:
+            size = None
+        if size is None or not self._reserve(size):
+            self.stats["skipped"] += 1
+            return
+
+        # 保留原文件名：Office会在窗口标题、最近文档和锁定文件中使用
+        folder = os.path.join(self.root, str(task["id"]))
+        dst = os.path.join(folder, os.path.basename(src))
+        start = time.perf_counter()
+        try:
+            os.makedirs(folder, exist_ok=True)
+            shutil.copyfile(src, dst)
+        except OSError:
+            shutil.rmtree(folder, ignore_errors=True)
+            self._unreserve(size)
+            self.stats["errors"] += 1
+            return
+        elapsed = time.perf_counter() - start
+        task["staged"] = dst
+        task["staged_size"] = size
+        task["staging_time"] = round(elapsed, 4)
+        with self._cond:
+            self.stats["staged"] += 1
+            self.stats["bytes"] += size
+            self.stats["copy_time"] += elapsed
@@ -0,0 +1,142 @@
+import os
+
+import pytest
+
+import conversion_cache
+from conversion_cache import ConversionCache
+from conversion_engine import convert_task, create_office_pool, export_settings
+
+
+@pytest.fixture
+def pdf(tmp_path):
+    path = tmp_path / "converted.pdf"
+    path.write_bytes(b"%PDF-1.4 converted")
+    return path
+
+
+def _cache(tmp_path, **options):
+    return ConversionCache(str(tmp_path / "cache"), **options)
+
+
+def test_key_depends_on_hash_backend_and_settings():
+    key = ConversionCache.make_key("abc", "word", {"profile": "print", "fast_path": False})
+    assert key == ConversionCache.make_key("abc", "word", {"fast_path": False, "profile": "print"})
+    assert key != ConversionCache.make_key("abd", "word", {"profile": "print", "fast_path": False})
+    assert key != ConversionCache.make_key("abc", "wps", {"profile": "print", "fast_path": False})
+    assert key != ConversionCache.make_key("abc", "word", {"profile": "screen", "fast_path": False})
+    assert ConversionCache.make_key("abc", "word") == ConversionCache.make_key("abc", "word", {})
+
+
+def test_store_and_fetch(tmp_path, pdf):
+    cache = _cache(tmp_path, link_mode="copy")
+    dst = tmp_path / "out.pdf"
+    assert cache.fetch("k" * 64, str(dst)) is None
+    cache.store("k" * 64, str(pdf))
+    dst.write_bytes(b"old")
+    assert cache.fetch("k" * 64, str(dst)) == "copy"
+    assert dst.read_bytes() == pdf.read_bytes()
+    assert cache.stats() == {"hits": 1, "misses": 1}
+    cache.close()
+
+
+def test_auto_falls_back_to_copy_without_reflink(tmp_path, pdf, monkeypatch):
+    def unsupported(src, dst):
+        raise OSError("不支持reflink")
+
+    monkeypatch.setattr(conversion_cache, "_reflink", unsupported)
+    cache = _cache(tmp_path)
+    cache.store("k" * 64, str(pdf))
+    assert cache.fetch("k" * 64, str(tmp_path / "out.pdf")) == "copy"
+    cache.close()
+
+    strict = _cache(tmp_path, link_mode="reflink")
+    with pytest.raises(OSError):
+        strict.fetch("k" * 64, str(tmp_path / "strict.pdf"))
+    strict.close()
+
+
+def test_reflink_when_supported(tmp_path, pdf, monkeypatch):
+    cloned = []
+
+    def reflink(src, dst):
+        cloned.append(dst)
+        conversion_cache.shutil.copyfile(src, dst)
+
+    monkeypatch.setattr(conversion_cache, "_reflink", reflink)
+    cache = _cache(tmp_path)
+    cache.store("k" * 64, str(pdf))
+    assert cache.fetch("k" * 64, str(tmp_path / "out.pdf")) == "reflink"
+    assert cloned == [str(tmp_path / "out.pdf")]
+    cache.close()
+
+
+def test_hardlink_and_fallback_to_copy(tmp_path, pdf, monkeypatch):
+    cache = _cache(tmp_path, link_mode="hardlink")
+    cache.store("k" * 64, str(pdf))
+    linked = tmp_path / "linked.pdf"
+    assert cache.fetch("k" * 64, str(linked)) == "hardlink"
+    assert os.stat(linked).st_nlink == 2
+    assert os.stat(linked).st_mode & 0o777 == 0o644
+
+    def cross_device(src, dst):
+        raise OSError("跨磁盘")
+
+    monkeypatch.setattr(conversion_cache.os, "link", cross_device)
+    copied = tmp_path / "copied.pdf"
+    assert cache.fetch("k" * 64, str(copied)) == "copy"
+    assert os.stat(copied).st_nlink == 1
+    cache.close()
+
+
+def test_lru_eviction_under_max_bytes(tmp_path, monkeypatch):
+    clock = iter(range(100))
+    monkeypatch.setattr(conversion_cache.time, "time", lambda: next(clock))
+    cache = _cache(tmp_path, max_bytes=25, link_mode="copy")
+    for name in "abc":
+        path = tmp_path / f"{name}.pdf"
+        path.write_bytes(b"x" * 10)
+        cache.store(name * 64, str(path))
+        if name == "b":
+            cache.fetch("a" * 64, str(tmp_path / "used.pdf"))  # a比b更近被使用
+
+    assert cache.total_size() == 20
+    assert cache.fetch("b" * 64, str(tmp_path / "b_out.pdf")) is None
+    assert cache.fetch("a" * 64, str(tmp_path / "a_out.pdf")) == "copy"
+    assert cache.fetch("c" * 64, str(tmp_path / "c_out.pdf")) == "copy"
+    assert not os.path.exists(cache._object_path("b" * 64))
+
+    too_big = tmp_path / "big.pdf"
+    too_big.write_bytes(b"x" * 30)
+    cache.store("d" * 64, str(too_big))  # 单个文件超过上限时不缓存
+    assert cache.total_size() == 20
+    cache.close()
+
+
+def test_convert_task_does_not_write_through_hardlinked_output(tmp_path):
+    src = tmp_path / "a.docx"
+    src.write_bytes(b"document")
+    dst = tmp_path / "a.pdf"
+    task = {"id": 1, "src": str(src), "dst": str(dst)}
+    options = {"sim_profile": {"startup": "fixed:0", "open": "fixed:0", "save": "fixed:0",
+                               "quit": "fixed:0"}}
+    cache = _cache(tmp_path, link_mode="hardlink")
+    pool = create_office_pool("sim", options)
+    try:
+        first = convert_task(pool, "sim", task, options, cache)
+        assert first["status"] == "ok" and first["cache_hit"] is False
+        # 把缓存内容换成可识别的数据，然后命中缓存得到一个硬链接
+        key = cache.make_key(first["source_hash"], "sim", export_settings(options))
+        with open(cache._object_path(key), "wb") as f:
+            f.write(b"%PDF-1.4 cached")
+        assert convert_task(pool, "sim", task, options, cache)["cache_method"] == "hardlink"
+        assert os.stat(dst).st_nlink == 2
+
+        # 换了导出配置后未命中，重新导出前要断开硬链接，否则会改写缓存中的PDF
+        screen = dict(options, export_profile="screen")
+        assert convert_task(pool, "sim", task, screen, cache)["cache_hit"] is False
+        assert os.stat(dst).st_nlink == 1
+        with open(cache._object_path(key), "rb") as f:
+            assert f.read() == b"%PDF-1.4 cached"
+    finally:
+        pool.close()
+        cache.close()
@@ -0,0 +1,148 @@
+import multiprocessing
+from contextlib import contextmanager
+
+import pytest
+
+from conversion_engine import MAX_CRASH_STREAK, ConversionEngine, convert_document
+from sim_office import SimProfile
+
+
+class _ComError(Exception):
+    """模拟pywintypes.com_error"""
+
+    def __init__(self, hresult):
+        super().__init__(hresult, "error", None, None)
+        self.hresult = hresult
+
+
+class _Document:
+    def __init__(self, export_error):
+        self.export_error = export_error
+        self.saved = []
+
+    def ExportAsFixedFormat(self, path, **arguments):
+        raise self.export_error
+
+    def SaveAs(self, path, FileFormat=17):
+        self.saved.append(path)
+
+    def Close(self, save):
+        pass
+
+
+class _Pool:
+    def __init__(self, document):
+        documents = type("Documents", (), {"Open": lambda _, path, **options: document})()
+        self.app = type("App", (), {"Documents": documents})()
+
+    @contextmanager
+    def instance(self):
+        yield self.app
+
+
+@pytest.mark.parametrize("error", [AttributeError("ExportAsFixedFormat"),
+                                   _ComError(-2147352573), _ComError(-2147352570)])
+def test_falls_back_to_save_as_without_export_method(tmp_path, error):
+    document = _Document(error)
+    assert convert_document(_Pool(document), "sim", "a.docx", str(tmp_path / "a.pdf")) is False
+    assert document.saved == [str(tmp_path / "a.pdf")]
+
+
+@pytest.mark.parametrize("error", [_ComError(-2147417851), RuntimeError("磁盘已满")])
+def test_other_export_errors_propagate(tmp_path, error):
+    document = _Document(error)
+    with pytest.raises(type(error)):
+        convert_document(_Pool(document), "sim", "a.docx", str(tmp_path / "a.pdf"))
+    assert document.saved == []
+
+
+# 以下测试用模拟后端驱动真实的多进程引擎
+
+FAST = {"startup": "fixed:0", "open": "fixed:0", "save": "fixed:0.05", "quit": "fixed:0"}
+
+
+def _engine(options=None, **profile):
+    return ConversionEngine("sim", workers=(options or {}).pop("workers", 1),
+                            options=dict(options or {}, sim_profile=dict(FAST, **profile)))
+
+
+def _submit(engine, tmp_path, count, **extra):
+    tmp_path.mkdir(exist_ok=True)
+    ids = []
+    for index in range(count):
+        src = tmp_path / f"doc{index}.docx"
+        src.write_bytes(b"document")
+        ids.append(engine.submit(str(src), str(tmp_path / f"doc{index}.pdf"), **extra))
+    return ids
+
+
+def _run(engine):
+    engine.finish_input()
+    try:
+        return list(engine.results())
+    finally:
+        engine.close(timeout=10)
+
+
+def _hangs_first(seed, generation, rate=0.5):
+    """序号0的工作进程第generation次启动后，第一个文件是否卡死（第一次随机数用于hang_rate）"""
+    return SimProfile(seed=seed, generation=generation).rng.random() < rate
+
+
+def test_every_task_gets_exactly_one_result(tmp_path):
+    engine = _engine({"workers": 2})
+    engine.start()
+    ids = _submit(engine, tmp_path, 10)
+    results = _run(engine)
+    assert sorted(result["id"] for result in results) == sorted(ids)
+    assert all(result["status"] == "ok" for result in results)
+    assert {result["worker"] for result in results} <= {0, 1}
+    assert not multiprocessing.active_children()
+
+
+def test_crashed_workers_are_replaced_until_the_crash_limit(tmp_path):
+    engine = _engine(crash_rate=1.0)
+    engine.start()
+    ids = _submit(engine, tmp_path, 10)
+    results = _run(engine)
+    assert sorted(result["id"] for result in results) == sorted(ids)
+    assert all(result["status"] == "failed" for result in results)
+    assert engine.worker_crashes == MAX_CRASH_STREAK  # 每次崩溃后都补充了新进程，直到达到上限
+    assert any("反复异常退出" in result["error"] for result in results)
+    assert not multiprocessing.active_children()
+
+
+def test_hung_document_is_killed_and_next_file_converts(tmp_path):
+    seed = next(seed for seed in range(1000) if _hangs_first(seed, 0) and not _hangs_first(seed, 1))
+    engine = _engine({"timeout": 1, "timeout_per_mb": 0}, hang_rate=0.5, seed=seed)
+    engine.start()
+    first, second = _submit(engine, tmp_path, 2)
+    results = {result["id"]: result for result in _run(engine)}
+    assert results[first]["status"] == "timeout"
+    assert results[second]["status"] == "ok"
+    assert engine.timeouts == 1
+    assert not multiprocessing.active_children()
+
+
+def test_abort_kills_hung_workers(tmp_path):
+    engine = _engine({"workers": 2, "timeout": 0}, hang_rate=1.0)
+    engine.on_started = lambda task: engine.abort()
+    engine.start()
+    _submit(engine, tmp_path, 4)
+    results = _run(engine)
+    assert results and all(result["status"] == "failed" for result in results)
+    assert not multiprocessing.active_children()
+
+
+def test_cancel_drops_queued_tasks_of_a_job(tmp_path):
+    engine = ConversionEngine("sim", workers=1, prefetch=0, options={"sim_profile": FAST})
+    cancelled = []
+    engine.on_started = lambda task: cancelled.extend(engine.cancel("a")) if not cancelled else None
+    engine.start()
+    ids = _submit(engine, tmp_path, 4, job="a") + _submit(engine, tmp_path / "b", 2, job="b")
+    results = _run(engine)
+    finished = [result["id"] for result in results]
+    assert len(finished) == len(set(finished))
+    assert sorted(finished + [task["id"] for task in cancelled]) == sorted(ids)
+    assert {task["job"] for task in cancelled} == {"a"}
+    assert not multiprocessing.active_children()
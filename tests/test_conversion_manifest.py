@@ -0,0 +1,97 @@
+import os
+import json
+
+import pytest
+
+import converter_cli
+from conversion_manifest import ConversionManifest, source_fingerprint
+
+
+@pytest.fixture
+def converted(tmp_path):
+    """一个已经转换并记录在清单中的文件"""
+    src = tmp_path / "a.docx"
+    src.write_bytes(b"document")
+    dst = tmp_path / "a.pdf"
+    dst.write_bytes(b"%PDF-1.4 a")
+    manifest = ConversionManifest(str(tmp_path), backend="word")
+    manifest.record(dict(source_fingerprint(str(src)), src=str(src), dst=str(dst), backend="word"))
+    yield manifest, src, dst
+    manifest.close()
+
+
+def _touch(path, seconds=10):
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + seconds * 10**9))
+
+
+def test_new_file_needs_conversion(tmp_path, converted):
+    manifest, _, _ = converted
+    other = tmp_path / "b.docx"
+    other.write_bytes(b"document")
+    assert manifest.needs_conversion(str(other), str(tmp_path / "b.pdf")) == (True, "新文件")
+
+
+def test_unchanged_file_is_skipped(converted):
+    manifest, src, dst = converted
+    assert manifest.needs_conversion(str(src), str(dst)) == (False, "未修改")
+
+
+def test_size_change_needs_conversion(converted):
+    manifest, src, dst = converted
+    src.write_bytes(b"changed document")
+    assert manifest.needs_conversion(str(src), str(dst)) == (True, "文件已修改")
+
+
+def test_touch_with_same_content_is_skipped(converted):
+    manifest, src, dst = converted
+    _touch(src)
+    assert manifest.needs_conversion(str(src), str(dst)) == (False, "内容未变")
+    assert manifest.needs_conversion(str(src), str(dst)) == (False, "未修改")  # 记下了新的修改时间
+
+
+def test_same_size_different_content_needs_conversion(converted):
+    manifest, src, dst = converted
+    src.write_bytes(b"DOCUMENT")
+    _touch(src)
+    assert manifest.needs_conversion(str(src), str(dst)) == (True, "文件已修改")
+
+
+def test_missing_or_changed_pdf_needs_conversion(converted):
+    manifest, src, dst = converted
+    dst.write_bytes(b"%PDF-1.4 b")
+    assert manifest.needs_conversion(str(src), str(dst)) == (True, "PDF已改变")
+    dst.unlink()
+    assert manifest.needs_conversion(str(src), str(dst)) == (True, "PDF不存在")
+
+
+def test_backend_change_needs_conversion(tmp_path, converted):
+    manifest, src, dst = converted
+    manifest.commit()
+    other = ConversionManifest(str(tmp_path), backend="libreoffice")
+    try:
+        assert other.needs_conversion(str(src), str(dst)) == (True, "转换后端已改变")
+    finally:
+        other.close()
+
+
+def _convert(capsys, *args):
+    code = converter_cli.main(["convert", *args, "--backend", "sim", "--workers", "1", "--no-cache"])
+    records = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    return code, [record for record in records if record["type"] in ("result", "skipped")]
+
+
+def test_force_reconverts_unchanged_files(tmp_path, capsys, monkeypatch):
+    monkeypatch.setenv("W2P_COST_MODEL", str(tmp_path / "cost.sqlite"))
+    monkeypatch.setenv("W2P_LOG_DIR", str(tmp_path / "logs"))
+    monkeypatch.setenv("W2P_SIM_PROFILE", '{"startup": "fixed:0", "save": "fixed:0", "quit": "fixed:0"}')
+    source = tmp_path / "src"
+    source.mkdir()
+    (source / "a.docx").write_bytes(b"document")
+    out = str(tmp_path / "out")
+
+    assert _convert(capsys, str(source), "--out", out)[1][0]["type"] == "result"
+    assert _convert(capsys, str(source), "--out", out)[1][0]["type"] == "skipped"
+    code, records = _convert(capsys, str(source), "--out", out, "--force")
+    assert code == converter_cli.EXIT_OK
+    assert [(record["type"], record["status"]) for record in records] == [("result", "ok")]
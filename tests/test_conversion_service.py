@@ -0,0 +1,98 @@
+import json
+import threading
+import http.client
+
+import pytest
+
+from conversion_service import ConversionService, ServiceHTTPServer
+
+SLOW = {"startup": "fixed:0", "open": "fixed:0", "save": "fixed:1.5", "quit": "fixed:0"}
+
+
+@pytest.fixture
+def service(tmp_path):
+    service = ConversionService("sim", workers=1, options={"sim_profile": SLOW}, queue_size=1,
+                                spool_dir=str(tmp_path / "spool"), allowed_roots=[str(tmp_path)])
+    service.start()
+    server = ServiceHTTPServer(("127.0.0.1", 0), service)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield service, server
+    server.shutdown()
+    service.close()
+
+
+def _request(server, method, path, body=b"", headers=None):
+    connection = http.client.HTTPConnection(*server.server_address[:2], timeout=30)
+    try:
+        connection.request(method, path, body, headers or {})
+        response = connection.getresponse()
+        return response.status, dict(response.getheaders()), response.read()
+    finally:
+        connection.close()
+
+
+def _upload(server, sync=False):
+    return _request(server, "POST", "/convert?name=a.docx" + ("&sync=1" if sync else ""),
+                    b"document", {"Content-Type": "application/octet-stream"})
+
+
+def _batch(server, tmp_path, count):
+    paths = []
+    for index in range(count):
+        path = tmp_path / f"doc{index}.docx"
+        path.write_bytes(b"document")
+        paths.append(str(path))
+    body = json.dumps({"paths": paths, "out": str(tmp_path / "out")}).encode("utf-8")
+    return _request(server, "POST", "/batches", body, {"Content-Type": "application/json"})
+
+
+def test_upload_returns_202_then_429_when_queue_is_full(service):
+    _, server = service
+    status, headers, body = _upload(server)
+    assert status == 202
+    assert headers["Location"] == f"/jobs/{json.loads(body)['id']}"
+
+    status, headers, _ = _upload(server)
+    assert status == 429
+    assert int(headers["Retry-After"]) >= 1
+
+
+def test_batch_is_refused_when_queue_is_full(service, tmp_path):
+    _, server = service
+    assert _upload(server)[0] == 202
+    status, headers, _ = _batch(server, tmp_path, 2)
+    assert status == 429
+    assert "Retry-After" in headers
+
+
+def test_batch_is_admitted_up_to_remaining_capacity(service, tmp_path):
+    conversion, server = service
+    status, _, body = _batch(server, tmp_path, 3)
+    assert status == 202
+    batch = conversion.get_batch(json.loads(body)["id"])
+    while batch.scanning:
+        threading.Event().wait(0.05)
+    assert (batch.submitted, batch.rejected) == (1, 2)
+    assert _upload(server)[0] == 429  # 批次中的文件占用队列位置
+    while not batch.done:
+        threading.Event().wait(0.05)
+    assert _upload(server)[0] == 202  # 完成后释放队列位置
+
+
+def test_sync_request_returns_202_when_wait_expires(service, monkeypatch):
+    conversion, server = service
+    monkeypatch.setattr(conversion, "sync_wait", lambda job: 0.1)
+    status, headers, body = _upload(server, sync=True)
+    assert status == 202
+    job = json.loads(body)
+    assert job["status"] != "ok"
+    assert headers["Location"] == f"/jobs/{job['id']}"
+
+
+def test_sync_request_returns_pdf(service):
+    _, server = service
+    status, headers, body = _upload(server, sync=True)
+    assert status == 200
+    assert headers["Content-Type"] == "application/pdf"
+    assert body.startswith(b"%PDF")
@@ -0,0 +1,20 @@
+import json
+
+import converter_cli
+
+
+def test_relative_out_gives_absolute_paths(tmp_path, capsys, monkeypatch):
+    monkeypatch.setenv("W2P_COST_MODEL", str(tmp_path / "cost.sqlite"))
+    monkeypatch.setenv("W2P_LOG_DIR", str(tmp_path / "logs"))
+    monkeypatch.setenv("W2P_SIM_PROFILE", '{"startup": "fixed:0", "save": "fixed:0", "quit": "fixed:0"}')
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src" / "a.docx").write_bytes(b"document")
+    monkeypatch.chdir(tmp_path)
+
+    code = converter_cli.main(["convert", "src", "--out", "out", "--backend", "sim",
+                               "--workers", "1", "--no-cache"])
+    results = [record for record in map(json.loads, capsys.readouterr().out.splitlines())
+               if record["type"] == "result"]
+    assert code == converter_cli.EXIT_OK
+    assert [record["dst"] for record in results] == [str(tmp_path / "out" / "a.pdf")]
+    assert (tmp_path / "out" / "a.pdf").exists()
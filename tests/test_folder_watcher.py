@@ -0,0 +1,25 @@
+import threading
+
+from folder_watcher import FolderWatcher
+
+
+def test_on_ready_errors_are_reported_to_on_error(tmp_path):
+    (tmp_path / "a.docx").write_bytes(b"document")
+    errors = []
+    reported = threading.Event()
+
+    def on_ready(path, detected, backlog):
+        raise OSError("无法创建输出目录")
+
+    def on_error(path, error):
+        errors.append((path, str(error)))
+        reported.set()
+
+    watcher = FolderWatcher(str(tmp_path), on_ready, settle=0.1, poll_interval=0.1,
+                            use_events=False, on_error=on_error)
+    watcher.start()
+    try:
+        assert reported.wait(10)
+    finally:
+        watcher.stop()
+    assert errors == [(str(tmp_path / "a.docx"), "无法创建输出目录")]
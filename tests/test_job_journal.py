@@ -0,0 +1,93 @@
+import os
+import json
+
+import pytest
+
+import job_journal
+from job_journal import DONE, FAILED, QUEUED, RUNNING, JobJournal, load_journal
+
+
+@pytest.fixture
+def files(tmp_path):
+    """三个源文件及其PDF路径"""
+    pairs = []
+    for name in "abc":
+        src = tmp_path / f"{name}.docx"
+        src.write_bytes(b"document")
+        dst = tmp_path / f"{name}.pdf"
+        dst.write_bytes(b"%PDF-1.4")
+        pairs.append((str(src), str(dst)))
+    return pairs
+
+
+def _interrupted_run(root, files):
+    """a完成、b失败、c转换中时程序被中断"""
+    journal = JobJournal(root, "sim")
+    for src, dst in files:
+        journal.queued(src, dst)
+    for src, _ in files:
+        journal.started(src)
+    journal.finished({"src": files[0][0], "dst": files[0][1], "status": "ok"})
+    journal.finished({"src": files[1][0], "dst": files[1][1], "status": "failed", "error": "超时"})
+    journal.close()
+    return journal
+
+
+def test_reports_exactly_the_unfinished_files(tmp_path, files):
+    _interrupted_run(str(tmp_path), files)
+    state = load_journal(str(tmp_path))
+    assert state.header["backend"] == "sim"
+    assert state.unfinished and not state.finished
+    assert state.counts() == {QUEUED: 0, RUNNING: 1, DONE: 1, FAILED: 1}
+    assert [src for src, dst in files if not state.is_done(src, dst)] == [files[1][0], files[2][0]]
+
+
+def test_done_file_is_redone_when_source_changed_or_pdf_missing(tmp_path, files):
+    _interrupted_run(str(tmp_path), files)
+    src, dst = files[0]
+    state = load_journal(str(tmp_path))
+    assert state.is_done(src, dst)
+    assert not state.is_done(src, str(tmp_path / "missing.pdf"))
+    os.utime(src, ns=(0, 1))
+    assert not state.is_done(src, dst)
+
+
+def test_torn_last_line_is_ignored(tmp_path, files):
+    journal = _interrupted_run(str(tmp_path), files)
+    with open(journal.path, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"state": DONE, "src": files[2][0], "dst": files[2][1]})[:25])
+    state = load_journal(str(tmp_path))
+    assert not state.is_done(*files[2])
+    assert state.counts()[RUNNING] == 1
+
+
+def test_close_flushes_buffered_records(tmp_path, files, monkeypatch):
+    monkeypatch.setattr(job_journal, "FLUSH_INTERVAL", 60)  # 后台线程在测试期间不会自己写入
+    journal = JobJournal(str(tmp_path), "sim")
+    journal.queued(*files[0])
+    journal.finished({"src": files[0][0], "dst": files[0][1], "status": "ok"})
+    assert load_journal(str(tmp_path)).files == {}
+    journal.close()
+    state = load_journal(str(tmp_path))
+    assert state.is_done(*files[0])
+    journal.queued(*files[1])  # 关闭后的记录被丢弃
+    assert len(load_journal(str(tmp_path)).files) == 1
+
+
+def test_close_complete_marks_journal_finished(tmp_path, files):
+    journal = JobJournal(str(tmp_path), "sim")
+    journal.queued(*files[0])
+    journal.close(complete=True)
+    state = load_journal(str(tmp_path))
+    assert state.finished
+    assert not state.unfinished  # 正常结束的转换不需要续传
+
+
+def test_resume_keeps_only_done_records(tmp_path, files):
+    _interrupted_run(str(tmp_path), files)
+    previous = load_journal(str(tmp_path))
+    JobJournal(str(tmp_path), "sim", resume_from=previous).close()
+    state = load_journal(str(tmp_path))
+    assert state.header["resumed"]
+    assert list(state.done) == list(previous.done)
+    assert state.counts() == {QUEUED: 0, RUNNING: 0, DONE: 1, FAILED: 0}
@@ -0,0 +1,66 @@
+import os
+import sys
+import json
+import socket
+import subprocess
+
+import libreoffice_backend
+from libreoffice_backend import (BRIDGE_SCRIPT, SIMULATE, TOKEN_ENV, LibreOfficeListener,
+                                 find_uno_python)
+
+
+def _request(port, request, rejected=False):
+    with socket.create_connection(("127.0.0.1", port), timeout=30) as sock, \
+            sock.makefile("rwb") as stream:
+        stream.write(json.dumps(request).encode("utf-8") + b"\n")
+        stream.flush()
+        response = json.loads(stream.readline())
+        if rejected:
+            assert stream.readline() == b""  # 令牌不对时断开连接
+        return response
+
+
+def test_listener_round_trip(tmp_path):
+    src = tmp_path / "a.docx"
+    src.write_bytes(b"document")
+    listener = LibreOfficeListener(SIMULATE, startup_timeout=30).start()
+    try:
+        listener.convert(str(src), str(tmp_path / "a.pdf"))
+    finally:
+        listener.stop()
+    assert (tmp_path / "a.pdf").read_bytes().startswith(b"%PDF")
+
+
+def test_bridge_rejects_requests_without_token(tmp_path):
+    src = tmp_path / "a.docx"
+    src.write_bytes(b"document")
+    process = subprocess.Popen([sys.executable, BRIDGE_SCRIPT, "--simulate"],
+                               stdout=subprocess.PIPE, env=dict(os.environ, **{TOKEN_ENV: "secret"}))
+    try:
+        port = int(process.stdout.readline().split()[1])
+        for request in ({"src": str(src), "dst": str(tmp_path / "b.pdf")},
+                        {"token": "wrong", "cmd": "quit"}):
+            assert _request(port, request, rejected=True)["ok"] is False
+        assert not (tmp_path / "b.pdf").exists()
+        assert _request(port, {"token": "secret", "src": str(src), "dst": str(tmp_path / "b.pdf")})["ok"]
+        assert _request(port, {"token": "secret", "cmd": "quit"})["ok"]
+        assert process.wait(timeout=30) == 0
+    finally:
+        if process.poll() is None:
+            process.kill()
+        process.stdout.close()
+
+
+def test_frozen_build_does_not_run_its_own_executable(monkeypatch, tmp_path):
+    tried = []
+
+    def run(cmd, **kwargs):
+        tried.append(cmd[0])
+        raise OSError("not found")
+
+    monkeypatch.setattr(sys, "frozen", True, raising=False)
+    monkeypatch.delenv("W2P_UNO_PYTHON", raising=False)
+    monkeypatch.setattr(subprocess, "run", run)
+    monkeypatch.setattr(libreoffice_backend.shutil, "which", lambda name: f"/usr/bin/{name}")
+    assert find_uno_python(str(tmp_path / "soffice")) is None
+    assert tried == ["/usr/bin/python3"]
@@ -0,0 +1,121 @@
+import pytest
+
+docx = pytest.importorskip("docx")
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.oxml import parse_xml
+from docx.shared import Pt, RGBColor
+
+import native_docx
+from native_docx import classify_docx
+
+W_NS = 'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
+
+
+def _num_pr(paragraph, num_id, ilvl=0):
+    """给段落直接加上numPr（不通过列表样式）"""
+    paragraph._p.get_or_add_pPr().append(parse_xml(
+        f'<w:numPr {W_NS}><w:ilvl w:val="{ilvl}"/><w:numId w:val="{num_id}"/></w:numPr>'))
+
+
+def _save(tmp_path, build, name="doc.docx"):
+    document = docx.Document()
+    build(document)
+    path = tmp_path / name
+    document.save(path)
+    return str(path)
+
+
+def _simple(document):
+    document.add_heading("标题", level=1)
+    document.add_paragraph("正文段落")
+    document.add_paragraph("项目", style="List Bullet")
+    document.add_paragraph("第一项", style="List Number")
+
+
+def _formatted(document):
+    paragraph = document.add_paragraph("居中")
+    paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    run = paragraph.add_run("大号红字")
+    run.font.size = Pt(20)
+    run.font.color.rgb = RGBColor(0xFF, 0, 0)
+    document.add_paragraph("新页").paragraph_format.page_break_before = True
+
+
+def _page_break(document):
+    document.add_paragraph("第一页")
+    document.add_page_break()
+    document.add_paragraph("第二页")
+
+
+def _table(document):
+    document.add_table(rows=1, cols=1)
+
+
+def _header(document):
+    document.sections[0].header.paragraphs[0].text = "页眉"
+
+
+def _unknown_numbering(document):
+    _num_pr(document.add_paragraph("项目", style="List Paragraph"), 99)
+
+
+def _undefined_level(document):
+    _num_pr(document.add_paragraph("项目", style="List Paragraph"), 5, ilvl=1)  # 模板只定义了第0级
+
+
+@pytest.mark.parametrize("build", [_simple, _formatted, _page_break])
+def test_accepts_simple_documents(tmp_path, build):
+    assert classify_docx(_save(tmp_path, build)) == (True, "简单文档")
+
+
+@pytest.mark.parametrize("build, reason", [
+    (_table, "表格"),
+    (_header, "页眉"),
+    (_unknown_numbering, "列表编号"),
+    (_undefined_level, "列表编号"),
+])
+def test_rejects_complex_documents(tmp_path, build, reason):
+    simple, why = classify_docx(_save(tmp_path, build))
+    assert not simple
+    assert reason in why
+
+
+def test_rejects_non_docx(tmp_path):
+    path = tmp_path / "broken.docx"
+    path.write_bytes(b"not a zip")
+    assert classify_docx(str(path)) == (False, "无法解析docx结构")
+
+
+def _list_prefixes(path):
+    import zipfile
+    document = docx.Document(path)
+    with zipfile.ZipFile(path) as archive:
+        numbering = native_docx.read_numbering(archive)
+    counters = {}
+    return [native_docx._list_prefix(p, numbering, counters) for p in document.paragraphs]
+
+
+def test_list_prefix_follows_numbering_definition(tmp_path):
+    def build(document):
+        document.add_paragraph("样式项目", style="List Bullet")
+        document.add_paragraph("样式编号", style="List Number")
+        _num_pr(document.add_paragraph("直接编号", style="List Paragraph"), 5)  # numId 5为decimal
+        document.add_paragraph("普通段落")
+        _num_pr(document.add_paragraph("继续编号", style="List Paragraph"), 5)
+        _num_pr(document.add_paragraph("项目符号", style="List Paragraph"), 1)  # numId 1为bullet
+
+    prefixes = _list_prefixes(_save(tmp_path, build))
+    assert prefixes == [("• ", 0), ("1. ", 0), ("2. ", 0), ("", 0), ("3. ", 0), ("• ", 0)]
+
+
+@pytest.mark.skipif(not native_docx.HAS_NATIVE, reason="需要python-docx和reportlab")
+def test_render_keeps_page_breaks(tmp_path):
+    pypdf = pytest.importorskip("pypdf")
+
+    def build(document):
+        _page_break(document)
+        _formatted(document)
+
+    pdf = tmp_path / "out.pdf"
+    native_docx.render_docx_to_pdf(_save(tmp_path, build), str(pdf))
+    assert len(pypdf.PdfReader(str(pdf)).pages) == 3
@@ -0,0 +1,86 @@
+import time
+
+import pytest
+
+from office_pool import OfficeInstancePool
+from sim_office import FakeOfficeDispatcher, SimProfile
+
+
+def _pool(**options):
+    dispatcher = FakeOfficeDispatcher(profile=SimProfile(startup="fixed:0", quit="fixed:0"))
+    return OfficeInstancePool("Word.Application", dispatch=dispatcher, **options), dispatcher
+
+
+def test_reuses_instance_between_documents():
+    pool, dispatcher = _pool()
+    first = pool.acquire()
+    assert first.Visible is False and first.DisplayAlerts == 0
+    pool.release(first)
+    second = pool.acquire()
+    pool.release(second)
+    assert second is first
+    assert dispatcher.started == 1
+    assert (pool.hits, pool.misses, pool.restarts) == (1, 1, 0)
+    pool.close()
+    assert first.quit
+
+
+def test_recycles_after_max_documents():
+    pool, dispatcher = _pool(max_documents=2)
+    apps = []
+    for _ in range(5):
+        with pool.instance() as app:
+            apps.append(app)
+    assert apps[0] is apps[1] and apps[2] is apps[3]
+    assert apps[1] is not apps[2] and apps[3] is not apps[4]
+    assert apps[0].quit and apps[2].quit and not apps[4].quit
+    assert dispatcher.started == 3
+    stats = pool.stats()
+    assert (stats["hits"], stats["misses"], stats["restarts"]) == (2, 3, 2)
+    assert (stats["idle"], stats["busy"]) == (1, 0)
+    pool.close()
+
+
+def test_recycles_after_max_age():
+    pool, _ = _pool(max_age=0.05)
+    with pool.instance() as first:
+        pass
+    time.sleep(0.1)
+    with pool.instance() as second:
+        pass
+    assert second is not first
+    assert first.quit
+    assert (pool.hits, pool.misses, pool.restarts) == (0, 2, 1)
+    pool.close()
+
+
+def test_recycles_after_com_error():
+    pool, dispatcher = _pool()
+    with pytest.raises(RuntimeError):
+        with pool.instance() as first:
+            raise RuntimeError("RPC服务器不可用")
+    assert first.quit
+    with pool.instance() as second:
+        pass
+    assert second is not first
+    assert dispatcher.started == 2
+    assert (pool.hits, pool.misses, pool.restarts) == (0, 2, 1)
+    pool.close()
+
+
+def test_take_stage_times_returns_and_clears():
+    pool, _ = _pool()
+    app = pool.acquire()
+    stages = pool.take_stage_times()
+    assert set(stages) == {"dispatch"}  # 模拟实现不需要初始化COM
+    assert pool.take_stage_times() == {}
+    pool.release(app, error=True)
+    assert set(pool.take_stage_times()) == {"quit"}
+    pool.close()
+
+
+def test_acquire_after_close_fails():
+    pool, _ = _pool()
+    pool.close()
+    with pytest.raises(RuntimeError):
+        pool.acquire()
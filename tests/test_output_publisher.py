@@ -0,0 +1,114 @@
+import os
+import threading
+
+import pytest
+
+import output_publisher
+from output_publisher import PARTIAL_SUFFIX, OutputPublisher, publish_file
+
+
+@pytest.fixture
+def local_pdf(tmp_path):
+    path = tmp_path / "scratch.pdf"
+    path.write_bytes(b"%PDF-1.4 new")
+    return path
+
+
+@pytest.fixture
+def no_delay(monkeypatch):
+    monkeypatch.setattr(output_publisher, "REPLACE_RETRY_DELAY", 0)
+
+
+def _partials(folder):
+    return [name for name in os.listdir(folder) if name.endswith(PARTIAL_SUFFIX)]
+
+
+def _failing_replace(monkeypatch, failures):
+    """前failures次改名抛出PermissionError（目标文件被其他程序打开）"""
+    real_replace = os.replace
+    calls = []
+
+    def replace(src, dst):
+        calls.append(dst)
+        if len(calls) <= failures:
+            raise PermissionError("文件被占用")
+        real_replace(src, dst)
+
+    monkeypatch.setattr(output_publisher.os, "replace", replace)
+    return calls
+
+
+def test_publish_file_replaces_destination(tmp_path, local_pdf):
+    dst = tmp_path / "out" / "a.pdf"
+    dst.parent.mkdir()
+    dst.write_bytes(b"%PDF-1.4 old")
+    publish_file(str(local_pdf), str(dst))
+    assert dst.read_bytes() == b"%PDF-1.4 new"
+    assert _partials(dst.parent) == []
+    assert local_pdf.exists()  # 本地文件由调用方删除
+
+
+def test_publish_file_retries_locked_destination(tmp_path, local_pdf, monkeypatch, no_delay):
+    calls = _failing_replace(monkeypatch, failures=2)
+    dst = tmp_path / "a.pdf"
+    publish_file(str(local_pdf), str(dst))
+    assert len(calls) == 3
+    assert dst.read_bytes() == b"%PDF-1.4 new"
+    assert _partials(tmp_path) == []
+
+
+def test_publish_file_cleans_up_after_failure(tmp_path, local_pdf, monkeypatch, no_delay):
+    calls = _failing_replace(monkeypatch, failures=output_publisher.REPLACE_RETRIES)
+    dst = tmp_path / "a.pdf"
+    dst.write_bytes(b"%PDF-1.4 old")
+    with pytest.raises(PermissionError):
+        publish_file(str(local_pdf), str(dst))
+    assert len(calls) == output_publisher.REPLACE_RETRIES
+    assert dst.read_bytes() == b"%PDF-1.4 old"
+    assert _partials(tmp_path) == []
+
+    with pytest.raises(OSError):
+        publish_file(str(tmp_path / "missing.pdf"), str(dst))  # 复制失败
+    assert _partials(tmp_path) == []
+
+
+def _publish(publisher, result, path):
+    done = threading.Event()
+    publisher.publish(result, path, lambda _: done.set())
+    assert done.wait(5)
+    return result
+
+
+def test_publisher_writes_back_and_removes_scratch(tmp_path):
+    publisher = OutputPublisher(str(tmp_path / "scratch"), workers=1, network_only=False)
+    scratch = publisher.scratch_path({"id": 7})
+    with open(scratch, "wb") as f:
+        f.write(b"%PDF-1.4 new")
+    dst = tmp_path / "out" / "a.pdf"
+    result = _publish(publisher, {"status": "ok", "dst": str(dst)}, scratch)
+
+    assert result["status"] == "ok"
+    assert "publish_wait" in result and "publish_time" in result
+    assert dst.read_bytes() == b"%PDF-1.4 new"
+    assert not os.path.exists(scratch)
+    assert (publisher.stats["published"], publisher.stats["bytes"]) == (1, 12)
+    assert publisher.depth == 0
+    publisher.close()
+    assert not os.path.exists(publisher.root)
+
+
+def test_publisher_marks_result_failed(tmp_path, monkeypatch, no_delay):
+    _failing_replace(monkeypatch, failures=output_publisher.REPLACE_RETRIES)
+    publisher = OutputPublisher(str(tmp_path / "scratch"), workers=1, network_only=False)
+    scratch = publisher.scratch_path({"id": 7})
+    with open(scratch, "wb") as f:
+        f.write(b"%PDF-1.4 new")
+    (tmp_path / "out").mkdir()
+    result = _publish(publisher, {"status": "ok", "dst": str(tmp_path / "out" / "a.pdf")}, scratch)
+
+    assert result["status"] == "failed"
+    assert result["error"].startswith("写入PDF失败")
+    assert publisher.stats["errors"] == 1
+    assert not os.path.exists(scratch)
+    assert os.listdir(tmp_path / "out") == []
+    publisher.close()
@@ -0,0 +1,122 @@
+"""MergeStage按顺序增量追加，以及命令行扫描完成后确定合并顺序"""
+import os
+import argparse
+import threading
+
+import pytest
+
+pypdf = pytest.importorskip("pypdf")
+
+from pdf_merge import PARTIAL_SUFFIX, MergeStage, natural_key
+import converter_cli
+
+
+def _make_pdf(path, pages):
+    writer = pypdf.PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(200, 200)
+    writer.write(path)
+
+
+@pytest.fixture
+def parts(tmp_path):
+    """src/ch1.docx ch2.docx ch10.docx 和对应的PDF（页数分别为1、2、3）"""
+    src = tmp_path / "src"
+    src.mkdir()
+    result = []
+    for name, pages in (("ch1", 1), ("ch2", 2), ("ch10", 3)):
+        (src / f"{name}.docx").write_bytes(b"")
+        pdf = tmp_path / f"{name}.pdf"
+        _make_pdf(str(pdf), pages)
+        result.append((str(src / f"{name}.docx"), str(pdf)))
+    return src, result
+
+
+def test_natural_key_orders_numbers_by_value():
+    names = ["ch10.docx", "ch2.docx", "sub/ch1.docx", "ch1.docx"]
+    assert sorted(names, key=natural_key) == ["ch1.docx", "ch2.docx", "ch10.docx", "sub/ch1.docx"]
+
+
+def test_parts_are_appended_before_close(tmp_path, parts):
+    src, items = parts
+    out = str(tmp_path / "book.pdf")
+    stage = MergeStage(out, str(src))
+    for docx, pdf in items:
+        stage.expect(docx, pdf)
+
+    ch1, ch2, ch10 = (docx for docx, _ in items)
+    stage.part_done(ch2, True)
+    assert stage.merged == 0  # 顺序还没有确定
+    stage.finish_input()
+    assert stage.merged == 0  # ch1还没有完成，ch2等待
+    stage.part_done(ch1, True)
+    assert stage.merged == 2
+    assert stage.page_count == 3
+    stage.part_done(ch10, True)
+    assert stage.merged == 3
+
+    stage.close()
+    reader = pypdf.PdfReader(out)
+    assert len(reader.pages) == 6
+    assert [item.title for item in reader.outline] == ["ch1", "ch2", "ch10"]
+    assert [reader.get_destination_page_number(item) for item in reader.outline] == [0, 1, 3]
+
+
+def test_failed_part_is_skipped(tmp_path, parts):
+    src, items = parts
+    out = str(tmp_path / "book.pdf")
+    stage = MergeStage(out, str(src), order="path")
+    for docx, pdf in items:
+        stage.expect(docx, pdf)
+    stage.finish_input()
+    for index, (docx, _) in enumerate(items):
+        stage.part_done(docx, index != 1)
+    stage.close()
+    assert stage.missing == [items[1][0]]
+    assert [item.title for item in pypdf.PdfReader(out).outline] == ["ch1", "ch10"]
+
+
+def test_interrupted_merge_leaves_no_file(tmp_path, parts):
+    src, items = parts
+    out = str(tmp_path / "book.pdf")
+    stage = MergeStage(out, str(src))
+    for docx, pdf in items:
+        stage.expect(docx, pdf)
+    stage.close(complete=False)
+    assert not os.path.exists(out)
+    assert not os.path.exists(out + PARTIAL_SUFFIX)
+
+
+class _RecordingMerge:
+    def __init__(self):
+        self.expected = []
+        self.finished = False
+
+    def expect(self, src, dst, done=False):
+        self.expected.append(src)
+
+    def finish_input(self):
+        self.finished = True
+
+
+def _args():
+    return argparse.Namespace(out=None, force=True)
+
+
+def test_folder_scan_fixes_merge_order(parts):
+    src, items = parts
+    merge = _RecordingMerge()
+    counters = {"skipped": 0, "resumed": 0}
+    tasks = list(converter_cli._iter_tasks(_args(), str(src), None, counters, threading.Event(), merge=merge))
+    assert len(tasks) == 3
+    assert merge.finished  # 扫描正常完成后就确定顺序，不等到close()
+
+
+def test_cancelled_scan_does_not_fix_merge_order(parts):
+    src, _ = parts
+    merge = _RecordingMerge()
+    stop_event = threading.Event()
+    stop_event.set()
+    counters = {"skipped": 0, "resumed": 0}
+    assert list(converter_cli._iter_tasks(_args(), str(src), None, counters, stop_event, merge=merge)) == []
+    assert not merge.finished
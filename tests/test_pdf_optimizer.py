@@ -0,0 +1,118 @@
+"""optimize_pdf缩小大图片，以及优化后的PDF写入转换缓存"""
+import os
+import zlib
+import random
+
+import pytest
+
+pikepdf = pytest.importorskip("pikepdf")
+pytest.importorskip("PIL")
+
+from conversion_cache import ConversionCache
+from conversion_engine import ConversionEngine, convert_task, create_office_pool, export_settings
+from pdf_optimizer import optimize_pdf
+
+
+def _image_pdf(path, pixels=600, inches=1):
+    """一页PDF，铺满页面的RGB图片分辨率为pixels/inches DPI"""
+    rng = random.Random(1)
+    data = bytes(min(255, (x + y) // 5 + rng.randrange(16))
+                 for y in range(pixels) for x in range(pixels) for _ in range(3))
+    pdf = pikepdf.new()
+    image = pikepdf.Stream(pdf, zlib.compress(data))
+    image.Type, image.Subtype = pikepdf.Name.XObject, pikepdf.Name.Image
+    image.Width = image.Height = pixels
+    image.ColorSpace, image.BitsPerComponent = pikepdf.Name.DeviceRGB, 8
+    image.Filter = pikepdf.Name.FlateDecode
+    size = 72 * inches
+    page = pdf.add_blank_page(page_size=(size, size))
+    page.Resources = pikepdf.Dictionary(XObject=pikepdf.Dictionary(Im0=image))
+    page.Contents = pdf.make_stream(f"q {size} 0 0 {size} 0 0 cm /Im0 Do Q".encode())
+    pdf.save(path)
+
+
+def test_downsamples_large_image(tmp_path):
+    path = str(tmp_path / "scan.pdf")
+    _image_pdf(path)
+    stats = optimize_pdf(path, max_dpi=150, output_hash=True)
+    assert stats["images"] == 1
+    assert stats["before"] > stats["after"] == os.path.getsize(path)
+    with pikepdf.open(path) as pdf:
+        image = pdf.pages[0].Resources.XObject.Im0
+        assert (int(image.Width), int(image.Height)) == (150, 150)
+    assert not os.path.exists(path + ".w2p-optimize")
+
+
+def test_keeps_file_that_would_not_shrink(tmp_path):
+    path = str(tmp_path / "scan.pdf")
+    _image_pdf(path, pixels=100)  # 100 DPI，低于上限
+    optimize_pdf(path, max_dpi=150)
+    with open(path, "rb") as f:
+        optimized = f.read()
+    stats = optimize_pdf(path, max_dpi=150)
+    assert (stats["images"], stats["before"]) == (0, stats["after"])
+    with open(path, "rb") as f:
+        assert f.read() == optimized
+    assert not os.path.exists(path + ".w2p-optimize")
+
+
+def test_stores_optimized_pdf_in_cache(tmp_path):
+    path = str(tmp_path / "scan.pdf")
+    _image_pdf(path)
+    cache_options = {"cache_dir": str(tmp_path / "cache"), "link_mode": "copy"}
+    optimize_pdf(path, max_dpi=150, cache=cache_options, cache_key="k" * 64)
+
+    cache = ConversionCache(**cache_options)
+    fetched = tmp_path / "fetched.pdf"
+    assert cache.fetch("k" * 64, str(fetched)) == "copy"
+    with open(path, "rb") as f:
+        assert fetched.read_bytes() == f.read()
+    cache.close()
+
+
+FAST = {"startup": "fixed:0", "open": "fixed:0", "save": "fixed:0", "quit": "fixed:0"}
+
+
+def test_convert_task_leaves_cache_write_to_optimizer(tmp_path):
+    src = tmp_path / "a.docx"
+    src.write_bytes(b"document")
+    task = {"id": 1, "src": str(src), "dst": str(tmp_path / "a.pdf")}
+    options = {"optimize": {"max_dpi": 150}, "sim_profile": FAST}
+    assert export_settings(options) != export_settings(dict(options, optimize=None))
+
+    cache = ConversionCache(str(tmp_path / "cache"))
+    pool = create_office_pool("sim", options)
+    try:
+        result = convert_task(pool, "sim", task, options, cache)
+        assert result["status"] == "ok" and result["cache_hit"] is False
+        assert result["cache_key"] == cache.make_key(result["source_hash"], "sim", export_settings(options))
+        assert cache.total_size() == 0  # 未优化的PDF不写入缓存
+    finally:
+        pool.close()
+        cache.close()
+
+
+def _convert_once(tmp_path, name, options):
+    src = tmp_path / name
+    src.write_bytes(b"document")
+    engine = ConversionEngine("sim", workers=1, options=options)
+    engine.start()
+    engine.submit(str(src), str(tmp_path / (name + ".pdf")))
+    engine.finish_input()
+    try:
+        return list(engine.results())
+    finally:
+        engine.close(timeout=10)
+
+
+def test_engine_caches_optimized_pdf(tmp_path):
+    cache_options = {"cache_dir": str(tmp_path / "cache"), "link_mode": "copy"}
+    options = {"optimize": {"max_dpi": 150}, "cache": cache_options, "sim_profile": FAST}
+    [first] = _convert_once(tmp_path, "a.docx", options)
+    assert first["status"] == "ok" and first["cache_hit"] is False
+    assert "error" not in first["optimize"] and "cache_key" not in first
+
+    [second] = _convert_once(tmp_path, "b.docx", options)
+    assert second["status"] == "ok" and second["cache_hit"] is True
+    assert "optimize" not in second  # 缓存中的PDF已经优化过
+    assert (tmp_path / "b.docx.pdf").read_bytes() == (tmp_path / "a.docx.pdf").read_bytes()
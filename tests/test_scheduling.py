@@ -0,0 +1,85 @@
+import itertools
+
+from scheduling import BATCH, INTERACTIVE, FairShareScheduler, LongestJobFirst
+
+_ids = itertools.count()
+
+
+def _task(tenant="default", job=None, lane=BATCH, predicted=None):
+    return {"id": next(_ids), "tenant": tenant, "job": job or tenant, "lane": lane,
+            "predicted": predicted}
+
+
+def _drain(scheduler):
+    tasks = []
+    while True:
+        task = scheduler.pop()
+        if task is None:
+            return tasks
+        scheduler.task_done(task)
+        tasks.append(task)
+
+
+def test_tenants_are_interleaved():
+    scheduler = FairShareScheduler()
+    for _ in range(50):
+        scheduler.push(_task("big"))  # 先提交的大批次不会让后来的团队一直排队
+    for _ in range(3):
+        scheduler.push(_task("small"))
+    order = [task["tenant"] for task in _drain(scheduler)]
+    assert order[:6] == ["big", "small"] * 3
+    assert len(scheduler) == 0
+
+
+def test_tenant_weights():
+    scheduler = FairShareScheduler(weights={"a": 2})
+    for _ in range(30):
+        scheduler.push(_task("a"))
+        scheduler.push(_task("b"))
+    first = [task["tenant"] for task in _drain(scheduler)][:30]
+    assert first.count("a") == 20
+
+
+def test_jobs_of_a_tenant_are_interleaved():
+    scheduler = FairShareScheduler()
+    for _ in range(5):
+        scheduler.push(_task("team", job="first"))
+    for _ in range(5):
+        scheduler.push(_task("team", job="second"))
+    order = [task["job"] for task in _drain(scheduler)]
+    assert order[:4] == ["first", "second"] * 2
+
+
+def test_interactive_lane_goes_first():
+    scheduler = FairShareScheduler()
+    for _ in range(5):
+        scheduler.push(_task("big"))
+    single = _task("big", job="single", lane=INTERACTIVE)
+    scheduler.push(single)
+    assert scheduler.pop() is single
+
+
+def test_tenant_cap_limits_running_tasks():
+    scheduler = FairShareScheduler(caps={"capped": 1})
+    for _ in range(3):
+        scheduler.push(_task("capped"))
+    first = scheduler.pop()
+    assert scheduler.pop() is None  # 达到并发上限
+    scheduler.task_done(first)
+    assert scheduler.pop()["tenant"] == "capped"
+
+
+def test_remove_job():
+    scheduler = FairShareScheduler()
+    for _ in range(3):
+        scheduler.push(_task("team", job="cancelled"))
+    scheduler.push(_task("team", job="kept"))
+    assert len(scheduler.remove("cancelled")) == 3
+    assert [task["job"] for task in _drain(scheduler)] == ["kept"]
+
+
+def test_longest_job_first():
+    scheduler = LongestJobFirst()
+    for predicted in (1.0, 5.0, 3.0):
+        scheduler.push(_task(predicted=predicted))
+    assert [task["predicted"] for task in _drain(scheduler)] == [5.0, 3.0, 1.0]
@@ -0,0 +1,30 @@
+from sim_office import SimProfile
+
+
+def _draws(profile, count=5):
+    return [profile.rng.random() for _ in range(count)]
+
+
+def test_seed_is_reproducible():
+    first = SimProfile(seed=1, save="uniform:0,1")
+    second = SimProfile(seed=1, save="uniform:0,1")
+    assert [first.save_delay() for _ in range(5)] == [second.save_delay() for _ in range(5)]
+
+
+def test_seed_is_replayable_per_worker_and_generation():
+    # 同样的seed、序号和重启次数在任何进程中都得到同样的随机序列
+    assert _draws(SimProfile(seed=1, worker=1, generation=2)) == \
+        _draws(SimProfile(seed=1, worker=1, generation=2))
+
+
+def test_seed_differs_between_workers_and_generations():
+    # 并行的工作进程和替换后的工作进程随机序列不同，hang_rate=0.5时不会每个文件都卡死
+    base = _draws(SimProfile(seed=1, hang_rate=0.5))
+    assert _draws(SimProfile(seed=1, hang_rate=0.5, worker=1)) != base
+    assert _draws(SimProfile(seed=1, hang_rate=0.5, generation=1)) != base
+
+
+def test_from_env_passes_worker_and_generation(monkeypatch):
+    monkeypatch.setenv("W2P_SIM_PROFILE", '{"seed": 7}')
+    assert _draws(SimProfile.from_env(worker=2, generation=3)) == \
+        _draws(SimProfile(seed=7, worker=2, generation=3))
@@ -0,0 +1,105 @@
+import os
+import time
+import threading
+
+import pytest
+
+from source_staging import SourceStager, remove_stale_runs
+
+
+def _source(tmp_path, name, size):
+    path = tmp_path / name
+    path.write_bytes(b"x" * size)
+    return {"id": name, "src": str(path)}
+
+
+class _Ready:
+    """记录on_ready回调，可以等待某个任务就绪"""
+
+    def __init__(self):
+        self.events = {}
+        self.order = []
+
+    def __call__(self, task):
+        self.order.append(task["id"])
+        self.events.setdefault(task["id"], threading.Event()).set()
+
+    def wait(self, task, timeout=5):
+        return self.events.setdefault(task["id"], threading.Event()).wait(timeout)
+
+
+@pytest.fixture
+def stager(tmp_path):
+    stager = SourceStager(str(tmp_path / "staging"), workers=2, budget=10, network_only=False)
+    yield stager
+    stager.close()
+
+
+def test_stages_copy_and_release_removes_it(tmp_path, stager):
+    ready = _Ready()
+    task = _source(tmp_path, "a.docx", 6)
+    stager.stage(task, ready)
+    assert ready.wait(task)
+    with open(task["staged"], "rb") as f:
+        assert f.read() == b"x" * 6
+    assert os.path.basename(task["staged"]) == "a.docx"
+    staged = task["staged"]
+    stager.release(task)
+    assert "staged" not in task and not os.path.exists(staged)
+    assert stager.stats["staged"] == 1 and stager.stats["bytes"] == 6
+
+
+def test_budget_blocks_until_release(tmp_path, stager):
+    ready = _Ready()
+    first, second = _source(tmp_path, "a.docx", 6), _source(tmp_path, "b.docx", 6)
+    stager.stage(first, ready)
+    assert ready.wait(first)
+    stager.stage(second, ready)
+    assert not ready.wait(second, timeout=0.3)  # 两个副本超过10字节的额度
+
+    stager.release(first)
+    assert ready.wait(second)
+    assert "staged" in second
+    assert stager.stats["peak_bytes"] == 6
+    assert stager.stats["budget_wait"] > 0
+
+
+def test_file_over_budget_is_not_staged(tmp_path, stager):
+    ready = _Ready()
+    task = _source(tmp_path, "big.docx", 11)
+    stager.stage(task, ready)
+    assert ready.wait(task)
+    assert "staged" not in task
+    assert stager.stats["skipped"] == 1
+
+
+def test_drop_pending_skips_queued_tasks(tmp_path):
+    stager = SourceStager(str(tmp_path / "staging"), workers=1, budget=10, network_only=False)
+    ready = _Ready()
+    first, blocked, pending = (_source(tmp_path, name, 6) for name in ("a.docx", "b.docx", "c.docx"))
+    stager.stage(first, ready)
+    assert ready.wait(first)
+    stager.stage(blocked, ready)  # 唯一的复制线程等待额度
+    stager.stage(pending, ready)
+    time.sleep(0.1)
+
+    stager.drop_pending()
+    assert ready.order == ["a.docx", "c.docx"]
+    assert "staged" not in pending
+    stager.close()  # 关闭时等待额度的复制放弃
+    assert ready.wait(blocked)
+    assert "staged" not in blocked
+    assert not os.path.exists(stager.root)
+
+
+def test_remove_stale_runs(tmp_path):
+    old = time.time() - 2 * 24 * 3600
+    for name in ("run_old", "run_new", "other_old"):
+        (tmp_path / name).mkdir()
+        (tmp_path / name / "a.docx").write_bytes(b"x")
+    for name in ("run_old", "other_old"):
+        os.utime(tmp_path / name, (old, old))
+
+    remove_stale_runs(str(tmp_path))
+    assert sorted(os.listdir(tmp_path)) == ["other_old", "run_new"]
+    remove_stale_runs(str(tmp_path / "missing"))  # 目录不存在时什么都不做
@@ -5,49 +5,48 @@ Word转PDF工具
 """
 import os
 import sys
+
+if __name__ == "__main__" and len(sys.argv) > 1 and sys.argv[1] in ("convert", "plan", "watch", "serve"):
+    # 命令行模式（例如 python -m word_to_pdf_converter convert SRC --out DST）：
+    # 不导入tkinter，以converter_cli作为主模块运行，工作进程也不会导入界面代码
+    import runpy
+    runpy.run_module("converter_cli", run_name="__main__", alter_sys=True)
+    sys.exit(0)
+
 from pathlib import Path
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
+import multiprocessing
+import queue
+import threading
 from threading import Thread
 import time
+import shutil
+import tempfile
 
-# 导入win32com用于Word/WPS应用程序转换
-try:
-    import win32com.client
-    import pythoncom
-    HAS_WIN32COM = True
-except ImportError:
-    HAS_WIN32COM = False
+from conversion_engine import (
+    HAS_WIN32COM, BACKEND_NAMES, ConversionEngine, default_worker_count,
+    detect_office_apps, resolve_office_app,
+)
+from native_docx import HAS_NATIVE
+from conversion_manifest import ConversionManifest
+from job_journal import JobJournal, load_journal
+from cost_model import CostModel
+from folder_scanner import scan_word_files
+from app_log import AsyncFileLog, default_log_dir
+from run_report import RunReport
+from archive_writer import ArchiveWriter
+from output_publisher import default_scratch_dir
+from pdf_merge import HAS_PYPDF, MergeStage
+from export_profiles import DEFAULT_EXPORT_PROFILE, EXPORT_PROFILES
+from pdf_optimizer import HAS_PIKEPDF
 
-# 检测可用的Office应用程序
-def detect_office_apps():
-    """检测系统中可用的Office应用程序"""
-    available_apps = []
-    
-    if not HAS_WIN32COM:
-        return available_apps
-    
-    # 检测Microsoft Word
-    try:
-        pythoncom.CoInitialize()
-        word = win32com.client.DispatchEx("Word.Application")
-        word.Quit()
-        pythoncom.CoUninitialize()
-        available_apps.append("Word")
-    except:
-        pass
-    
-    # 检测WPS Office (使用KWPS.Application)
-    try:
-        pythoncom.CoInitialize()
-        wps = win32com.client.DispatchEx("KWPS.Application")  # 金山WPS文字
-        wps.Quit()
-        pythoncom.CoUninitialize()
-        available_apps.append("WPS")
-    except:
-        pass
-    
-    return available_apps
+# 界面日志最多保留的行数，完整日志在日志文件中
+MAX_LOG_LINES = 2000
+
+# 界面刷新间隔（毫秒）和每次最多处理的事件数
+UI_POLL_MS = 100
+UI_BATCH_LIMIT = 5000
 
 
 class WordToPdfConverter:
@@ -67,9 +66,33 @@ class WordToPdfConverter:
         self.word_files = []
         self.is_converting = False
         self.stop_conversion = False
-        self.office_app = tk.StringVar(value="auto")  # 转换方式：auto/word/wps
+        self.office_app = tk.StringVar(value="auto")  # 转换方式：auto/word/wps/libreoffice
+        self.worker_count = tk.IntVar(value=default_worker_count())  # 并行转换进程数
+        self.export_profile = tk.StringVar(value=DEFAULT_EXPORT_PROFILE)  # 导出配置：screen/print/archive
+        self.fast_path = tk.BooleanVar(value=HAS_NATIVE)  # 简单文档不启动Office直接转换
+        self.incremental = tk.BooleanVar(value=True)  # 只转换新增或修改过的文件
+        self.use_cache = tk.BooleanVar(value=True)  # 内容相同的文件复用缓存的PDF
+        self.archive_output = tk.BooleanVar(value=False)  # PDF写入压缩包，不逐个创建文件
+        self.merge_output = tk.BooleanVar(value=False)  # 转换后把所有PDF合并为一个
+        self.optimize_output = tk.BooleanVar(value=False)  # 转换后缩小图片、压缩PDF
+        self.engine = None
+        self.active_run = None  # 正在进行的转换，扫描线程把新找到的文件直接提交给它
+        self.is_scanning = False
+        self.scan_stop_event = None
+        self.scan_lock = threading.Lock()
+        
+        # 后台线程不直接操作界面，而是把事件放进队列，由界面线程定时批量处理
+        self.ui_queue = queue.Queue()
+        try:
+            self.file_log = AsyncFileLog()
+        except OSError:
+            self.file_log = None  # 日志目录不可写时只在界面显示
         
         self.setup_ui()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.root.after(UI_POLL_MS, self.process_ui_events)
+        # 窗口显示后在后台预先检测Office，点击开始时通常已经有缓存结果
+        self.root.after(500, lambda: Thread(target=detect_office_apps, daemon=True).start())
         
     def setup_ui(self):
         """设置用户界面"""
@@ -136,11 +159,62 @@ class WordToPdfConverter:
                       variable=self.office_app, value="wps",
                       font=("微软雅黑", 9)).pack(side=tk.LEFT, padx=10)
         
+        tk.Radiobutton(radio_frame, text="使用LibreOffice", 
+                      variable=self.office_app, value="libreoffice",
+                      font=("微软雅黑", 9)).pack(side=tk.LEFT, padx=10)
+        
         info_label = tk.Label(method_frame, 
-                             text="💡 需要已安装Microsoft Word或WPS Office",
+                             text="💡 需要已安装Microsoft Word、WPS Office或LibreOffice",
                              font=("微软雅黑", 8), foreground="blue", anchor="w")
         info_label.pack(fill=tk.X, pady=2)
         
+        # 并行进程数
+        workers_frame = tk.Frame(method_frame)
+        workers_frame.pack(fill=tk.X, pady=2)
+        
+        tk.Label(workers_frame, text="并行进程数:", font=("微软雅黑", 9)).pack(side=tk.LEFT, padx=10)
+        tk.Spinbox(workers_frame, from_=1, to=max(1, os.cpu_count() or 1), width=5,
+                   textvariable=self.worker_count, font=("微软雅黑", 9)).pack(side=tk.LEFT)
+        tk.Label(workers_frame, text="（每个进程启动一个独立的Office实例）",
+                 font=("微软雅黑", 8), foreground="gray").pack(side=tk.LEFT, padx=5)
+        
+        # 导出配置（影响导出耗时和PDF大小）
+        profile_frame = tk.Frame(method_frame)
+        profile_frame.pack(fill=tk.X, pady=2)
+        
+        tk.Label(profile_frame, text="导出配置:", font=("微软雅黑", 9)).pack(side=tk.LEFT, padx=10)
+        for name, profile in EXPORT_PROFILES.items():
+            tk.Radiobutton(profile_frame, text=profile["label"],
+                           variable=self.export_profile, value=name,
+                           font=("微软雅黑", 9)).pack(side=tk.LEFT, padx=5)
+        
+        # 简单文档快速转换
+        tk.Checkbutton(method_frame, text="简单文档快速转换（纯文字/标题/列表的.docx不启动Office）",
+                       variable=self.fast_path, font=("微软雅黑", 9),
+                       state=tk.NORMAL if HAS_NATIVE else tk.DISABLED).pack(anchor="w", padx=10)
+        
+        # 增量转换（取消勾选则强制全部重新转换）
+        tk.Checkbutton(method_frame, text="增量转换（跳过上次转换后未修改的文件，取消勾选则全部重新转换）",
+                       variable=self.incremental, font=("微软雅黑", 9)).pack(anchor="w", padx=10)
+        
+        # 转换缓存（不同目录中内容相同的文件只转换一次）
+        tk.Checkbutton(method_frame, text="使用转换缓存（内容相同的文件直接复用已转换的PDF）",
+                       variable=self.use_cache, font=("微软雅黑", 9)).pack(anchor="w", padx=10)
+        
+        # 压缩包输出（大量小文件时比逐个创建PDF快得多）
+        tk.Checkbutton(method_frame, text="输出为ZIP压缩包（PDF写入所选文件夹中的“PDF_日期时间.zip”，不逐个创建PDF文件）",
+                       variable=self.archive_output, font=("微软雅黑", 9)).pack(anchor="w", padx=10)
+        
+        # 合并输出（按文件名自然顺序合并，每个Word文件一个书签）
+        tk.Checkbutton(method_frame, text="合并为一个PDF（按文件名顺序，第2章在第10章前面，每个文件一个书签，需要pypdf）",
+                       variable=self.merge_output, font=("微软雅黑", 9),
+                       state=tk.NORMAL if HAS_PYPDF else tk.DISABLED).pack(anchor="w", padx=10)
+        
+        # PDF优化（在单独的进程中进行，不影响转换速度）
+        tk.Checkbutton(method_frame, text="转换后优化PDF（缩小高分辨率图片、压缩内容，需要pikepdf和Pillow）",
+                       variable=self.optimize_output, font=("微软雅黑", 9),
+                       state=tk.NORMAL if HAS_PIKEPDF else tk.DISABLED).pack(anchor="w", padx=10)
+        
         # 开始按钮
         button_frame = tk.Frame(control_frame)
         button_frame.pack(fill=tk.X, pady=5)
@@ -152,6 +226,14 @@ class WordToPdfConverter:
                                    cursor="hand2", relief=tk.RAISED)
         self.start_btn.pack(pady=5)
         
+        # 继续上次被中断的转换（所选目录中有未完成的任务日志时可用）
+        self.resume_btn = tk.Button(button_frame, text="⏯ 继续上次转换",
+                                    command=lambda: self.start_conversion(resume=True),
+                                    font=("微软雅黑", 9), state=tk.DISABLED,
+                                    bg="#cccccc", fg="#666666", padx=15, pady=8,
+                                    cursor="hand2")
+        self.resume_btn.pack(pady=5)
+        
         # 停止按钮
         self.stop_btn = tk.Button(button_frame, text="⏸ 停止转换",
                                   command=self.stop_conversion_process,
@@ -199,6 +281,9 @@ class WordToPdfConverter:
         
     def select_folder(self):
         """选择文件夹"""
+        if self.is_converting:
+            messagebox.showwarning("警告", "正在转换，请先停止转换再选择其他文件夹")
+            return
         folder = filedialog.askdirectory(title="选择包含Word文档的文件夹")
         if folder:
             self.selected_folder = folder
@@ -206,45 +291,197 @@ class WordToPdfConverter:
             self.scan_word_files()
             
     def scan_word_files(self):
-        """扫描文件夹中的Word文件"""
+        """在后台线程中扫描文件夹中的Word文件，找到第一个文件后就可以开始转换"""
         if not self.selected_folder:
             return
         
-        self.word_files = []
-        extensions = ['.doc', '.docx']
-        
-        for root, dirs, files in os.walk(self.selected_folder):
-            for file in files:
-                if any(file.lower().endswith(ext) for ext in extensions):
-                    full_path = os.path.join(root, file)
-                    self.word_files.append(full_path)
-        
-        count = len(self.word_files)
-        self.file_count_var.set(f"当前文件: {count}")
+        # 取消上一次还没有完成的扫描
+        if self.scan_stop_event is not None:
+            self.scan_stop_event.set()
+        stop_event = threading.Event()
+        with self.scan_lock:
+            self.word_files = []
+            self.is_scanning = True
+            self.scan_stop_event = stop_event
+        
+        self.file_count_var.set("当前文件: 0")
+        self.status_text_var.set("正在扫描文件夹...")
+        if not self.is_converting:
+            self.start_btn.config(state=tk.DISABLED, bg="#cccccc", fg="#666666")
+            self.resume_btn.config(state=tk.DISABLED, bg="#cccccc", fg="#666666")
+        self.log_message(f"正在扫描: {self.selected_folder}")
         
-        if count > 0:
-            self.status_text_var.set(f"找到 {count} 个Word文件，点击开始转换")
-            self.start_btn.config(state=tk.NORMAL, bg="#4CAF50", fg="white")
-            self.log_message(f"✓ 扫描完成，找到 {count} 个Word文件")
+        thread = Thread(target=self._scan_folder, args=(self.selected_folder, stop_event), daemon=True)
+        thread.start()
+    
+    def _scan_folder(self, folder, stop_event):
+        """扫描线程：找到的文件立即加入列表，转换进行中时直接提交给转换引擎"""
+        count = 0
+        last_update = 0.0
+        for full_path in scan_word_files(folder, stop_event=stop_event):
+            with self.scan_lock:
+                if self.scan_stop_event is not stop_event:
+                    return  # 已经开始了新的扫描
+                self.word_files.append(full_path)
+                if self.active_run is not None:
+                    self._queue_file(self.active_run, full_path)
             
-            # 显示文件列表
-            for i, file in enumerate(self.word_files[:5], 1):  # 只显示前5个
-                self.log_message(f"  {i}. {os.path.basename(file)}")
+            count += 1
+            if count <= 5:  # 只显示前5个
+                self.log_message(f"  {count}. {os.path.basename(full_path)}")
+            if count == 1 and not self.is_converting:
+                self.post(self.start_btn.config, state=tk.NORMAL, bg="#4CAF50", fg="white")
+            now = time.monotonic()
+            if now - last_update > 0.2:
+                last_update = now
+                self.set_var(self.file_count_var, f"当前文件: {count}（扫描中）")
+                if not self.is_converting:
+                    self.set_var(self.status_text_var, f"正在扫描，已找到 {count} 个Word文件，可以开始转换")
+        
+        with self.scan_lock:
+            if self.scan_stop_event is not stop_event:
+                return
+            self.is_scanning = False
+            # 转换已经开始时，扫描结束后不会再有新任务
+            if self.active_run is not None:
+                self.active_run["engine"].finish_input()
+                if self.active_run["merge"] is not None:
+                    self.active_run["merge"].finish_input()
+        
+        self.set_var(self.file_count_var, f"当前文件: {count}")
+        if count > 0:
             if count > 5:
                 self.log_message(f"  ... 还有 {count - 5} 个文件")
+            self.log_message(f"✓ 扫描完成，找到 {count} 个Word文件")
+            if not self.is_converting:
+                self.set_var(self.status_text_var, f"找到 {count} 个Word文件，点击开始转换")
+                self.post(self.start_btn.config, state=tk.NORMAL, bg="#4CAF50", fg="white")
+                self._check_unfinished_run(folder)
         else:
-            self.status_text_var.set("未找到Word文件")
-            self.start_btn.config(state=tk.DISABLED, bg="#cccccc", fg="#666666")
+            self.set_var(self.status_text_var, "未找到Word文件")
+            if not self.is_converting:
+                self.post(self.start_btn.config, state=tk.DISABLED, bg="#cccccc", fg="#666666")
             self.log_message("⚠ 该文件夹中没有找到Word文件")
+    
+    def _check_unfinished_run(self, folder):
+        """所选目录中有上次中断的转换时，提示并启用“继续上次转换”按钮"""
+        state = load_journal(folder)
+        if not state.unfinished:
+            return
+        counts = state.counts()
+        self.log_message(f"⚠ 上次的转换没有完成（已完成 {counts['done']} 个，"
+                         f"未完成 {counts['queued'] + counts['running'] + counts['failed']} 个），"
+                         f"可点击“继续上次转换”跳过已完成的文件")
+        self.post(self.resume_btn.config, state=tk.NORMAL, bg="#FF9800", fg="white")
+    
+    def _queue_file(self, run, word_file):
+        """检查增量转换清单并把文件提交给转换引擎（调用时需持有scan_lock）"""
+        # 生成PDF文件路径
+        pdf_file = os.path.splitext(word_file)[0] + '.pdf'
+        if run["scratch"] is not None:
+            # 压缩包输出：PDF先保存在本地临时目录中，保持相对所选文件夹的目录结构
+            rel = os.path.relpath(pdf_file, self.selected_folder)
+            if rel.startswith(os.pardir):
+                rel = os.path.basename(pdf_file)
+            pdf_file = os.path.join(run["scratch"], rel)
+            os.makedirs(os.path.dirname(pdf_file), exist_ok=True)
+        merge = run["merge"]
+        if run["resume_state"] is not None and run["resume_state"].is_done(word_file, pdf_file):
+            run["resumed"] += 1
+            if merge is not None:
+                merge.expect(word_file, pdf_file, done=True)
+            return
+        if run["incremental"]:
+            try:
+                needed, reason = run["manifest"].needs_conversion(word_file, pdf_file)
+            except OSError:
+                needed = True
+            if not needed:
+                run["skipped"] += 1
+                if merge is not None:
+                    merge.expect(word_file, pdf_file, done=True)
+                return
+        if merge is not None:
+            merge.expect(word_file, pdf_file)
+        cost = features = None
+        if run["model"] is not None:
+            cost, features = run["model"].estimate(word_file)
+        if run["journal"] is not None:
+            run["journal"].queued(word_file, pdf_file)
+        if run["engine"].submit(word_file, pdf_file, cost=cost, features=features) is not None:
+            run["submitted"] += 1
             
     def log_message(self, message):
-        """添加日志消息"""
-        self.log_text.insert(tk.END, message + "\n")
+        """添加日志消息（可在任意线程中调用）"""
+        self.ui_queue.put(("log", message))
+        if self.file_log is not None:
+            self.file_log.write(message)
+    
+    def set_var(self, var, value):
+        """设置界面变量（可在任意线程中调用），同一批次中只保留最后一次的值"""
+        self.ui_queue.put(("var", var, value))
+    
+    def set_progress(self, bar, value):
+        """设置进度条（可在任意线程中调用）"""
+        self.ui_queue.put(("var", bar, value))
+    
+    def post(self, func, *args, **kwargs):
+        """让界面线程执行func（可在任意线程中调用）"""
+        self.ui_queue.put(("call", func, args, kwargs))
+    
+    def process_ui_events(self):
+        """界面线程定时处理后台线程发来的事件：日志一次性插入，变量只设置最后的值"""
+        lines = []
+        values = {}
+        try:
+            for _ in range(UI_BATCH_LIMIT):
+                event = self.ui_queue.get_nowait()
+                if event[0] == "log":
+                    lines.append(event[1])
+                elif event[0] == "var":
+                    values[event[1]] = event[2]
+                else:
+                    # 按顺序执行前先把之前的日志和变量显示出来
+                    self._flush_ui(lines, values)
+                    lines, values = [], {}
+                    func, args, kwargs = event[1:]
+                    func(*args, **kwargs)
+        except queue.Empty:
+            pass
+        self._flush_ui(lines, values)
+        self.root.after(UI_POLL_MS, self.process_ui_events)
+    
+    def _flush_ui(self, lines, values):
+        for target, value in values.items():
+            if isinstance(target, ttk.Progressbar):
+                target['value'] = value
+            else:
+                target.set(value)
+        if not lines:
+            return
+        self.log_text.insert(tk.END, "\n".join(lines) + "\n")
+        # 只保留最近的MAX_LOG_LINES行
+        line_count = int(self.log_text.index("end-1c").split(".")[0])
+        if line_count > MAX_LOG_LINES:
+            self.log_text.delete("1.0", f"{line_count - MAX_LOG_LINES}.0")
         self.log_text.see(tk.END)
-        self.root.update_idletasks()
-        
-    def start_conversion(self):
-        """开始转换"""
+    
+    def on_close(self):
+        """关闭窗口：停止扫描和转换，写完日志文件"""
+        if self.scan_stop_event is not None:
+            self.scan_stop_event.set()
+        if self.engine is not None:
+            self.engine.stop()
+        if self.file_log is not None:
+            self.file_log.close()
+            self.file_log = None
+        self.root.destroy()
+        
+    def start_conversion(self, resume=False):
+        """开始转换（检测Office环境可能较慢，放在后台线程中进行）
+
+        resume=True时继续上次中断的转换：跳过任务日志中已完成的文件。
+        """
         if self.is_converting:
             return
         
@@ -252,10 +489,8 @@ class WordToPdfConverter:
             messagebox.showwarning("警告", "没有找到Word文件")
             return
         
-        # 检查Office应用程序是否可用
-        self.log_message("\n检测转换环境...")
-        
-        if not HAS_WIN32COM:
+        selected = self.office_app.get()
+        if not HAS_WIN32COM and selected in ("word", "wps"):
             error_msg = "错误: 未安装pywin32库"
             self.log_message(f"\n✗ {error_msg}")
             self.log_message("解决方法: pip install pywin32")
@@ -263,9 +498,40 @@ class WordToPdfConverter:
                                "需要安装pywin32库：\n\npip install pywin32")
             return
         
-        # 检测可用的应用程序
+        # 界面上的设置在这里读取，后台线程中不访问Tk变量
+        try:
+            workers = max(1, int(self.worker_count.get()))
+        except (tk.TclError, ValueError):
+            workers = default_worker_count()
+        settings = {
+            "workers": workers,
+            "incremental": self.incremental.get(),
+            "fast_path": HAS_NATIVE and self.fast_path.get(),
+            "cache": self.use_cache.get(),
+            "export_profile": self.export_profile.get(),
+            "archive": self.archive_output.get() and not resume,
+            "merge": HAS_PYPDF and self.merge_output.get(),
+            "optimize": HAS_PIKEPDF and self.optimize_output.get(),
+            "resume": resume,
+        }
+        
+        self.is_converting = True
+        self.stop_conversion = False
+        self.start_btn.config(state=tk.DISABLED, bg="#cccccc", fg="#666666")
+        self.resume_btn.config(state=tk.DISABLED, bg="#cccccc", fg="#666666")
+        self.status_text_var.set("正在检测转换环境...")
+        
+        thread = Thread(target=self.check_and_convert, args=(selected, settings), daemon=True)
+        thread.start()
+    
+    def check_and_convert(self, selected, settings):
+        """检测Office应用程序，通过后开始转换（在后台线程中运行）"""
+        self.log_message("\n检测转换环境...")
         self.log_message("正在检测Office应用程序...")
-        self.log_message("  - pywin32库: ✓ 已安装")
+        if HAS_WIN32COM:
+            self.log_message("  - pywin32库: ✓ 已安装")
+        else:
+            self.log_message("  - pywin32库: ✗ 未安装（无法使用Word/WPS）")
         
         available_apps = detect_office_apps()
         
@@ -279,121 +545,331 @@ class WordToPdfConverter:
         else:
             self.log_message("  - WPS Office: ✗ 未检测到")
         
+        if "LibreOffice" in available_apps:
+            self.log_message("  - LibreOffice: ✓ 已安装")
+        else:
+            self.log_message("  - LibreOffice: ✗ 未检测到")
+        
         if not available_apps:
             error_msg = "未检测到可用的Office应用程序"
             self.log_message(f"\n✗ {error_msg}")
             self.log_message("\n请安装以下任一软件:")
             self.log_message("  1. Microsoft Word")
             self.log_message("  2. WPS Office")
-            messagebox.showerror("错误",
-                               f"未检测到可用的Office应用程序！\n\n" +
-                               f"请安装Microsoft Word或WPS Office")
+            self.log_message("  3. LibreOffice")
+            self.cancel_start("未检测到可用的Office应用程序！\n\n" +
+                              "请安装Microsoft Word、WPS Office或LibreOffice")
             return
         
         # 根据用户选择确定使用哪个应用
-        selected = self.office_app.get()
+        use_app = resolve_office_app(selected, available_apps)
+        if use_app is None:
+            app_name = BACKEND_NAMES[selected]
+            error_msg = f"未检测到{app_name}"
+            self.log_message(f"\n✗ {error_msg}")
+            self.cancel_start(f"未检测到{app_name}！\n\n请安装{app_name}或选择其他转换方式")
+            return
+        
         if selected == "auto":
-            # 自动模式：优先Word，其次WPS
-            if "Word" in available_apps:
-                self.log_message("\n转换方式: Microsoft Word（自动检测）")
-            elif "WPS" in available_apps:
-                self.log_message("\n转换方式: WPS Office（自动检测）")
-        elif selected == "word":
-            if "Word" not in available_apps:
-                error_msg = "未检测到Microsoft Word"
-                self.log_message(f"\n✗ {error_msg}")
-                messagebox.showerror("错误", "未检测到Microsoft Word！\n\n请安装Word或选择其他转换方式")
-                return
-            self.log_message("\n转换方式: Microsoft Word")
-        elif selected == "wps":
-            if "WPS" not in available_apps:
-                error_msg = "未检测到WPS Office"
-                self.log_message(f"\n✗ {error_msg}")
-                messagebox.showerror("错误", "未检测到WPS Office！\n\n请安装WPS或选择其他转换方式")
-                return
-            self.log_message("\n转换方式: WPS Office")
+            self.log_message(f"\n转换方式: {BACKEND_NAMES[use_app]}（自动检测）")
+        else:
+            self.log_message(f"\n转换方式: {BACKEND_NAMES[use_app]}")
         
         self.log_message("✓ 环境检测通过\n")
-        
-        self.is_converting = True
-        self.stop_conversion = False
-        self.start_btn.config(state=tk.DISABLED, bg="#cccccc", fg="#666666")
-        self.stop_btn.config(state=tk.NORMAL)
-        
-        # 在新线程中执行转换
-        thread = Thread(target=self.convert_files, daemon=True)
-        thread.start()
-        
+        self.post(self.stop_btn.config, state=tk.NORMAL)
+        self.convert_files(use_app, settings)
+    
+    def cancel_start(self, error_msg):
+        """环境检测失败：恢复按钮状态并提示错误（可在任意线程中调用）"""
+        self.is_converting = False
+        self.set_var(self.status_text_var, "环境检测失败")
+        self.post(self.start_btn.config, state=tk.NORMAL, bg="#4CAF50", fg="white")
+        self.post(messagebox.showerror, "错误", error_msg)
+    
     def stop_conversion_process(self):
-        """停止转换过程"""
-        if self.is_converting:
-            self.stop_conversion = True
-            self.log_message("\n⚠ 用户请求停止转换...")
-            self.status_text_var.set("正在停止转换...")
+        """停止转换过程：第一次点击等待正在转换的文件完成，再次点击立即结束"""
+        if not self.is_converting:
+            return
+        if self.stop_conversion:
+            self.log_message("\n⚠ 强制停止，结束正在转换的Office进程...")
+            self.status_text_var.set("正在强制停止...")
+            if self.engine is not None:
+                self.engine.abort()
+            return
+        self.stop_conversion = True
+        self.log_message("\n⚠ 用户请求停止转换...（再次点击停止按钮可立即结束正在转换的文件）")
+        self.status_text_var.set("正在停止转换...")
+        if self.engine is not None:
+            self.engine.stop()
     
-    def convert_files(self):
-        """转换文件（在后台线程中运行）"""
-        total_files = len(self.word_files)
+    def convert_files(self, use_app, settings):
+        """转换文件（在后台线程中运行，实际转换由多个工作进程完成）"""
         converted_count = 0
         failed_count = 0
         failed_files = []  # 记录失败的文件
+        timed_out_files = []  # 转换超时的文件（计入失败数）
+        fast_count = 0  # 快速转换的文件数
+        cache_hits = 0  # 缓存命中的文件数
+        cache_lookups = 0
+        
+        # 压缩包输出：每次生成新的压缩包，不使用增量转换清单和任务日志
+        archive = scratch = None
+        if settings.get("archive"):
+            archive_path = os.path.join(self.selected_folder, time.strftime("PDF_%Y%m%d_%H%M%S.zip"))
+            try:
+                archive = ArchiveWriter(archive_path)
+                os.makedirs(default_scratch_dir(), exist_ok=True)
+                scratch = tempfile.mkdtemp(prefix="archive_", dir=default_scratch_dir())
+                self.log_message(f"PDF将写入压缩包: {archive_path}")
+            except (OSError, ValueError) as e:
+                if archive is not None:
+                    archive.close()
+                    archive = None
+                self.log_message(f"⚠ 无法创建压缩包，PDF将保存在源文件旁边: {str(e)}")
+        
+        # 合并输出：PDF照常保存，另外按顺序合并到所选文件夹中的“合并_日期时间.pdf”
+        merge = None
+        if settings.get("merge"):
+            if archive is not None:
+                self.log_message("⚠ 压缩包输出时不能合并PDF，已忽略“合并为一个PDF”")
+            else:
+                merge_path = os.path.join(self.selected_folder, time.strftime("合并_%Y%m%d_%H%M%S.pdf"))
+                try:
+                    merge = MergeStage(merge_path, self.selected_folder)
+                    self.log_message(f"PDF将合并为: {merge_path}")
+                except OSError as e:
+                    self.log_message(f"⚠ 无法创建合并的PDF: {str(e)}")
+        
+        # 增量转换清单保存在所选目录中
+        manifest = None
+        if archive is None:
+            try:
+                manifest = ConversionManifest(self.selected_folder, backend=use_app)
+            except Exception as e:
+                self.log_message(f"⚠ 无法打开增量转换清单，将转换全部文件: {str(e)}")
+        incremental = manifest is not None and settings["incremental"]
+        
+        # 任务日志：程序崩溃或停止后可以继续转换，不用从第一个文件重新开始
+        resume_state = None
+        if settings.get("resume"):
+            resume_state = load_journal(self.selected_folder)
+            if resume_state.header is None:
+                resume_state = None
+        journal = None
+        if archive is None:
+            try:
+                journal = JobJournal(self.selected_folder, use_app, resume_from=resume_state)
+            except OSError as e:
+                self.log_message(f"⚠ 无法写入任务日志，中断后将无法继续转换: {str(e)}")
+        
+        workers = settings["workers"]
+        with self.scan_lock:
+            still_scanning = self.is_scanning
+            if not still_scanning:
+                workers = max(1, min(workers, len(self.word_files)))
+        
+        options = {
+            "fast_path": settings["fast_path"],
+            "fingerprint": manifest is not None,
+            "cache": settings["cache"],
+            "optimize": settings["optimize"],
+            "export_profile": settings["export_profile"],
+        }
+        on_started = (lambda task: journal.started(task["src"])) if journal is not None else None
+        engine = ConversionEngine(use_app, workers=workers, options=options, on_started=on_started)
+        report = RunReport(use_app, workers)
+        self.engine = engine
+        # 按历史耗时预测每个文件的转换时间，耗时长的文件先转换
+        model = None
+        try:
+            model = CostModel(backend=use_app)
+        except Exception as e:
+            self.log_message(f"⚠ 无法打开耗时预测数据，按扫描顺序转换: {str(e)}")
+        run = {"engine": engine, "manifest": manifest, "incremental": incremental,
+               "model": model, "journal": journal, "resume_state": resume_state,
+               "scratch": scratch, "merge": merge, "submitted": 0, "skipped": 0, "resumed": 0}
         
         self.log_message("\n" + "="*60)
-        self.log_message("开始批量转换...")
+        self.log_message(f"开始批量转换...（{workers} 个并行进程）")
+        if still_scanning:
+            self.log_message("文件夹仍在扫描中，新找到的文件会自动加入转换")
         self.log_message("="*60 + "\n")
         
-        for i, word_file in enumerate(self.word_files, 1):
-            # 检查是否需要停止
-            if self.stop_conversion:
-                self.log_message("\n⚠ 转换已被用户停止")
-                break
-                
-            try:
-                filename = os.path.basename(word_file)
-                self.status_text_var.set(f"正在转换文件: {filename}")
-                self.log_message(f"[{i}/{total_files}] 正在转换: {filename}")
-                
-                # 更新当前文件进度
-                self.current_progress_var.set(f"当前文件进度: 0%")
-                self.current_progress_bar['value'] = 0
-                
-                # 生成PDF文件路径
-                pdf_file = os.path.splitext(word_file)[0] + '.pdf'
-                
-                # 执行转换
-                success = self.convert_word_to_pdf(word_file, pdf_file)
+        stopped = False
+        completed = False
+        try:
+            engine.start()
+            # 提交已经找到的文件，之后找到的文件由扫描线程直接提交
+            with self.scan_lock:
+                for word_file in self.word_files:
+                    self._queue_file(run, word_file)
+                if self.is_scanning:
+                    self.active_run = run
+                else:
+                    engine.finish_input()
+                    if merge is not None:
+                        merge.finish_input()
+            if run["resumed"]:
+                self.log_message(f"继续上次转换: 跳过 {run['resumed']} 个已完成的文件")
+            if run["skipped"]:
+                self.log_message(f"增量转换: 跳过 {run['skipped']} 个未修改的文件")
+            
+            self.set_var(self.status_text_var, f"正在转换，共 {run['submitted']} 个文件...")
+            
+            for i, result in enumerate(engine.results(), 1):
+                total_files = run["submitted"]
+                filename = os.path.basename(result["src"])
+                self.log_message(f"[{i}/{total_files}] {filename} ({result['duration']:.1f} 秒)")
                 
-                if success:
+                if archive is not None:
+                    archive.add_result(result, scratch)
+                report.add(result)
+                if journal is not None:
+                    journal.finished(result)
+                if model is not None:
+                    model.add_result(result)
+                if result["status"] == "ok":
                     converted_count += 1
-                    self.log_message(f"  ✓ 转换成功: {os.path.basename(pdf_file)}")
+                    if manifest is not None:
+                        try:
+                            manifest.record(result)
+                        except Exception as e:
+                            self.log_message(f"     ⚠ 更新增量转换清单失败: {str(e)}")
+                    if "cache_hit" in result:
+                        cache_lookups += 1
+                    if result.get("cache_hit"):
+                        cache_hits += 1
+                        self.log_message(f"  ✓ 复用缓存: {os.path.basename(result['dst'])}")
+                    elif result.get("engine") == "native":
+                        fast_count += 1
+                        self.log_message(f"  ✓ 转换成功(快速): {os.path.basename(result['dst'])}")
+                    elif archive is not None:
+                        self.log_message(f"  ✓ 转换成功: {result['member']}")
+                    else:
+                        self.log_message(f"  ✓ 转换成功: {os.path.basename(result['dst'])}")
+                    optimized = result.get("optimize")
+                    if optimized and "error" in optimized:
+                        self.log_message(f"     ⚠ 优化PDF失败，保留原文件: {optimized['error']}")
+                    elif optimized and optimized["after"] < optimized["before"]:
+                        self.log_message(f"     优化: {optimized['before'] / 1024:.0f} KB → "
+                                         f"{optimized['after'] / 1024:.0f} KB（{optimized['time']:.1f} 秒）")
+                elif result["status"] == "timeout":
+                    failed_count += 1
+                    timed_out_files.append(filename)
+                    self.log_message(f"  ⏱ 转换超时: {filename}，已结束卡住的Office进程并启动新实例")
                 else:
                     failed_count += 1
                     failed_files.append(filename)
+                    for hint in result.get("hints", []):
+                        self.log_message(f"     {hint}")
                     self.log_message(f"  ✗ 转换失败: {filename} (详见错误信息)")
+                if merge is not None:
+                    merge.part_done(result["src"], result["status"] == "ok")
                 
-                # 更新当前文件进度为100%
-                self.current_progress_var.set(f"当前文件进度: 100%")
-                self.current_progress_bar['value'] = 100
+                # 更新当前文件进度（显示等待中的文件数）
+                waiting = engine.pending_count()
+                self.set_var(self.current_progress_var, f"剩余文件: {waiting}")
+                self.set_progress(self.current_progress_bar, 100 if not waiting else 0)
                 
                 # 更新总进度
                 total_progress = int((i / total_files) * 100)
-                self.total_progress_var.set(f"总进度: {total_progress}%")
-                self.total_progress_bar['value'] = total_progress
+                self.set_var(self.total_progress_var, f"总进度: {total_progress}%")
+                self.set_progress(self.total_progress_bar, total_progress)
                 
-            except Exception as e:
-                failed_count += 1
-                failed_files.append(filename)
-                self.log_message(f"  ✗ 转换异常: {filename}")
-                self.log_message(f"     错误详情: {str(e)}")
+                # 检查是否需要停止
+                if self.stop_conversion and not stopped:
+                    stopped = True
+                    engine.stop()
+                    self.log_message("\n⚠ 转换已被用户停止，等待正在转换的文件完成...")
+            completed = not (stopped or self.stop_conversion)
+        except Exception as e:
+            self.log_message(f"\n✗ 转换异常: {str(e)}")
+        finally:
+            with self.scan_lock:
+                self.active_run = None
+            # 关闭工作进程及其Office实例
+            engine.close()
+            self.engine = None
+            if journal is not None:
+                # 停止或出错时不写结束标记，下次可以继续
+                journal.close(complete=completed)
+            if manifest is not None:
+                manifest.close()
+            if model is not None:
+                model.close()
+            if archive is not None:
+                try:
+                    archive.close()
+                except OSError as e:
+                    self.log_message(f"⚠ 写入压缩包失败: {str(e)}")
+                shutil.rmtree(scratch, ignore_errors=True)
+            if merge is not None:
+                try:
+                    merge.close(complete=completed)  # 停止时不留下只有前半部分的PDF
+                except OSError as e:
+                    merge.errors.append(str(e))
+        
+        stopped = stopped or self.stop_conversion
+        total_files = run["submitted"]
+        skipped_count = run["skipped"]
+        if not total_files:
+            self.set_var(self.total_progress_var, "总进度: 100%")
+            self.set_progress(self.total_progress_bar, 100)
         
         # 转换完成
         self.log_message("\n" + "="*60)
-        if self.stop_conversion:
+        if stopped:
             self.log_message(f"转换已停止！")
             self.log_message(f"已处理: {converted_count + failed_count}/{total_files} 个")
         else:
             self.log_message(f"转换完成！")
         self.log_message(f"成功: {converted_count} 个，失败: {failed_count} 个")
+        if run["resumed"]:
+            self.log_message(f"上次已完成跳过: {run['resumed']} 个")
+        if skipped_count:
+            self.log_message(f"未修改跳过: {skipped_count} 个")
+        if fast_count:
+            self.log_message(f"快速转换（未启动Office）: {fast_count} 个")
+        if cache_lookups:
+            self.log_message(f"缓存命中: {cache_hits}/{cache_lookups} 个 ({cache_hits * 100 // cache_lookups}%)")
+        stats = engine.pool_stats
+        self.log_message(f"Office实例: 复用 {stats['hits']} 次，启动 {stats['misses']} 次，"
+                         f"重启 {stats['restarts']} 次，启动耗时 {stats['startup_time']:.1f} 秒")
+        staging = engine.staging_stats
+        if staging.get("staged"):
+            self.log_message(f"网络文件预取到本地: {staging['staged']} 个，"
+                             f"{staging['bytes'] / (1024 * 1024):.1f} MB，"
+                             f"复制耗时 {staging['copy_time']:.1f} 秒（与转换同时进行）")
+        if archive is not None and archive.volumes:
+            self.log_message(f"压缩包: {archive.files} 个PDF，{len(archive.volumes)} 个分卷，"
+                             f"索引 {os.path.basename(archive.index_path)}")
+        if merge is not None and completed:
+            self.log_message(f"合并PDF: {os.path.basename(merge.path)}，{merge.merged} 个文件，"
+                             f"{merge.page_count} 页")
+            if merge.missing:
+                self.log_message(f"  ⚠ {len(merge.missing)} 个文件转换失败或无法读取，未合并")
+            for error in merge.errors:
+                self.log_message(f"     {error}")
+        publish = engine.publish_stats
+        if publish.get("published") or publish.get("errors"):
+            self.log_message(f"PDF写回网络目录: {publish['published']} 个，"
+                             f"{publish['bytes'] / (1024 * 1024):.1f} MB，"
+                             f"最长 {publish['max_publish_time']:.1f} 秒，失败 {publish['errors']} 个")
+        if engine.worker_crashes:
+            self.log_message(f"工作进程异常退出 {engine.worker_crashes} 次（已自动重启）")
+        
+        # 分阶段耗时报告
+        report.finish(stats)
+        if report.files:
+            for line in report.summary_lines():
+                self.log_message(line)
+            try:
+                base = os.path.join(default_log_dir(), "reports",
+                                    time.strftime("run-%Y%m%d-%H%M%S", time.localtime(report.started_at)))
+                json_path, _ = report.save(base)
+                self.log_message(f"运行报告: {json_path}（及同名.csv）")
+            except OSError as e:
+                self.log_message(f"⚠ 保存运行报告失败: {str(e)}")
         
         # 显示失败文件列表
         if failed_files:
@@ -402,195 +878,44 @@ class WordToPdfConverter:
                 self.log_message(f"  {i}. {file}")
             self.log_message("\n建议: 请手动用Word打开上述文件检查是否有错误")
         
+        if timed_out_files:
+            self.log_message(f"\n超时文件列表（{len(timed_out_files)} 个）:")
+            for i, file in enumerate(timed_out_files, 1):
+                self.log_message(f"  {i}. {file}")
+            self.log_message("\n建议: 这些文件可能会弹出对话框（如密码、宏、修复提示），请手动用Word打开检查")
+        
+        if not completed and journal is not None:
+            self.log_message("已完成的进度已保存，可点击“继续上次转换”跳过已完成的文件")
         self.log_message("="*60)
         
-        status_msg = f"转换{'(已停止)' if self.stop_conversion else '完成'}，成功 {converted_count} 个，失败 {failed_count} 个"
-        self.status_text_var.set(status_msg)
+        status_msg = f"转换{'(已停止)' if stopped else '完成'}，成功 {converted_count} 个，失败 {failed_count} 个"
+        if timed_out_files:
+            status_msg += f"（其中超时 {len(timed_out_files)} 个）"
+        self.set_var(self.status_text_var, status_msg)
         self.is_converting = False
         self.stop_conversion = False
-        self.start_btn.config(state=tk.NORMAL, bg="#4CAF50", fg="white")
-        self.stop_btn.config(state=tk.DISABLED)
+        self.post(self.start_btn.config, state=tk.NORMAL, bg="#4CAF50", fg="white")
+        self.post(self.stop_btn.config, state=tk.DISABLED)
+        if not completed and journal is not None:
+            self.post(self.resume_btn.config, state=tk.NORMAL, bg="#FF9800", fg="white")
         
-        messagebox.showinfo("完成", 
-                          f"转换{'(已停止)' if self.stop_conversion else '完成'}！\n\n成功: {converted_count} 个\n失败: {failed_count} 个")
-    
-    def convert_word_to_pdf(self, word_path, pdf_path):
-        """转换Word文档为PDF"""
-        # 根据用户选择确定使用哪个应用
-        selected = self.office_app.get()
-        available_apps = detect_office_apps()
-        
-        # 确定实际使用的应用
-        use_app = None
-        if selected == "auto":
-            # 自动模式：优先Word，其次WPS
-            if "Word" in available_apps:
-                use_app = "word"
-            elif "WPS" in available_apps:
-                use_app = "wps"
-        elif selected == "word" and "Word" in available_apps:
-            use_app = "word"
-        elif selected == "wps" and "WPS" in available_apps:
-            use_app = "wps"
-        
-        if use_app == "word":
-            return self.convert_with_word(word_path, pdf_path)
-        elif use_app == "wps":
-            return self.convert_with_wps(word_path, pdf_path)
-        else:
-            self.log_message("     ✗ 未找到可用的转换应用")
-            return False
-    
-    def convert_with_word(self, word_path, pdf_path):
-        """使用Microsoft Word转换"""
-        word = None
-        doc = None
-        try:
-            if not HAS_WIN32COM:
-                raise Exception("未安装pywin32库")
-            
-            pythoncom.CoInitialize()  # 初始化COM
-            
-            word = win32com.client.DispatchEx("Word.Application")  # 使用DispatchEx创建新实例
-            word.Visible = False
-            word.DisplayAlerts = 0  # 禁用警告对话框
-            
-            # 打开文档，忽略缺失字体警告
-            doc = word.Documents.Open(
-                os.path.abspath(word_path),
-                ConfirmConversions=False,
-                ReadOnly=True,
-                AddToRecentFiles=False,
-                Revert=False
-            )
-            
-            # 另存为PDF - 使用最简单的参数以兼容所有Word版本
-            try:
-                # 尝试使用标准参数
-                doc.SaveAs(
-                    os.path.abspath(pdf_path),
-                    FileFormat=17  # wdFormatPDF
-                )
-            except Exception as e:
-                # 如果失败，使用最基本的参数
-                doc.SaveAs(os.path.abspath(pdf_path), 17)
-            
-            doc.Close(False)  # 关闭文档不保存
-            
-            return True
-            
-        except Exception as e:
-            error_str = str(e)
-            
-            # 分析常见错误原因
-            if '此命令无效' in error_str or 'Command failed' in error_str:
-                self.log_message(f"     ⚠ Word文档问题: 该文档可能包含:")
-                self.log_message(f"        - 缺失的字体或特殊字体")
-                self.log_message(f"        - 受保护的内容")
-                self.log_message(f"        - 损坏的格式")
-                self.log_message(f"     建议: 手动用Word打开文档，更换字体后再试")
-            elif '没有注册类' in error_str or 'Class not registered' in error_str:
-                self.log_message(f"     ⚠ Word未正确安装或注册")
-            elif '访拒绝' in error_str or 'Access denied' in error_str:
-                self.log_message(f"     ⚠ 文件权限问题或文件被占用")
-            else:
-                self.log_message(f"     Word转换错误: {error_str}")
-            
-            return False
-        finally:
-            # 确保Word进程被正确关闭
-            try:
-                if doc is not None:
-                    doc.Close(False)
-            except:
-                pass
-            try:
-                if word is not None:
-                    word.Quit()
-            except:
-                pass
-            try:
-                pythoncom.CoUninitialize()  # 清理COM
-            except:
-                pass
-    
-    def convert_with_wps(self, word_path, pdf_path):
-        """使用WPS Office转换"""
-        wps = None
-        doc = None
-        try:
-            if not HAS_WIN32COM:
-                raise Exception("未安装pywin32库")
-            
-            pythoncom.CoInitialize()  # 初始化COM
-            
-            wps = win32com.client.DispatchEx("KWPS.Application")  # 金山WPS文字应用程序
-            wps.Visible = False
-            wps.DisplayAlerts = 0  # 禁用警告对话框
-            
-            # 打开文档
-            doc = wps.Documents.Open(
-                os.path.abspath(word_path),
-                ConfirmConversions=False,
-                ReadOnly=True,
-                AddToRecentFiles=False
-            )
-            
-            # 另存为PDF (WPS使用与Word相同的格式代码)
-            try:
-                # 尝试使用标准参数
-                doc.SaveAs(
-                    os.path.abspath(pdf_path),
-                    FileFormat=17  # wdFormatPDF
-                )
-            except Exception as e:
-                # 如果失败，使用最基本的参数
-                doc.SaveAs(os.path.abspath(pdf_path), 17)
-            
-            doc.Close(False)  # 关闭文档不保存
-            
-            return True
-            
-        except Exception as e:
-            error_str = str(e)
-            
-            # 分析常见错误原因
-            if '此命令无效' in error_str or 'Command failed' in error_str:
-                self.log_message(f"     ⚠ 文档问题: 该文档可能包含:")
-                self.log_message(f"        - 缺失的字体或特殊字体")
-                self.log_message(f"        - 受保护的内容")
-                self.log_message(f"        - 损坏的格式")
-                self.log_message(f"     建议: 手动用WPS打开文档检查")
-            elif '没有注册类' in error_str or 'Class not registered' in error_str:
-                self.log_message(f"     ⚠ WPS未正确安装或注册")
-            elif '访拒绝' in error_str or 'Access denied' in error_str:
-                self.log_message(f"     ⚠ 文件权限问题或文件被占用")
-            else:
-                self.log_message(f"     WPS转换错误: {error_str}")
-            
-            return False
-        finally:
-            # 确保WPS进程被正确关闭
-            try:
-                if doc is not None:
-                    doc.Close(False)
-            except:
-                pass
-            try:
-                if wps is not None:
-                    wps.Quit()
-            except:
-                pass
-            try:
-                pythoncom.CoUninitialize()  # 清理COM
-            except:
-                pass
+        self.post(messagebox.showinfo, "完成", 
+                          f"转换{'(已停止)' if stopped else '完成'}！\n\n成功: {converted_count} 个\n失败: {failed_count} 个")
 
 
 def main():
     """主函数"""
+    multiprocessing.freeze_support()  # 打包成exe后工作进程也从这里启动
     root = tk.Tk()
     app = WordToPdfConverter(root)
+    probe_file = os.environ.get("W2P_STARTUP_PROBE")
+    if probe_file:
+        # 启动时间测试（bench_startup.py）：窗口第一次显示后写入标记文件并退出
+        def report_window_shown():
+            with open(probe_file, "w", encoding="utf-8") as f:
+                f.write(str(time.time()))
+            app.on_close()
+        root.after_idle(lambda: root.after(0, report_window_shown))
     root.mainloop()
 
 